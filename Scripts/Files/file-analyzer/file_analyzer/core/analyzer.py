@@ -7,7 +7,7 @@ import json
 import os
 import tempfile
 from pathlib import Path
-from typing import Dict, List, Set, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple
 import multiprocessing
 import math
 import gc
@@ -20,6 +20,7 @@ from functools import lru_cache
 from ..plugins.plugin_registry import PluginRegistry
 from ..utils.file_utils import read_file_content, detect_file_type, calculate_entropy
 from ..core.patterns import get_patterns, get_hash_patterns
+from ..core.findings import FindingStore
 
 
 class MemoryLimitExceeded(Exception):
@@ -123,20 +124,14 @@ class FileAnalyzer:
             handlers=handlers
         )
     
-    def _initialize_results(self) -> Dict[str, Set[str]]:
+    def _initialize_results(self) -> FindingStore:
         """
-        Initialize the results dictionary with empty sets for all categories.
+        Initialize the result store with all known categories registered.
         
         Returns:
-            Empty results dictionary
+            Empty finding store
         """
-        results = {}
-        
         # Initialize with all pattern keys
-        for key in self.patterns.keys():
-            results[key] = set()
-        
-        # Add additional result categories
         additional_categories = [
             'api_framework', 'code_complexity', 'security_smells', 'code_quality',
             'high_entropy_strings', 'commented_code', 'network_protocols',
@@ -145,10 +140,7 @@ class FileAnalyzer:
             'ml_api_findings', 'runtime_errors', 'file_metadata'
         ]
         
-        for category in additional_categories:
-            results[category] = set()
-        
-        return results
+        return FindingStore(list(self.patterns.keys()) + additional_categories)
     
     def _load_plugins(self) -> None:
         """Load and register all plugins."""
@@ -170,7 +162,7 @@ class FileAnalyzer:
         except Exception as e:
             logging.error(f"Error loading plugins: {str(e)}")
     
-    def analyze_file(self, file_path: str) -> Dict[str, Set[str]]:
+    def analyze_file(self, file_path: str) -> FindingStore:
         """
         Analyze a file and extract relevant information.
         
@@ -178,7 +170,7 @@ class FileAnalyzer:
             file_path: Path to the file to analyze
             
         Returns:
-            Dictionary of analysis results
+            Store of analysis results
         """
         try:
             # Set timeout handler
@@ -250,17 +242,18 @@ class FileAnalyzer:
         stat = file_path.stat()
         
         metadata = {
-            f"Filename: {file_path.name}",
-            f"File size: {stat.st_size} bytes",
-            f"Created: {stat.st_ctime}",
-            f"Modified: {stat.st_mtime}",
-            f"Accessed: {stat.st_atime}",
-            f"Permissions: {stat.st_mode}",
-            f"Owner ID: {stat.st_uid}",
-            f"Group ID: {stat.st_gid}"
+            "Filename": file_path.name,
+            "File size": f"{stat.st_size} bytes",
+            "Created": stat.st_ctime,
+            "Modified": stat.st_mtime,
+            "Accessed": stat.st_atime,
+            "Permissions": stat.st_mode,
+            "Owner ID": stat.st_uid,
+            "Group ID": stat.st_gid
         }
         
-        self.results['file_metadata'].update(metadata)
+        for label, detail in metadata.items():
+            self.results.add('file_metadata', label, extra={'detail': detail})
     
     def _process_with_plugins(self, file_path: Path, file_type: str, content: str) -> None:
         """
@@ -277,7 +270,8 @@ class FileAnalyzer:
         for plugin in applicable_plugins:
             try:
                 logging.info(f"Applying {plugin.name} plugin")
-                plugin.analyze(file_path, file_type, content, self.results)
+                with self.results.attributed_to(plugin.name):
+                    plugin.analyze(file_path, file_type, content, self.results)
             except Exception as e:
                 logging.error(f"Error in plugin {plugin.name}: {str(e)}")
                 self.results['runtime_errors'].add(f"Plugin error ({plugin.name}): {str(e)}")
@@ -295,6 +289,7 @@ class FileAnalyzer:
         with open(file_path, 'rb') as f:
             chunk = f.read(chunk_size)
             chunk_num = 1
+            chunk_offset = 0
             
             while chunk:
                 logging.info(f"Processing chunk {chunk_num} of file {file_path.name}")
@@ -303,9 +298,10 @@ class FileAnalyzer:
                 content = chunk.decode('utf-8', errors='ignore')
                 
                 # Process patterns in this chunk
-                self._process_patterns(content)
+                self._process_patterns(content, chunk_offset)
                 
                 # Read next chunk
+                chunk_offset += len(chunk)
                 chunk = f.read(chunk_size)
                 chunk_num += 1
                 
@@ -324,7 +320,8 @@ class FileAnalyzer:
                 
             for plugin in basic_plugins:
                 try:
-                    plugin.analyze(file_path, file_type, "", self.results)
+                    with self.results.attributed_to(plugin.name):
+                        plugin.analyze(file_path, file_type, "", self.results)
                 except Exception as e:
                     logging.error(f"Error in plugin {plugin.name}: {str(e)}")
                     self.results['runtime_errors'].add(f"Plugin error ({plugin.name}): {str(e)}")
@@ -333,12 +330,13 @@ class FileAnalyzer:
             if 'temp_path' in locals() and temp_path.exists():
                 temp_path.unlink()
     
-    def _process_patterns(self, content: str) -> None:
+    def _process_patterns(self, content: str, base_offset: int = 0) -> None:
         """
         Process the content with built-in regex patterns.
         
         Args:
             content: The file content to analyze
+            base_offset: Offset of the content within the file (for chunks)
         """
         # Extract information using regex patterns
         for data_type, compiled_pattern in self.compiled_patterns.items():
@@ -357,17 +355,18 @@ class FileAnalyzer:
                 
                 for match in matches:
                     value = match.group(0)
+                    offset = base_offset + match.start()
                     
                     # Apply additional validation based on data type
                     if data_type == 'ipv4':
-                        self._validate_ipv4(value, data_type)
+                        self._validate_ipv4(value, data_type, offset)
                     elif data_type == 'base64_encoded':
-                        self._validate_base64(value, data_type)
+                        self._validate_base64(value, data_type, offset)
                     elif data_type == 'hash':
-                        self._validate_hash(value, data_type)
+                        self._validate_hash(value, data_type, offset)
                     else:
                         # Default case - just add the value
-                        self.results[data_type].add(value)
+                        self.results.add(data_type, value, offset=offset)
             except TimeoutExceeded:
                 logging.warning(f"Pattern matching timed out for {data_type}")
                 self.results['runtime_errors'].add(f"Pattern matching timed out for {data_type}")
@@ -394,45 +393,48 @@ class FileAnalyzer:
         except re.error:
             return []
     
-    def _validate_ipv4(self, value: str, data_type: str) -> None:
+    def _validate_ipv4(self, value: str, data_type: str, offset: int = -1) -> None:
         """
         Validate and add an IPv4 address.
         
         Args:
             value: The value to validate
             data_type: The data type category
+            offset: Offset of the match in the file
         """
         from ipaddress import IPv4Address, AddressValueError
         try:
             IPv4Address(value)
-            self.results[data_type].add(value)
+            self.results.add(data_type, value, offset=offset)
         except AddressValueError:
             pass
     
-    def _validate_base64(self, value: str, data_type: str) -> None:
+    def _validate_base64(self, value: str, data_type: str, offset: int = -1) -> None:
         """
         Validate and add a base64 encoded string.
         
         Args:
             value: The value to validate
             data_type: The data type category
+            offset: Offset of the match in the file
         """
         from ..utils.file_utils import is_valid_base64
         if is_valid_base64(value):
-            self.results[data_type].add(value)
+            self.results.add(data_type, value, offset=offset)
     
-    def _validate_hash(self, value: str, data_type: str) -> None:
+    def _validate_hash(self, value: str, data_type: str, offset: int = -1) -> None:
         """
         Validate and add a hash.
         
         Args:
             value: The value to validate
             data_type: The data type category
+            offset: Offset of the match in the file
         """
         hash_type = self._identify_hash(value)
         confidence = calculate_entropy(value)
-        value = f"{value} (Type: {hash_type}, Entropy: {confidence:.2f})"
-        self.results[data_type].add(value)
+        self.results.add(data_type, value, offset=offset,
+                         extra={'type': hash_type, 'entropy': round(confidence, 2)})
     
     @lru_cache(maxsize=1024)
     def _identify_hash(self, hash_value: str) -> str:
@@ -529,7 +531,7 @@ class FileAnalyzer:
             logging.error(f"Error processing plugins after parallel analysis: {str(e)}")
             self.results['runtime_errors'].add(f"Plugin processing error: {str(e)}")
     
-    def _process_file_chunk(self, file_path: Path, start_pos: int, end_pos: int) -> Dict[str, Set[str]]:
+    def _process_file_chunk(self, file_path: Path, start_pos: int, end_pos: int) -> FindingStore:
         """
         Process a chunk of a file.
         
@@ -541,7 +543,7 @@ class FileAnalyzer:
         Returns:
             Results for this chunk
         """
-        chunk_results = {key: set() for key in self.results.keys()}
+        chunk_results = FindingStore(self.results.keys())
         
         try:
             with open(file_path, 'rb') as f:
@@ -566,35 +568,30 @@ class FileAnalyzer:
                             
                         matches = re.finditer(pattern, chunk_data)
                         for match in matches:
-                            value = match.group(0)
                             # Apply simplified validation
-                            chunk_results[data_type].add(value)
+                            chunk_results.add(data_type, match.group(0), offset=start_pos + match.start())
         except Exception as e:
             logging.error(f"Error processing chunk {start_pos}-{end_pos}: {str(e)}")
         
         return chunk_results
     
-    def _merge_chunk_results(self, chunk_results: Dict[str, Set[str]]) -> None:
+    def _merge_chunk_results(self, chunk_results: FindingStore) -> None:
         """
         Merge results from a chunk into the main results.
         
         Args:
             chunk_results: Results from a chunk
         """
-        for key, values in chunk_results.items():
-            if key in self.results:
-                self.results[key].update(values)
-            else:
-                self.results[key] = values
+        self.results.merge(chunk_results)
     
-    def get_results(self) -> Dict[str, Set[str]]:
+    def get_results(self) -> FindingStore:
         """
         Get the analysis results.
         
         Returns:
-            Copy of the results dictionary
+            Copy of the result store
         """
-        return {k: v.copy() for k, v in self.results.items()}
+        return self.results.copy()
     
     def get_api_structure(self) -> Dict:
         """
@@ -603,7 +600,7 @@ class FileAnalyzer:
         Returns:
             The API structure dictionary
         """
-        return self.api_structure.copy()
+        return self.results.attachments.get('api_structure', self.api_structure).copy()
     
     def reset_results(self) -> None:
         """Reset the results to an empty state."""
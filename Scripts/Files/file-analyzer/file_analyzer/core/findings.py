@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# Structured finding records and the columnar per-file container
+
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Set, Optional, Any, Iterable, Iterator, Tuple
+
+
+# Severity levels, indexed by the small integer stored per finding
+SEVERITY_LEVELS = ('low', 'medium', 'high')
+
+HIGH_SEVERITY_CATEGORIES = {
+    'password', 'private_key', 'api_key', 'aws_key', 'credit_card',
+    'social_security', 'access_token', 'security_smells', 'network_security_issues'
+}
+
+MEDIUM_SEVERITY_CATEGORIES = {
+    'high_entropy_strings', 'jwt', 'oauth_token', 'session_id', 'username',
+    'database_connection', 'http_error', 'code_quality'
+}
+
+# Sentinel for "not known" in the integer offset/line columns
+UNKNOWN = -1
+
+
+def severity_for(category: str) -> str:
+    """
+    Determine the default severity for a result category.
+
+    Args:
+        category: The result category
+
+    Returns:
+        One of SEVERITY_LEVELS
+    """
+    if category in HIGH_SEVERITY_CATEGORIES:
+        return 'high'
+    elif category in MEDIUM_SEVERITY_CATEGORIES:
+        return 'medium'
+    return 'low'
+
+
+class Finding:
+    """
+    A single analysis finding.
+
+    Findings are materialized on demand from a FindingStore; the store itself
+    only keeps the raw columns, so holding many results costs no per-object
+    overhead.
+    """
+
+    __slots__ = ('category', 'value', 'offset', 'line', 'plugin', 'severity', 'extra')
+
+    def __init__(self, category: str, value: str, offset: int = UNKNOWN, line: int = UNKNOWN,
+                 plugin: Optional[str] = None, severity: str = 'low',
+                 extra: Optional[Dict[str, Any]] = None):
+        self.category = category
+        self.value = value
+        self.offset = offset
+        self.line = line
+        self.plugin = plugin
+        self.severity = severity
+        self.extra = extra
+
+    def __repr__(self) -> str:
+        return (f"Finding(category={self.category!r}, value={self.value!r}, offset={self.offset}, "
+                f"line={self.line}, plugin={self.plugin!r}, severity={self.severity!r}, extra={self.extra!r})")
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Finding):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the finding to a JSON-serializable dictionary.
+
+        Returns:
+            Dictionary with only the fields that are known
+        """
+        data = {'value': self.value, 'severity': self.severity}
+        if self.line != UNKNOWN:
+            data['line'] = self.line
+        if self.offset != UNKNOWN:
+            data['offset'] = self.offset
+        if self.plugin:
+            data['plugin'] = self.plugin
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class CategoryView:
+    """
+    Set-like view over a single category of a FindingStore.
+
+    This keeps the historical ``results[category].add(value)`` plugin interface
+    working. Iteration yields the raw values; use ``findings()`` for the full
+    structured records.
+    """
+
+    __slots__ = ('_store', '_category')
+
+    def __init__(self, store: 'FindingStore', category: str):
+        self._store = store
+        self._category = category
+
+    def add(self, value: str, **fields) -> None:
+        """Add a value to this category (see FindingStore.add for fields)."""
+        self._store.add(self._category, value, **fields)
+
+    def update(self, values: Iterable[str]) -> None:
+        """Add several plain values to this category."""
+        for value in values:
+            self._store.add(self._category, value)
+
+    def findings(self) -> List[Finding]:
+        """Return the structured findings in this category."""
+        return self._store.findings(self._category)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.values_for(self._category))
+
+    def __len__(self) -> int:
+        return self._store.count(self._category)
+
+    def __bool__(self) -> bool:
+        return self._store.count(self._category) > 0
+
+    def __contains__(self, value: str) -> bool:
+        return value in self._store.values_for(self._category)
+
+    def __repr__(self) -> str:
+        return f"CategoryView({self._category!r}, {len(self)} findings)"
+
+
+class FindingStore:
+    """
+    Columnar container for all findings of one analyzed file.
+
+    Each finding is a row spread over compact columns (``array`` for the
+    integer fields, interned tables for categories and plugins). A finding is
+    deduplicated on (category, value, line), so the same value reported with a
+    different offset or context is stored once.
+
+    The store also behaves like the old ``Dict[str, Set[str]]`` results
+    mapping: ``results['ipv4'].add(value)``, ``'ipv4' in results`` and
+    ``results.items()`` all work.
+    """
+
+    def __init__(self, categories: Optional[Iterable[str]] = None):
+        """
+        Initialize an empty store.
+
+        Args:
+            categories: Optional categories to register up front
+        """
+        self._categories: List[str] = []
+        self._category_ids: Dict[str, int] = {}
+        self._plugins: List[Optional[str]] = [None]
+        self._plugin_ids: Dict[Optional[str], int] = {None: 0}
+
+        # Row columns
+        self._cat = array('H')
+        self._value: List[str] = []
+        self._offset = array('q')
+        self._line = array('l')
+        self._plugin = array('H')
+        self._severity = array('B')
+        self._extra: List[Optional[Dict[str, Any]]] = []
+
+        # Per-category dedup index: key -> row, in insertion order
+        self._index: List[Dict[Any, int]] = []
+
+        # Plugin attributed to findings added without an explicit plugin
+        self._current_plugin = 0
+
+        # Non-finding data produced during analysis (e.g. API structure)
+        self.attachments: Dict[str, Any] = {}
+
+        for category in categories or ():
+            self._category_id(category)
+
+    def _category_id(self, category: str) -> int:
+        cat_id = self._category_ids.get(category)
+        if cat_id is None:
+            cat_id = len(self._categories)
+            self._categories.append(category)
+            self._category_ids[category] = cat_id
+            self._index.append({})
+        return cat_id
+
+    def _plugin_id(self, plugin: Optional[str]) -> int:
+        plugin_id = self._plugin_ids.get(plugin)
+        if plugin_id is None:
+            plugin_id = len(self._plugins)
+            self._plugins.append(plugin)
+            self._plugin_ids[plugin] = plugin_id
+        return plugin_id
+
+    def add(self, category: str, value: str, offset: int = UNKNOWN, line: int = UNKNOWN,
+            plugin: Optional[str] = None, severity: Optional[str] = None,
+            extra: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Add a finding to the store.
+
+        Args:
+            category: Result category (e.g. 'ipv4', 'security_smells')
+            value: The raw finding value, without any display formatting
+            offset: Character offset in the file, if known
+            line: 1-based line number, if known
+            plugin: Name of the plugin reporting the finding
+            severity: One of SEVERITY_LEVELS; derived from the category if omitted
+            extra: Additional attributes (e.g. hash type, surrounding context)
+
+        Returns:
+            True if the finding was new, False if it was a duplicate
+        """
+        cat_id = self._category_id(category)
+        key = value if line == UNKNOWN else (value, line)
+        index = self._index[cat_id]
+        if key in index:
+            return False
+
+        if severity is None:
+            severity = severity_for(category)
+
+        index[key] = len(self._value)
+        self._cat.append(cat_id)
+        self._value.append(value)
+        self._offset.append(offset)
+        self._line.append(line)
+        self._plugin.append(self._plugin_id(plugin) if plugin is not None else self._current_plugin)
+        self._severity.append(SEVERITY_LEVELS.index(severity))
+        self._extra.append(extra or None)
+        return True
+
+    @contextmanager
+    def attributed_to(self, plugin: str):
+        """
+        Attribute findings added without an explicit plugin to ``plugin``.
+
+        Args:
+            plugin: Plugin name
+        """
+        previous = self._current_plugin
+        self._current_plugin = self._plugin_id(plugin)
+        try:
+            yield self
+        finally:
+            self._current_plugin = previous
+
+    def _row(self, row: int) -> Finding:
+        return Finding(
+            self._categories[self._cat[row]],
+            self._value[row],
+            self._offset[row],
+            self._line[row],
+            self._plugins[self._plugin[row]],
+            SEVERITY_LEVELS[self._severity[row]],
+            self._extra[row]
+        )
+
+    def findings(self, category: Optional[str] = None) -> List[Finding]:
+        """
+        Materialize findings, optionally limited to one category.
+
+        Args:
+            category: Category to return, or None for all findings
+
+        Returns:
+            List of Finding objects in insertion order
+        """
+        if category is None:
+            return [self._row(row) for row in range(len(self._value))]
+        cat_id = self._category_ids.get(category)
+        if cat_id is None:
+            return []
+        return [self._row(row) for row in self._index[cat_id].values()]
+
+    def values_for(self, category: str) -> Set[str]:
+        """
+        Get the distinct raw values recorded for a category.
+
+        Args:
+            category: The result category
+
+        Returns:
+            Set of values
+        """
+        cat_id = self._category_ids.get(category)
+        if cat_id is None:
+            return set()
+        return {self._value[row] for row in self._index[cat_id].values()}
+
+    def count(self, category: str) -> int:
+        """Number of findings in a category."""
+        cat_id = self._category_ids.get(category)
+        return len(self._index[cat_id]) if cat_id is not None else 0
+
+    def total(self, exclude: Iterable[str] = ()) -> int:
+        """
+        Count findings across all categories.
+
+        Args:
+            exclude: Categories to leave out of the count
+
+        Returns:
+            Number of findings
+        """
+        excluded = set(exclude)
+        return sum(len(index) for category, index in zip(self._categories, self._index)
+                   if category not in excluded)
+
+    def merge(self, other: 'FindingStore') -> None:
+        """
+        Merge another store (e.g. a chunk result) into this one.
+
+        Args:
+            other: Store to merge from
+        """
+        for row in range(len(other._value)):
+            self.add(
+                other._categories[other._cat[row]],
+                other._value[row],
+                offset=other._offset[row],
+                line=other._line[row],
+                plugin=other._plugins[other._plugin[row]],
+                severity=SEVERITY_LEVELS[other._severity[row]],
+                extra=other._extra[row]
+            )
+        self.attachments.update(other.attachments)
+
+    def copy(self) -> 'FindingStore':
+        """Return an independent copy of this store."""
+        clone = FindingStore(self._categories)
+        clone.merge(self)
+        return clone
+
+    # Mapping-style access kept for plugins written against Dict[str, Set[str]]
+
+    def __getitem__(self, category: str) -> CategoryView:
+        self._category_id(category)
+        return CategoryView(self, category)
+
+    def __setitem__(self, category: str, values: Iterable[str]) -> None:
+        self.discard(category)
+        self[category].update(values)
+
+    def __contains__(self, category: str) -> bool:
+        return category in self._category_ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._categories))
+
+    def __len__(self) -> int:
+        return len(self._value)
+
+    def get(self, category: str, default: Any = None) -> Any:
+        return CategoryView(self, category) if category in self._category_ids else default
+
+    def setdefault(self, category: str, default: Any = None) -> CategoryView:
+        return self[category]
+
+    def keys(self) -> List[str]:
+        return list(self._categories)
+
+    def items(self) -> List[Tuple[str, CategoryView]]:
+        return [(category, CategoryView(self, category)) for category in self._categories]
+
+    def values(self) -> List[CategoryView]:
+        return [CategoryView(self, category) for category in self._categories]
+
+    def discard(self, category: str) -> None:
+        """
+        Remove all findings of a category.
+
+        Args:
+            category: The result category
+        """
+        cat_id = self._category_ids.get(category)
+        if cat_id is None or not self._index[cat_id]:
+            return
+
+        # Rebuild the columns without the discarded rows
+        keep = [row for row in range(len(self._value)) if self._cat[row] != cat_id]
+        self._cat = array('H', (self._cat[row] for row in keep))
+        self._value = [self._value[row] for row in keep]
+        self._offset = array('q', (self._offset[row] for row in keep))
+        self._line = array('l', (self._line[row] for row in keep))
+        self._plugin = array('H', (self._plugin[row] for row in keep))
+        self._severity = array('B', (self._severity[row] for row in keep))
+        self._extra = [self._extra[row] for row in keep]
+
+        self._index = [{} for _ in self._categories]
+        for row in range(len(self._value)):
+            line = self._line[row]
+            value = self._value[row]
+            self._index[self._cat[row]][value if line == UNKNOWN else (value, line)] = row
@@ -12,6 +12,7 @@ from typing import Dict, Any, Optional, List
 import concurrent.futures
 
 from .core.analyzer import FileAnalyzer
+from .core.findings import FindingStore
 from .utils.dependency_checker import check_dependencies, generate_requirements_file, setup_colored_output
 from .utils.output_formatter import (
     format_results, export_results_json, create_html_report, create_csv_report
@@ -198,7 +199,7 @@ def get_files_to_analyze(args) -> List[Path]:
     return files_to_analyze
 
 
-def analyze_files(files: List[Path], config: Dict[str, Any], args) -> Dict[str, Dict[str, set]]:
+def analyze_files(files: List[Path], config: Dict[str, Any], args) -> Dict[str, FindingStore]:
     """
     Analyze multiple files with progress tracking.
     
@@ -255,7 +256,7 @@ def analyze_files(files: List[Path], config: Dict[str, Any], args) -> Dict[str,
                         results[str(file_path)] = file_results
                     except Exception as e:
                         logging.error(f"Error analyzing {file_path}: {str(e)}")
-                        results[str(file_path)] = {"error": {f"Error: {str(e)}"}}
+                        results[str(file_path)] = _error_results(e)
                     
                     # Update progress bar
                     if progress_bar:
@@ -269,7 +270,7 @@ def analyze_files(files: List[Path], config: Dict[str, Any], args) -> Dict[str,
                     results[str(file_path)] = analyzer.get_results()
                 except Exception as e:
                     logging.error(f"Error analyzing {file_path}: {str(e)}")
-                    results[str(file_path)] = {"error": {f"Error: {str(e)}"}}
+                    results[str(file_path)] = _error_results(e)
                 
                 # Update progress bar
                 if progress_bar:
@@ -296,11 +297,26 @@ def analyze_files(files: List[Path], config: Dict[str, Any], args) -> Dict[str,
                 results[str(file_path)] = analyzer.get_results()
             except Exception as e:
                 logging.error(f"Error analyzing {file_path}: {str(e)}")
-                results[str(file_path)] = {"error": {f"Error: {str(e)}"}}
+                results[str(file_path)] = _error_results(e)
     
     return results
 
 
+def _error_results(error: Exception) -> FindingStore:
+    """
+    Build a result store recording a failed analysis.
+    
+    Args:
+        error: The exception raised while analyzing
+        
+    Returns:
+        Result store with the error as a runtime error
+    """
+    results = FindingStore()
+    results.add('runtime_errors', f"Error: {str(error)}")
+    return results
+
+
 def _analyze_single_file(file_path, config):
     """
     Helper function for parallel file analysis.
@@ -321,7 +337,7 @@ def _analyze_single_file(file_path, config):
         # Include traceback for debugging
         tb = traceback.format_exc()
         logging.debug(tb)
-        return {"error": {f"Error: {str(e)}"}}
+        return _error_results(e)
 
 
 def generate_output_path(args, file_path: Path, extension: str) -> str:
@@ -344,7 +360,7 @@ def generate_output_path(args, file_path: Path, extension: str) -> str:
         return f"{file_path.stem}_analysis{extension}"
 
 
-def export_all_results(all_results: Dict[str, Dict[str, set]], args):
+def export_all_results(all_results: Dict[str, FindingStore], args):
     """
     Export results for all analyzed files based on command line arguments.
     
@@ -449,8 +465,7 @@ def main():
     if not args.quiet:
         # Calculate total findings
         total_findings = sum(
-            sum(len(values) for key, values in results.items() 
-                if isinstance(values, set) and key not in ['file_metadata', 'runtime_errors'])
+            results.total(exclude=('file_metadata', 'runtime_errors'))
             for results in all_results.values()
         )
         
@@ -7,6 +7,7 @@ from pathlib import Path
 from typing import Dict, Set, Optional, Tuple, Any
 
 from ..base_plugin import AnalyzerPlugin
+from ...core.findings import FindingStore
 from ...core.patterns import get_patterns
 
 class APIAnalyzer(AnalyzerPlugin):
@@ -62,7 +63,7 @@ class APIAnalyzer(AnalyzerPlugin):
             '.yaml', '.yml', '.md', '.txt', '.log'
         }
     
-    def analyze(self, file_path: Path, file_type: str, content: str, results: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    def analyze(self, file_path: Path, file_type: str, content: str, results: FindingStore) -> FindingStore:
         """
         Analyze file content for API-related information.
         
@@ -90,11 +91,11 @@ class APIAnalyzer(AnalyzerPlugin):
         self.extract_complete_api_requests(content, results)
         
         # Store API structure in the analyzer's state
-        results['_api_structure'] = self.api_structure
+        results.attachments['api_structure'] = self.api_structure
         
         return results
     
-    def extract_api_structure(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def extract_api_structure(self, content: str, results: FindingStore) -> None:
         """
         Extract and correlate API endpoints with their methods, parameters, and response types.
         
@@ -155,7 +156,7 @@ class APIAnalyzer(AnalyzerPlugin):
         # Store the API structure for later use
         self.api_structure = endpoints
     
-    def detect_api_frameworks(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def detect_api_frameworks(self, content: str, results: FindingStore) -> None:
         """
         Detect common API frameworks and patterns.
         
@@ -191,7 +192,7 @@ class APIAnalyzer(AnalyzerPlugin):
                 results['api_framework'].add(framework)
                 logging.info(f"Detected API framework: {framework}")
     
-    def extract_api_responses(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def extract_api_responses(self, content: str, results: FindingStore) -> None:
         """
         Extract and categorize API responses by success/failure status.
         
@@ -257,7 +258,7 @@ class APIAnalyzer(AnalyzerPlugin):
             
             results['failed_json_request'].add(json_sample)
     
-    def extract_complete_api_requests(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def extract_complete_api_requests(self, content: str, results: FindingStore) -> None:
         """
         Extract complete API requests including method, endpoint, headers, and payload.
         
@@ -265,10 +266,6 @@ class APIAnalyzer(AnalyzerPlugin):
             content: The file content to analyze
             results: Results dictionary to update
         """
-        # Initialize request examples collection if it doesn't exist
-        if 'api_request_examples' not in results:
-            results['api_request_examples'] = set()
-        
         # Look for patterns that might indicate complete API requests
         request_patterns = [
             # cURL command pattern
@@ -5,6 +5,8 @@ import abc
 from typing import Dict, Any, Set, Optional
 from pathlib import Path
 
+from ..core.findings import FindingStore
+
 
 class AnalyzerPlugin(abc.ABC):
     """
@@ -58,17 +60,21 @@ class AnalyzerPlugin(abc.ABC):
         pass
     
     @abc.abstractmethod
-    def analyze(self, file_path: Path, file_type: str, content: str, results: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    def analyze(self, file_path: Path, file_type: str, content: str, results: FindingStore) -> FindingStore:
         """
-        Analyze the file content and update the results dictionary.
+        Analyze the file content and update the result store.
+        
+        Findings should be added with ``results.add(category, value, ...)``,
+        passing positional details (line, offset) and attributes as fields
+        instead of formatting them into the value.
         
         Args:
             file_path: Path to the file
             file_type: Detected file type
             content: Content of the file
-            results: Existing results dictionary to update
+            results: Existing result store to update
             
         Returns:
-            Updated results dictionary
+            Updated result store
         """
         pass 
\ No newline at end of file
@@ -5,11 +5,12 @@ import re
 import json
 import logging
 from pathlib import Path
-from typing import Dict, Set, Optional, List, Any
+from typing import Set, Optional, List, Any
 from collections import defaultdict
 import os
 
 from ...core.patterns import get_language_security_patterns, get_network_patterns
+from ...core.findings import FindingStore
 from ..base_plugin import AnalyzerPlugin
 
 class JavaScriptCodeAnalyzer(AnalyzerPlugin):
@@ -144,7 +145,7 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
         
         return False
     
-    def analyze(self, file_path: Path, file_type: str, content: str, results: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    def analyze(self, file_path: Path, file_type: str, content: str, results: FindingStore) -> FindingStore:
         """
         Analyze JavaScript code for security issues, frameworks used, and complexity.
         
@@ -189,7 +190,7 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
             results['code_quality'].add(f"Error analyzing file: {str(e)}")
             return results
     
-    def _check_security_patterns(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _check_security_patterns(self, content: str, results: FindingStore) -> None:
         """
         Check content for known security smells using regex patterns.
         
@@ -202,10 +203,10 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
             for match in matches:
                 line_no = content[:match.start()].count('\n') + 1
                 context = self._get_context(content, match.start(), 20)
-                finding = f"{smell_name} (line {line_no}): {context.strip()}"
-                results['security_smells'].add(finding)
+                results.add('security_smells', smell_name, offset=match.start(), line=line_no,
+                            extra={'context': context.strip()})
     
-    def _detect_frameworks(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _detect_frameworks(self, content: str, results: FindingStore) -> None:
         """
         Detect JavaScript frameworks and libraries used in the code.
         
@@ -217,7 +218,7 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
             if re.search(pattern, content, re.MULTILINE):
                 results['api_framework'].add(f"JavaScript framework: {framework}")
     
-    def _detect_commented_code(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _detect_commented_code(self, content: str, results: FindingStore) -> None:
         """
         Detect commented code in JavaScript files.
         
@@ -238,9 +239,9 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
                 # Skip if it's a documentation comment
                 if '/**' in comment and '*/' in comment and ('@param' in comment or '@return' in comment):
                     continue
-                results['commented_code'].add(f"Commented code at line {line_no}")
+                results.add('commented_code', "Commented code", offset=match.start(), line=line_no)
     
-    def _analyze_code_complexity(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _analyze_code_complexity(self, content: str, results: FindingStore) -> None:
         """
         Analyze code complexity in JavaScript files.
         
@@ -258,34 +259,34 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
                     function_code = match.group(0)
                     lines = function_code.count('\n') + 1
                     if lines > self.complexity_thresholds['max_function_length']:
-                        results['code_complexity'].add(f"Long function with {lines} lines at line {line_no}")
+                        results.add('code_complexity', f"Long function with {lines} lines", line=line_no)
                 
                 elif complexity_type == 'nested_callbacks':
-                    results['code_complexity'].add(f"Nested callbacks (promise chain) at line {line_no}")
+                    results.add('code_complexity', "Nested callbacks (promise chain)", line=line_no)
                 
                 elif complexity_type == 'deep_nesting':
-                    results['code_complexity'].add(f"Deep nesting detected at line {line_no}")
+                    results.add('code_complexity', "Deep nesting detected", line=line_no)
                 
                 elif complexity_type == 'long_line':
-                    results['code_complexity'].add(f"Long line ({len(match.group(0))} chars) at line {line_no}")
+                    results.add('code_complexity', f"Long line ({len(match.group(0))} chars)", line=line_no)
                 
                 elif complexity_type == 'large_object':
-                    results['code_complexity'].add(f"Complex object literal at line {line_no}")
+                    results.add('code_complexity', "Complex object literal", line=line_no)
                 
                 elif complexity_type == 'multiple_returns':
-                    results['code_complexity'].add(f"Multiple return statements in function at line {line_no}")
+                    results.add('code_complexity', "Multiple return statements in function", line=line_no)
                 
                 elif complexity_type == 'many_parameters':
                     params = match.group(0)
                     param_count = params.count(',') + 1
                     if param_count > self.complexity_thresholds['max_params']:
-                        results['code_complexity'].add(f"Function with {param_count} parameters at line {line_no}")
+                        results.add('code_complexity', f"Function with {param_count} parameters", line=line_no)
                 
                 elif complexity_type == 'complex_regex':
-                    results['code_complexity'].add(f"Complex regex pattern at line {line_no}")
+                    results.add('code_complexity', "Complex regex pattern", line=line_no)
                 
                 elif complexity_type == 'complex_ternary':
-                    results['code_complexity'].add(f"Complex nested ternary expression at line {line_no}")
+                    results.add('code_complexity', "Complex nested ternary expression", line=line_no)
         
         # Additional complexity metrics
         
@@ -299,7 +300,7 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
         if lines > self.complexity_thresholds['max_file_size']:
             results['code_complexity'].add(f"Very large file with {lines} lines")
     
-    def _detect_api_usage(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _detect_api_usage(self, content: str, results: FindingStore) -> None:
         """
         Detect API endpoints and usage patterns in JavaScript code.
         
@@ -321,16 +322,15 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
         for client, pattern in http_patterns.items():
             matches = re.finditer(pattern, content, re.MULTILINE)
             for match in matches:
-                line_no = content[:match.start()].count('\n') + 1
                 url = match.group('url') if 'url' in match.groupdict() else "unknown"
                 
                 # Skip relative URLs without domains
                 if not re.match(r'^https?://', url) and not url.startswith('/api/'):
                     continue
                     
-                results['api_endpoint'].add(f"API endpoint ({client}): {url}")
+                results.add('api_endpoint', url, offset=match.start(), extra={'client': client})
     
-    def _detect_network_features(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _detect_network_features(self, content: str, results: FindingStore) -> None:
         """
         Detect network protocols and security issues.
         
@@ -349,9 +349,10 @@ class JavaScriptCodeAnalyzer(AnalyzerPlugin):
             for match in matches:
                 line_no = content[:match.start()].count('\n') + 1
                 context = self._get_context(content, match.start(), 20)
-                results['network_security_issues'].add(f"{issue} at line {line_no}: {context.strip()}")
+                results.add('network_security_issues', issue, offset=match.start(), line=line_no,
+                            extra={'context': context.strip()})
     
-    def _analyze_package_json(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _analyze_package_json(self, content: str, results: FindingStore) -> None:
         """
         Analyze package.json for dependencies and potential issues.
         
@@ -5,9 +5,10 @@ import re
 import logging
 import ast
 from pathlib import Path
-from typing import Dict, Set, Optional
+from typing import Set, Optional
 
 from ...core.patterns import get_language_security_patterns
+from ...core.findings import FindingStore
 from ..base_plugin import AnalyzerPlugin
 
 class PythonCodeAnalyzer(AnalyzerPlugin):
@@ -49,7 +50,7 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
         """
         return file_path.suffix.lower() in {'.py', '.pyw'} or file_type == 'text'
     
-    def analyze(self, file_path: Path, file_type: str, content: str, results: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    def analyze(self, file_path: Path, file_type: str, content: str, results: FindingStore) -> FindingStore:
         """
         Analyze Python code for security issues and complexity.
         
@@ -80,15 +81,15 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
             return results
             
         except SyntaxError as e:
-            line_no = getattr(e, 'lineno', '?')
-            results['code_quality'].add(f"Python syntax error at line {line_no}: {str(e)}")
+            results.add('code_quality', "Python syntax error", line=getattr(e, 'lineno', None) or -1,
+                        extra={'context': str(e)})
             logging.warning(f"Syntax error in {file_path}: {str(e)}")
             return results
         except Exception as e:
             logging.error(f"Error analyzing Python code: {str(e)}")
             return results
     
-    def _check_security_patterns(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _check_security_patterns(self, content: str, results: FindingStore) -> None:
         """
         Check content for known security smells using regex patterns.
         
@@ -102,11 +103,10 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
                 line_no = content[:match.start()].count('\n') + 1
                 # Extract surrounding context (20 chars before and after)
                 context = content[max(0, match.start() - 20):min(len(content), match.end() + 20)]
-                # Format the finding
-                finding = f"{smell_name} (line {line_no}): {context.strip()}"
-                results['security_smells'].add(finding)
+                results.add('security_smells', smell_name, offset=match.start(), line=line_no,
+                            extra={'context': context.strip()})
     
-    def _check_code_complexity(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _check_code_complexity(self, content: str, results: FindingStore) -> None:
         """
         Check code complexity using radon if available.
         
@@ -123,9 +123,8 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
             complexities = cc_visit(content)
             for item in complexities:
                 if item.complexity > 10:  # Threshold for high complexity
-                    results['code_complexity'].add(
-                        f"High complexity ({item.complexity}) in {item.name} at line {item.lineno}"
-                    )
+                    results.add('code_complexity', f"High complexity in {item.name}", line=item.lineno,
+                                extra={'complexity': item.complexity})
             
             # Calculate maintainability index
             h_visit_result = h_visit(content)
@@ -138,7 +137,7 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
         except Exception as e:
             logging.warning(f"Error calculating code metrics: {str(e)}")
     
-    def _analyze_ast_security(self, tree: ast.AST, content: str, results: Dict[str, Set[str]]) -> None:
+    def _analyze_ast_security(self, tree: ast.AST, content: str, results: FindingStore) -> None:
         """
         Analyze Python code using AST for security vulnerabilities.
         
@@ -158,9 +157,8 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
                 dangerous_modules = ['pickle', 'marshal', 'shelve', 'dill']
                 for name in node.names:
                     if name.name in dangerous_modules:
-                        self.results['security_smells'].add(
-                            f"Dangerous module import: {name.name} (line {node.lineno})"
-                        )
+                        self.results.add('security_smells', f"Dangerous module import: {name.name}",
+                                         line=node.lineno)
                 self.generic_visit(node)
                 
             def visit_Call(self, node):
@@ -168,9 +166,8 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
                 if isinstance(node.func, ast.Name):
                     # Check for eval/exec
                     if node.func.id in ['eval', 'exec']:
-                        self.results['security_smells'].add(
-                            f"Dangerous function call: {node.func.id} (line {node.lineno})"
-                        )
+                        self.results.add('security_smells', f"Dangerous function call: {node.func.id}",
+                                         line=node.lineno)
                     
                     # Check for file operations
                     if node.func.id == 'open':
@@ -179,9 +176,8 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
                             path = node.args[0].s
                             if any(keyword in path.lower() for keyword in 
                                   ['secret', 'password', 'key', 'credential', 'token']):
-                                self.results['security_smells'].add(
-                                    f"Sensitive file operation: open('{path}') at line {node.lineno}"
-                                )
+                                self.results.add('security_smells', f"Sensitive file operation: open('{path}')",
+                                                 line=node.lineno)
                             
                             # Check for world-writable files
                             if len(node.args) > 1 and isinstance(node.args[1], ast.Str):
@@ -189,18 +185,18 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
                                 if 'w' in mode:
                                     # Check for absolute paths that might be world-writable
                                     if path.startswith('/'):
-                                        self.results['security_smells'].add(
-                                            f"Potentially insecure file write: open('{path}', '{mode}') at line {node.lineno}"
-                                        )
+                                        self.results.add('security_smells',
+                                                         f"Potentially insecure file write: open('{path}', '{mode}')",
+                                                         line=node.lineno)
                 
                 # Check for subprocess calls with shell=True
                 if isinstance(node.func, ast.Attribute):
                     if isinstance(node.func.value, ast.Name) and node.func.value.id == 'subprocess':
                         for keyword in node.keywords:
                             if keyword.arg == 'shell' and isinstance(keyword.value, ast.NameConstant) and keyword.value.value is True:
-                                self.results['security_smells'].add(
-                                    f"Shell injection risk: subprocess call with shell=True at line {node.lineno}"
-                                )
+                                self.results.add('security_smells',
+                                                 "Shell injection risk: subprocess call with shell=True",
+                                                 line=node.lineno)
                 
                 self.generic_visit(node)
                 
@@ -211,16 +207,14 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
                 # Check for SQL string formatting with %
                 if isinstance(node.op, ast.Mod) and any(s in line_content.upper() for s in 
                                                       ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'EXEC']):
-                    self.results['security_smells'].add(
-                        f"Potential SQL injection with string formatting (line {node.lineno}): {line_content.strip()}"
-                    )
+                    self.results.add('security_smells', "Potential SQL injection with string formatting",
+                                     line=node.lineno, extra={'context': line_content.strip()})
                 
                 # Check for command injection with string concatenation
                 if isinstance(node.op, ast.Add) and any(s in line_content.lower() for s in 
                                                      ['os.system', 'subprocess', 'popen', 'exec']):
-                    self.results['security_smells'].add(
-                        f"Potential command injection with string concatenation (line {node.lineno}): {line_content.strip()}"
-                    )
+                    self.results.add('security_smells', "Potential command injection with string concatenation",
+                                     line=node.lineno, extra={'context': line_content.strip()})
                     
                 self.generic_visit(node)
                 
@@ -234,9 +228,9 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
                             # If variable name is sensitive, check if value is hardcoded
                             if isinstance(node.value, ast.Str):
                                 if len(node.value.s) > 3:  # Only flag non-trivial values
-                                    self.results['security_smells'].add(
-                                        f"Hardcoded sensitive value in variable '{target.id}' at line {node.lineno}"
-                                    )
+                                    self.results.add('security_smells',
+                                                     f"Hardcoded sensitive value in variable '{target.id}'",
+                                                     line=node.lineno)
                 
                 self.generic_visit(node)
                 
@@ -247,9 +241,9 @@ class PythonCodeAnalyzer(AnalyzerPlugin):
                     if hasattr(arg, 'arg') and arg.arg.lower() in ['password', 'secret', 'token', 'key']:
                         # Function with sensitive parameter but no type annotation
                         if not hasattr(arg, 'annotation') or arg.annotation is None:
-                            self.results['security_smells'].add(
-                                f"Function '{node.name}' receives sensitive parameter '{arg.arg}' without type annotation at line {node.lineno}"
-                            )
+                            self.results.add('security_smells',
+                                             f"Function '{node.name}' receives sensitive parameter '{arg.arg}' without type annotation",
+                                             line=node.lineno)
                 
                 self.generic_visit(node)
         
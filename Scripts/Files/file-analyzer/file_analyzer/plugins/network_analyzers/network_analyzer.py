@@ -4,9 +4,10 @@
 import re
 import logging
 from pathlib import Path
-from typing import Dict, Set, Optional
+from typing import Set, Optional
 
 from ..base_plugin import AnalyzerPlugin
+from ...core.findings import FindingStore
 from ...core.patterns import get_network_patterns
 
 
@@ -53,7 +54,7 @@ class NetworkAnalyzer(AnalyzerPlugin):
             '.xml', '.log', '.txt', '.html', '.md', '.sh', '.bash', 'Dockerfile'
         }
     
-    def analyze(self, file_path: Path, file_type: str, content: str, results: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    def analyze(self, file_path: Path, file_type: str, content: str, results: FindingStore) -> FindingStore:
         """
         Analyze file content for network-related information.
         
@@ -82,7 +83,7 @@ class NetworkAnalyzer(AnalyzerPlugin):
         
         return results
     
-    def _analyze_network_protocols(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _analyze_network_protocols(self, content: str, results: FindingStore) -> None:
         """
         Analyze content for network protocol indicators.
         
@@ -99,7 +100,7 @@ class NetworkAnalyzer(AnalyzerPlugin):
                 results['network_protocols'].add(protocol)
                 logging.debug(f"Detected network protocol: {protocol}")
     
-    def _analyze_network_security_issues(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _analyze_network_security_issues(self, content: str, results: FindingStore) -> None:
         """
         Identify potential network security issues.
         
@@ -121,12 +122,12 @@ class NetworkAnalyzer(AnalyzerPlugin):
                 # This grabs 20 characters before and after the match for context
                 context = content[max(0, match.start() - 20):min(len(content), match.end() + 20)].strip()
                 
-                # Format the finding with line number and context
-                finding = f"{issue} (line {line_no}): {context}"
-                results['network_security_issues'].add(finding)
+                # Record the finding with line number and context
+                results.add('network_security_issues', issue, offset=match.start(), line=line_no,
+                            extra={'context': context})
                 logging.debug(f"Detected network security issue: {issue} at line {line_no}")
     
-    def _extract_network_configuration(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _extract_network_configuration(self, content: str, results: FindingStore) -> None:
         """
         Extract network configuration details like ports and hostnames.
         
@@ -151,9 +152,8 @@ class NetworkAnalyzer(AnalyzerPlugin):
                         sensitive_ports = {21, 22, 23, 25, 445, 1433, 3306, 3389, 5432, 27017}
                         if port_number in sensitive_ports:
                             service = self._get_port_service(port_number)
-                            results['network_security_issues'].add(
-                                f"Potentially sensitive port used: {port} (common for {service})"
-                            )
+                            results.add('network_security_issues', f"Potentially sensitive port used: {port}",
+                                        offset=match.start(), extra={'service': service})
                 except ValueError:
                     continue
         
@@ -172,7 +172,7 @@ class NetworkAnalyzer(AnalyzerPlugin):
                         f"Hardcoded non-local IP address: {host}"
                     )
     
-    def _correlate_network_endpoints(self, content: str, results: Dict[str, Set[str]]) -> None:
+    def _correlate_network_endpoints(self, content: str, results: FindingStore) -> None:
         """
         Correlate hosts and ports to identify network endpoints.
         
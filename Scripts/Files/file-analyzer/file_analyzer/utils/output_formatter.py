@@ -1,20 +1,74 @@
 #!/usr/bin/env python3
 # Output formatting utilities
 
-from typing import Dict, Set, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import json
 import os
 import time
 import datetime
 from pathlib import Path
 
-def format_results(results: Dict[str, Set[str]], api_structure: Optional[Dict] = None, 
+from ..core.findings import Finding, FindingStore, UNKNOWN, severity_for
+
+# Extra attributes rendered after the line number rather than in parentheses
+_TRAILING_EXTRAS = ('context', 'detail')
+
+
+def format_finding(finding: Finding) -> str:
+    """
+    Render a structured finding as a single display string.
+    
+    Args:
+        finding: The finding to render
+        
+    Returns:
+        Human-readable representation, e.g. "<hash> (Type: MD5, Entropy: 3.12)"
+        or "Shell Injection (line 42): os.system(cmd)"
+    """
+    text = finding.value
+    extra = finding.extra or {}
+    
+    attributes = []
+    for key, value in extra.items():
+        if key in _TRAILING_EXTRAS:
+            continue
+        if isinstance(value, float):
+            value = f"{value:.2f}"
+        attributes.append(f"{key.replace('_', ' ').title()}: {value}")
+    if attributes:
+        text += f" ({', '.join(attributes)})"
+    
+    if finding.line != UNKNOWN:
+        text += f" (line {finding.line})"
+    
+    for key in _TRAILING_EXTRAS:
+        if key in extra:
+            text += f": {extra[key]}"
+    
+    return text
+
+
+def _rendered_values(results: FindingStore, data_type: str) -> List[str]:
+    """
+    Render and sort the findings of one category for display.
+    
+    Args:
+        results: Result store
+        data_type: The category to render
+        
+    Returns:
+        Rendered values, shorter ones first (often more relevant)
+    """
+    return sorted((format_finding(f) for f in results.findings(data_type)), key=lambda x: (len(x), x))
+
+
+def format_results(results: FindingStore, api_structure: Optional[Dict] = None, 
                    markdown_format: bool = False, colors: Optional[Dict] = None) -> str:
     """
     Format analysis results for display.
     
     Args:
-        results: Dictionary of result categories and their values
+        results: Store of analysis findings
         api_structure: API structure correlation data (optional)
         markdown_format: Whether to format for markdown
         colors: Dictionary of color functions (optional)
@@ -37,17 +91,21 @@ def format_results(results: Dict[str, Set[str]], api_structure: Optional[Dict] =
     output.append(f"{colors['bold']('=== File Analysis Results ===')}")
     output.append(f"{colors['blue']('Generated on:')} {current_time}\n")
     
+    # Use the API structure gathered during analysis if none was given
+    if api_structure is None:
+        api_structure = results.attachments.get('api_structure')
+    
     # Add file metadata if available
-    if 'file_metadata' in results and results['file_metadata']:
+    if results.count('file_metadata'):
         output.append(f"{colors['cyan']('File Metadata:')}")
-        for metadata in sorted(results['file_metadata']):
+        for metadata in sorted(format_finding(f) for f in results.findings('file_metadata')):
             output.append(f"  {metadata}")
         output.append("")
     
     # Check for runtime errors
-    if 'runtime_errors' in results and results['runtime_errors']:
+    if results.count('runtime_errors'):
         output.append(f"{colors['red']('Runtime Errors:')}")
-        for error in sorted(results['runtime_errors']):
+        for error in sorted(format_finding(f) for f in results.findings('runtime_errors')):
             output.append(f"  ! {error}")
         output.append("")
     
@@ -88,8 +146,7 @@ def format_results(results: Dict[str, Set[str]], api_structure: Optional[Dict] =
     }
 
     # Count total findings
-    total_findings = sum(len(values) for values in results.values() 
-                        if isinstance(values, set) and values)
+    total_findings = results.total()
     
     output.append(f"{colors['green']('Total Findings:')} {total_findings}")
     
@@ -100,8 +157,7 @@ def format_results(results: Dict[str, Set[str]], api_structure: Optional[Dict] =
         
         # Count findings in this category
         for data_type in data_types:
-            if data_type in results and results[data_type]:
-                category_findings += len(results[data_type])
+            category_findings += results.count(data_type)
         
         if category_findings == 0:
             continue
@@ -109,12 +165,9 @@ def format_results(results: Dict[str, Set[str]], api_structure: Optional[Dict] =
         category_output.append(f"\n{colors['cyan'](category)} ({category_findings} findings):")
         
         for data_type in data_types:
-            if data_type in results and results[data_type]:
-                values = results[data_type]
-                category_output.append(f"  {colors['green'](data_type.replace('_', ' ').title())} ({len(values)} found):")
-                
-                # Sort values but prioritize shorter ones first (often more relevant)
-                sorted_values = sorted(values, key=lambda x: (len(x), x))
+            if results.count(data_type):
+                sorted_values = _rendered_values(results, data_type)
+                category_output.append(f"  {colors['green'](data_type.replace('_', ' ').title())} ({len(sorted_values)} found):")
                 
                 for value in sorted_values:
                     # Apply special formatting to different types of findings
@@ -177,32 +230,26 @@ def _get_severity_class(data_type: str) -> str:
     Returns:
         CSS class name for the severity
     """
-    high_severity = [
-        'password', 'private_key', 'api_key', 'aws_key', 'credit_card', 
-        'social_security', 'access_token', 'security_smells', 'network_security_issues'
-    ]
+    severity = severity_for(data_type)
     
-    medium_severity = [
-        'high_entropy_strings', 'jwt', 'oauth_token', 'session_id', 'username',
-        'database_connection', 'http_error', 'code_quality'
-    ]
-    
-    if data_type in high_severity:
+    if severity == 'high':
         return "high-severity"
-    elif data_type in medium_severity:
+    elif severity == 'medium':
         return "medium-severity"
     else:
         return "normal"
 
-def export_results_json(results: Dict[str, Set[str]], output_file: str) -> None:
+def export_results_json(results: FindingStore, output_file: str) -> None:
     """
     Export analysis results to a JSON file.
     
+    Each category maps to a list of finding records (value, severity and,
+    when known, line, offset, plugin and extra attributes).
+    
     Args:
-        results: Dictionary of result categories and their values
+        results: Store of analysis findings
         output_file: Path to save the JSON file
     """
-    # Convert sets to lists for JSON serialization
     json_results = {}
     
     # Add timestamp
@@ -212,8 +259,12 @@ def export_results_json(results: Dict[str, Set[str]], output_file: str) -> None:
         "version": "1.0.0"
     }
     
-    for key, value in results.items():
-        json_results[key] = sorted(list(value)) if isinstance(value, set) else value
+    for key in results.keys():
+        json_results[key] = sorted((f.to_dict() for f in results.findings(key)),
+                                   key=lambda record: (record['value'], record.get('line', -1)))
+    
+    if results.attachments.get('api_structure'):
+        json_results["_api_structure"] = results.attachments['api_structure']
     
     # Ensure directory exists
     output_dir = os.path.dirname(output_file)
@@ -221,17 +272,19 @@ def export_results_json(results: Dict[str, Set[str]], output_file: str) -> None:
         os.makedirs(output_dir, exist_ok=True)
     
     with open(output_file, 'w') as f:
-        json.dump(json_results, f, indent=2, sort_keys=True)
+        # The API structure holds sets of methods/parameters
+        json.dump(json_results, f, indent=2, sort_keys=True,
+                  default=lambda o: sorted(o) if isinstance(o, set) else str(o))
     
     print(f"Results exported to {output_file}")
 
-def create_html_report(results: Dict[str, Set[str]], api_structure: Optional[Dict] = None, 
+def create_html_report(results: FindingStore, api_structure: Optional[Dict] = None, 
                       output_file: str = "file_analysis_report.html") -> None:
     """
     Create an HTML report from the analysis results.
     
     Args:
-        results: Dictionary of result categories and their values
+        results: Store of analysis findings
         api_structure: API structure correlation data (optional)
         output_file: Path to save the HTML report
     """
@@ -272,17 +325,17 @@ def create_html_report(results: Dict[str, Set[str]], api_structure: Optional[Dic
         'Runtime': ['runtime_errors', 'file_metadata']
     }
     
+    # Use the API structure gathered during analysis if none was given
+    if api_structure is None:
+        api_structure = results.attachments.get('api_structure')
+    
     # Get file metadata
     file_metadata = {}
-    if 'file_metadata' in results:
-        for metadata in results['file_metadata']:
-            if ':' in metadata:
-                key, value = metadata.split(':', 1)
-                file_metadata[key.strip()] = value.strip()
+    for metadata in results.findings('file_metadata'):
+        file_metadata[metadata.value] = (metadata.extra or {}).get('detail', '')
     
     # Count total findings
-    total_findings = sum(len(values) for key, values in results.items() 
-                        if isinstance(values, set) and key != 'file_metadata' and key != 'runtime_errors')
+    total_findings = results.total(exclude=('file_metadata', 'runtime_errors'))
     
     # Start building HTML content
     html_content = """
@@ -495,14 +548,14 @@ def create_html_report(results: Dict[str, Set[str]], api_structure: Optional[Dic
         """
     
     # Add runtime errors if any
-    if 'runtime_errors' in results and results['runtime_errors']:
+    if results.count('runtime_errors'):
         html_content += """
             <div class="error-section">
                 <h3>Runtime Errors</h3>
                 <ul>
         """
         
-        for error in sorted(results['runtime_errors']):
+        for error in sorted(format_finding(f) for f in results.findings('runtime_errors')):
             html_content += f'<li>{error}</li>'
             
         html_content += """
@@ -527,9 +580,9 @@ def create_html_report(results: Dict[str, Set[str]], api_structure: Optional[Dic
             
         # Check if this category has any content
         for data_type in data_types:
-            if data_type in results and results[data_type]:
+            if results.count(data_type):
                 category_has_content = True
-                category_findings += len(results[data_type])
+                category_findings += results.count(data_type)
                 
         if not category_has_content:
             continue
@@ -541,24 +594,21 @@ def create_html_report(results: Dict[str, Set[str]], api_structure: Optional[Dic
         '''
         
         for data_type in data_types:
-            if data_type in results and results[data_type]:
-                values = results[data_type]
+            if results.count(data_type):
+                sorted_values = _rendered_values(results, data_type)
                 severity_class = _get_severity_class(data_type)
                 
                 # Create a collapsible section for each data type
                 html_content += f'''
                 <button class="collapsible">
                     {data_type.replace('_', ' ').title()} 
-                    <span class="badge badge-{'danger' if severity_class == 'high-severity' else 'warning' if severity_class == 'medium-severity' else 'primary'}">{len(values)}</span>
+                    <span class="badge badge-{'danger' if severity_class == 'high-severity' else 'warning' if severity_class == 'medium-severity' else 'primary'}">{len(sorted_values)}</span>
                 </button>
                 <div class="content">
                     <div class="datatype">
                         <div class="values-container">
                 '''
                 
-                # Sort values but prioritize shorter ones first (often more relevant)
-                sorted_values = sorted(values, key=lambda x: (len(x), x))
-                
                 for value in sorted_values:
                     # Apply special class based on data type
                     value_class = severity_class
@@ -665,12 +715,12 @@ def create_html_report(results: Dict[str, Set[str]], api_structure: Optional[Dic
     
     print(f"HTML report created at {output_file}")
 
-def create_csv_report(results: Dict[str, Set[str]], output_file: str = "file_analysis_report.csv") -> None:
+def create_csv_report(results: FindingStore, output_file: str = "file_analysis_report.csv") -> None:
     """
     Create a CSV report from the analysis results.
     
     Args:
-        results: Dictionary of result categories and their values
+        results: Store of analysis findings
         output_file: Path to save the CSV report
     """
     import csv
@@ -684,26 +734,20 @@ def create_csv_report(results: Dict[str, Set[str]], output_file: str = "file_ana
         writer = csv.writer(f)
         
         # Write header
-        writer.writerow(['Category', 'Type', 'Value', 'Severity'])
+        writer.writerow(['Category', 'Type', 'Value', 'Severity', 'Line', 'Plugin'])
         
         # Write data
-        for category, values in sorted(results.items()):
-            if not isinstance(values, set) or not values:
-                continue
-                
-            severity = "High" if category in [
-                'password', 'private_key', 'api_key', 'aws_key', 'credit_card', 
-                'security_smells', 'network_security_issues'
-            ] else "Medium" if category in [
-                'high_entropy_strings', 'jwt', 'oauth_token', 'session_id'
-            ] else "Low"
+        for category in sorted(results.keys()):
+            findings = sorted(results.findings(category), key=lambda f: (f.value, f.line))
             
-            for value in sorted(values):
+            for finding in findings:
                 writer.writerow([
                     category.replace('_', ' ').title(),
                     category,
-                    value,
-                    severity
+                    format_finding(finding),
+                    finding.severity.title(),
+                    finding.line if finding.line != UNKNOWN else '',
+                    finding.plugin or ''
                 ])
     
     print(f"CSV report created at {output_file}") 
\ No newline at end of file
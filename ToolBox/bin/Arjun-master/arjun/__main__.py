@@ -5,12 +5,13 @@ from arjun.core.colors import green, end, info, bad, good, run, res
 
 import argparse
 import json
+import contextvars
 
 from urllib.parse import urlparse
 import arjun.core.config as mem
 from arjun.core.exporter import exporter
 from arjun.core.anomaly import define, compare
-from arjun.core.utils import fetch_params, stable_request, random_str, slicer, confirm, populate, reader, nullify, prepare_requests, compatible_path
+from arjun.core.utils import fetch_params, stable_request, random_str, slicer, confirm, reader, nullify, prepare_requests, compatible_path, Wordlist
 
 from arjun.plugins.heuristic import heuristic
 
@@ -36,8 +37,18 @@ parser.add_argument('--passive', help='Collect parameter names from passive sour
 parser.add_argument('--stable', help='Prefer stability over speed.', dest='stable', action='store_true')
 parser.add_argument('--include', help='Include this data in every request.', dest='include', default={})
 parser.add_argument('--disable-redirects', help='disable redirects', dest='disable_redirects', action='store_true')
+parser.add_argument('--adaptive', help='Size chunks from the largest request the target accepts and split them by how many parameters they likely hold.', dest='adaptive', action='store_true')
+parser.add_argument('--parallel', help='Number of imported targets to scan at once. (default: 1)', dest='parallel', type=int, default=1)
+parser.add_argument('--host-rate-limit', help='Max number of requests to be sent out per second to the same host, across all targets on it. (default: no limit)', dest='host_rate_limit', type=float, default=0)
+parser.add_argument('--host-parallel', help='Number of targets on the same host to scan at once with --parallel. (default: 1)', dest='host_parallel', type=int, default=1)
+parser.add_argument('--async', help='Send probes from a single thread with asyncio, up to N at a time, and split chunks as soon as their responses arrive. (default: 100)', dest='async_requests', type=int, nargs='?', const=100, default=0)
 args = parser.parse_args() # arguments to be parsed
 
+if args.parallel < 1 or args.host_parallel < 1:
+    parser.error('--parallel and --host-parallel must be at least 1')
+if args.host_rate_limit < 0:
+    parser.error('--host-rate-limit can\'t be negative')
+
 if args.quiet:
     print = nullify
 
@@ -48,7 +59,7 @@ print('''%s    _
 ''' % (green, __import__('arjun').__version__, end))
 
 try:
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 except ImportError:
     print('%s Please use Python > 3.2 to run Arjun.' % bad)
     quit()
@@ -62,6 +73,8 @@ if mem.var['method'] != 'GET':
 
 if mem.var['stable'] or mem.var['delay']:
     mem.var['threads'] = 1
+    if mem.var['async_requests']:
+        mem.var['async_requests'] = 1
 if mem.var['wordlist'] in ('large', 'medium', 'small'):
     mem.var['wordlist'] = f'{arjun_dir}/db/{mem.var["wordlist"]}.txt'
 
@@ -77,7 +90,7 @@ try:
         passive_params = fetch_params(host)
         wordlist.update(passive_params)
         print('%s Collected %s parameters, added to the wordlist' % (info, len(passive_params)))
-    wordlist = list(wordlist)
+    wordlist = Wordlist(wordlist)
 except FileNotFoundError:
     exit('%s The specified file for parameters doesn\'t exist' % bad)
 
@@ -89,6 +102,8 @@ if not args.url and not args.import_file:
 
 from arjun.core.requester import requester
 from arjun.core.bruter import bruter
+from arjun.core.engine import find_anomalous
+from arjun.core.adaptive import Planner, probe_chunk_size
 
 def narrower(request, factors, param_groups):
     """
@@ -97,16 +112,41 @@ def narrower(request, factors, param_groups):
     """
     anomalous_params = []
     threadpool = ThreadPoolExecutor(max_workers=mem.var['threads'])
-    futures = (threadpool.submit(bruter, request, factors, params) for params in param_groups)
+    futures = (threadpool.submit(contextvars.copy_context().run, bruter, request, factors, params) for params in param_groups)
     for i, result in enumerate(as_completed(futures)):
         if result.result():
             anomalous_params.extend(slicer(result.result()))
-        if mem.var['kill']:
+        if mem.state()['kill']:
             return anomalous_params
-        print('%s Processing chunks: %i/%-6i' % (info, i + 1, len(param_groups)), end='\r')
+        if mem.var['parallel'] == 1:
+            print('%s Processing chunks: %i/%-6i' % (info, i + 1, len(param_groups)), end='\r')
     return anomalous_params
 
 
+def planned_narrower(request, factors, chunks, planner, first_round=False):
+    """
+    sends a round of chunks and lets the planner decide which chunks to send next
+    returns list of chunks, number of chunks that caused anomalies
+    """
+    results = []
+    threadpool = ThreadPoolExecutor(max_workers=mem.var['threads'])
+    futures = {threadpool.submit(contextvars.copy_context().run, bruter, request, factors, chunk[0]): chunk for chunk in chunks}
+    for i, result in enumerate(as_completed(futures)):
+        results.append((futures[result], bool(result.result())))
+        if mem.state()['kill']:
+            return [], 0
+        if mem.var['parallel'] == 1:
+            print('%s Processing chunks: %i/%-6i' % (info, i + 1, len(chunks)), end='\r')
+    # the whole first round counts towards the estimated density before anything is split
+    if first_round:
+        for chunk, anomalous in results:
+            planner.record(chunk[0], anomalous)
+    next_chunks = []
+    for chunk, anomalous in results:
+        next_chunks.extend(planner.next(chunk, anomalous))
+    return next_chunks, sum(anomalous for chunk, anomalous in results)
+
+
 def initialize(request, wordlist, single_url=False):
     """
     handles parameter finding process for a single request object
@@ -140,6 +180,8 @@ def initialize(request, wordlist, single_url=False):
             if not reason:
                 break
             factors[reason] = False
+        # the rules won't change from here on, so compare() can remember its verdicts
+        factors['fingerprints'] = {}
         if single_url:
             print('%s Analysing HTTP response for potential parameter names' % run)
         if found:
@@ -151,25 +193,52 @@ def initialize(request, wordlist, single_url=False):
                 print('%s Heuristic scanner found %i parameter%s: %s' % (good, num, s, ', '.join(found)))
         if single_url:
             print('%s Logicforcing the URL endpoint' % run)
-        populated = populate(wordlist)
+        chunk_size = mem.var['chunks']
+        if mem.var['adaptive']:
+            chunk_size = probe_chunk_size(request, factors, chunk_size, len(wordlist))
+            print('%s Sending up to %i parameters at once' % (info, chunk_size))
         with open(f'{arjun_dir}/db/special.json', 'r') as f:
-            populated.update(json.load(f))
-        param_groups = slicer(populated, int(len(wordlist)/mem.var['chunks']))
-        prev_chunk_count = len(param_groups)
-        last_params = []
-        while True:
-            param_groups = narrower(request, factors, param_groups)
-            if len(param_groups) > prev_chunk_count:
-                response_3 = requester(request, {zzuf[:-1]: zzuf[::-1][:-1]})
-                if compare(response_3, factors, {zzuf[:-1]: zzuf[::-1][:-1]})[0] != '':
-                    print('%s Webpage is returning different content on each request. Skipping.' % bad)
-                    return []
-            if mem.var['kill']:
+            special = json.load(f)
+        param_groups = wordlist.chunks(max(int(len(wordlist)/chunk_size), 1), special)
+        if mem.var['async_requests']:
+            last_params = find_anomalous(request, factors, param_groups, {zzuf[:-1]: zzuf[::-1][:-1]})
+            if last_params == 'unstable':
+                print('%s Webpage is returning different content on each request. Skipping.' % bad)
+                return []
+            if last_params == 'killed':
                 return 'skipped'
-            param_groups = confirm(param_groups, last_params)
+        elif mem.var['adaptive']:
+            planner = Planner(adaptive=True)
+            chunks = [(params, None) for params in param_groups]
+            first_round = True
+            while chunks:
+                sent = len(chunks)
+                chunks, anomalies = planned_narrower(request, factors, chunks, planner, first_round)
+                first_round = False
+                if 2 * anomalies > sent:
+                    response_3 = requester(request, {zzuf[:-1]: zzuf[::-1][:-1]})
+                    if compare(response_3, factors, {zzuf[:-1]: zzuf[::-1][:-1]})[0] != '':
+                        print('%s Webpage is returning different content on each request. Skipping.' % bad)
+                        return []
+                if mem.state()['kill']:
+                    return 'skipped'
+            last_params = planner.found
+        else:
             prev_chunk_count = len(param_groups)
-            if not param_groups:
-                break
+            last_params = []
+            while True:
+                param_groups = narrower(request, factors, param_groups)
+                if len(param_groups) > prev_chunk_count:
+                    response_3 = requester(request, {zzuf[:-1]: zzuf[::-1][:-1]})
+                    if compare(response_3, factors, {zzuf[:-1]: zzuf[::-1][:-1]})[0] != '':
+                        print('%s Webpage is returning different content on each request. Skipping.' % bad)
+                        return []
+                if mem.state()['kill']:
+                    return 'skipped'
+                param_groups = confirm(param_groups, last_params)
+                prev_chunk_count = len(param_groups)
+                if not param_groups:
+                    break
         confirmed_params = []
         for param in last_params:
             reason = bruter(request, factors, param, mode='verify')
@@ -181,6 +250,65 @@ def initialize(request, wordlist, single_url=False):
         return confirmed_params
 
 
+def scan_target(request, states):
+    """
+    scans one of the targets scanned at the same time, with a kill switch, timeout etc. of its own
+    returns the same as initialize()
+    """
+    states.append(mem.new_state())
+    return initialize(request, wordlist.copy())
+
+
+def scan_parallel(requests):
+    """
+    scans up to --parallel targets at once, and no more than --host-parallel of them on the same host
+    the results of each target are exported as soon as it is done
+    """
+    final_result = {}
+    pending = list(requests)
+    running = {}
+    hosts = {}
+    states = []
+    count = 0
+    threadpool = ThreadPoolExecutor(max_workers=mem.var['parallel'])
+    try:
+        while pending or running:
+            for each in list(pending):
+                if len(running) == mem.var['parallel']:
+                    break
+                host = urlparse(each['url']).netloc
+                if hosts.get(host, 0) < mem.var['host_parallel']:
+                    pending.remove(each)
+                    hosts[host] = hosts.get(host, 0) + 1
+                    count += 1
+                    print('%s Scanning %d/%d: %s' % (run, count, len(requests), each['url']))
+                    running[threadpool.submit(contextvars.copy_context().run, scan_target, each, states)] = (each, each['url'], host)
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                each, url, host = running.pop(future)
+                hosts[host] -= 1
+                these_params = future.result()
+                if these_params == 'skipped':
+                    print('%s Skipped %s due to errors' % (bad, url))
+                elif these_params:
+                    final_result[url] = {}
+                    final_result[url]['params'] = these_params
+                    final_result[url]['method'] = each['method']
+                    final_result[url]['headers'] = each['headers']
+                    exporter(final_result)
+                    print('%s Parameters found for %s: %s' % (good, url, ', '.join(these_params)))
+                    if not mem.var['json_file']:
+                        final_result = {}
+                else:
+                    print('%s No parameters were discovered for %s' % (info, url))
+    except KeyboardInterrupt:
+        for state in states:
+            state['kill'] = True
+        raise
+    finally:
+        threadpool.shutdown(wait=True)
+
+
 def main():
     request = prepare_requests(args)
 
@@ -203,6 +331,8 @@ def main():
                 exporter(final_result)
             else:
                 print('%s No parameters were discovered.' % info)
+        elif type(request) == list and mem.var['parallel'] > 1:
+            scan_parallel(request)
         elif type(request) == list:
             # in case of multiple targets
             count = 0
@@ -212,7 +342,7 @@ def main():
                 mem.var['kill'] = False
                 mem.var['bad_req_count'] = 0
                 print('%s Scanning %d/%d: %s' % (run, count, len(request), url))
-                these_params = initialize(each, list(wordlist))
+                these_params = initialize(each, wordlist.copy())
                 if these_params == 'skipped':
                     print('%s Skipped %s due to errors' % (bad, url))
                 elif these_params:
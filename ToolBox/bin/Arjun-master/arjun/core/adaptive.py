@@ -0,0 +1,119 @@
+import math
+
+import arjun.core.config as mem
+
+from arjun.core.anomaly import compare
+from arjun.core.requester import requester
+from arjun.core.utils import populate, random_str, slicer
+
+
+def accepts(request, factors, size):
+    """
+    sends a chunk of made up parameters to see if the target handles a request that big like any other
+    returns True if it does, False if it doesn't, None if the target is refusing or limiting requests
+    """
+    probe = populate(['z' + random_str(7) for i in range(size)])
+    response = requester(request, probe)
+    if type(response) == str or response.status_code in (418, 429, 503):
+        return None
+    return compare(response, factors, probe)[0] == ''
+
+
+def probe_chunk_size(request, factors, start, limit):
+    """
+    finds the largest chunk the target accepts, between 10 and limit parameters
+    the size is doubled until a request is rejected (e.g. with 414) and then narrowed down to within an eighth
+    returns int
+    """
+    accepted, rejected = 0, limit + 1
+    size = min(start, limit)
+    while rejected - accepted > max(accepted // 8, 1):
+        if mem.state()['kill']:
+            break
+        result = accepts(request, factors, size)
+        if result is None:
+            break
+        if result:
+            accepted = size
+            if size == limit:
+                break
+            size = min(size * 2, limit) if rejected > limit else (size + rejected) // 2
+        else:
+            rejected = size
+            if size <= 10:
+                break
+            size = max(size // 2, 10) if not accepted else (accepted + size) // 2
+    # nothing was accepted, possibly because the page reflects parameter names, so keep the configured size
+    return accepted or start
+
+
+class Planner:
+    """
+    decides how chunks that caused an anomaly are split
+    by default they are split in halves, like narrower() does
+    when adaptive, the number of parts depends on how many of the first chunks caused an anomaly, so chunks
+    that likely hold several parameters are split in more parts and those are found in fewer requests
+    a chunk that likely holds a single parameter is still split in halves, but only the first half is sent:
+    if it doesn't cause an anomaly then the second half must, so that one is split without being sent
+    """
+    def __init__(self, adaptive=False):
+        self.adaptive = adaptive
+        self.sent, self.anomalous, self.params = 0, 0, 0
+        self.found = []
+
+    def record(self, params, anomalous):
+        """
+        counts a chunk of the first round towards the estimated density of valid parameters
+        """
+        self.sent += 1
+        self.params += len(params)
+        if anomalous:
+            self.anomalous += 1
+
+    def parts(self, size):
+        """
+        returns the number of parts to split an anomalous chunk of size parameters into
+        """
+        if not self.adaptive or not self.sent:
+            return 2
+        # share of chunks that cause an anomaly, smoothed so that a few chunks don't give 0 or 1
+        share = (self.anomalous + 0.5) / (self.sent + 1)
+        density = -math.log(1 - share) / (self.params / self.sent)
+        # parameters expected in a chunk, given that it caused an anomaly
+        expected = size * density / (1 - (1 - density) ** size) if density < 1 else size
+        if expected < 1.5:
+            return 2
+        return min(size, 2 * round(expected))
+
+    def split(self, params):
+        """
+        splits an anomalous chunk, parts with a single parameter are taken as found (they are verified later)
+        returns list of chunks to send next, as (params, sibling) tuples
+        sibling is a chunk that is known to be anomalous if params turns out not to be
+        """
+        parts = [part for part in slicer(params, self.parts(len(params))) if part]
+        chunks = []
+        for part in parts:
+            if len(part) == 1:
+                self.found.append(part)
+            else:
+                chunks.append(part)
+        if self.adaptive and len(parts) == len(chunks) == 2:
+            return [(chunks[0], chunks[1])]
+        return [(chunk, None) for chunk in chunks]
+
+    def next(self, chunk, anomalous):
+        """
+        takes the result of a chunk that was sent
+        returns list of chunks to send next
+        """
+        params, sibling = chunk
+        if anomalous:
+            chunks = self.split(params)
+            if sibling:
+                chunks.append((sibling, None))
+            return chunks
+        elif sibling:
+            # the parent was anomalous, so the parameter must be in the other half
+            return self.split(sibling)
+        return []
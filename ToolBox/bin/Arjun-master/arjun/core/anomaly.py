@@ -1,10 +1,11 @@
 import re
+import hashlib
 import requests
 
 import arjun.core.config as mem
 
 from urllib.parse import urlparse
-from arjun.core.utils import diff_map, remove_tags
+from arjun.core.utils import diff_map, dynamic_lines, find_words, remove_tags
 
 
 def define(response_1, response_2, param, value, wordlist):
@@ -21,9 +22,11 @@ def define(response_1, response_2, param, value, wordlist):
         'same_headers': None, # if the headers are same, contains those headers
         'same_redirect': None, # if both requests redirect in similar manner, contains that redirection
         'param_missing': None, # if param name is missing from the body, contains words that are already there
-        'value_missing': None # contains whether param value is missing from the body
+        'value_missing': None, # contains whether param value is missing from the body
+        'dynamic_lines': None # if the bodies differ only in some lines, contains their numbers (not a rule, see fingerprint())
     }
     if type(response_1) == type(response_2) == requests.models.Response:
+        # .text decodes the whole body on every access, so each body is decoded once here
         body_1, body_2 = response_1.text, response_2.text
         if response_1.status_code == response_2.status_code:
             factors['same_code'] = response_1.status_code
@@ -37,60 +40,124 @@ def define(response_1, response_2, param, value, wordlist):
             factors['same_redirect'] = urlparse(response_1.url).path
         else:
             factors['same_redirect'] = ''
-        if response_1.text == response_2.text:
-            factors['same_body'] = response_1.text
-        elif response_1.text.count('\n') == response_2.text.count('\n'):
-            factors['lines_num'] = response_1.text.count('\n')
+        if body_1 == body_2:
+            factors['same_body'] = body_1
+        elif body_1.count('\n') == body_2.count('\n'):
+            factors['lines_num'] = body_1.count('\n')
         elif remove_tags(body_1) == remove_tags(body_2):
             factors['same_plaintext'] = remove_tags(body_1)
         elif body_1 and body_2 and body_1.count('\\n') == body_2.count('\\n'):
                 factors['lines_diff'] = diff_map(body_1, body_2)
-        if param not in response_2.text:
-            factors['param_missing'] = [word for word in wordlist if word in response_2.text]
-        if value not in response_2.text:
+        if body_1 != body_2 and body_1.count('\n') == body_2.count('\n'):
+            factors['dynamic_lines'] = dynamic_lines(body_1, body_2)
+        if param not in body_2:
+            factors['param_missing'] = set(find_words(wordlist, body_2))
+        if value not in body_2:
             factors['value_missing'] = True
     return factors
 
 
-def compare(response, factors, params):
+re_delimiter = re.compile(r'[\'"\s]')
+
+
+def fingerprint(response, factors):
     """
-    detects anomalies by comparing a HTTP response against a rule list
-    returns string, list (anomaly, list of parameters that caused it)
+    hashes the parts of a response that the rules look at: status code, header names, redirection and body
+    lines that already differed between the two responses define() compared are left out of the body
+    returns tuple, bool (the fingerprint, whether lines were left out)
+    """
+    body = response.content
+    # changes in those lines can still show up in the plaintext, so they are only left out when it isn't compared
+    masked = bool(factors['dynamic_lines']) and factors['same_plaintext'] is None
+    if masked:
+        lines = body.split(b'\n')
+        for i in factors['dynamic_lines']:
+            if i < len(lines):
+                lines[i] = b''
+        body = b'\n'.join(lines)
+    return (response.status_code,
+        tuple(sorted(response.headers.keys())),
+        urlparse(response.headers.get('Location', '')).path,
+        hashlib.blake2b(body, digest_size=16).digest()), masked
+
+
+def check_response(response, text, factors):
+    """
+    checks a HTTP response against the rules that don't depend on the parameters sent
+    returns string, string (anomaly, the rule that caught it)
     """
-    if response == '' or type(response) == str:
-        return ('', [], '')
     these_headers = list(response.headers.keys())
     these_headers.sort()
     if factors['same_code'] is not None and response.status_code != factors['same_code']:
-        return ('http code', params, 'same_code')
+        return ('http code', 'same_code')
     if factors['same_headers'] is not None and these_headers != factors['same_headers']:
-        return ('http headers', params, 'same_headers')
+        return ('http headers', 'same_headers')
     if mem.var['disable_redirects']:
         if factors['same_redirect'] is not None and urlparse(response.headers.get('Location', '')).path != factors['same_redirect']:
-            return ('redirection', params, 'same_redirect')
+            return ('redirection', 'same_redirect')
     elif factors['same_redirect'] is not None and 'Location' in response.headers:
         if urlparse(response.headers.get('Location', '')).path != factors['same_redirect']:
-            return ('redirection', params, 'same_redirect')
-    if factors['same_body'] is not None and response.text != factors['same_body']:
-        return ('body length', params, 'same_body')
-    if factors['lines_num'] is not None and response.text.count('\n') != factors['lines_num']:
-        return ('number of lines', params, 'lines_num')
-    if factors['same_plaintext'] is not None and remove_tags(response.text) != factors['same_plaintext']:
-        return ('text length', params, 'same_plaintext')
+            return ('redirection', 'same_redirect')
+    if factors['same_body'] is not None and text != factors['same_body']:
+        return ('body length', 'same_body')
+    if factors['lines_num'] is not None and text.count('\n') != factors['lines_num']:
+        return ('number of lines', 'lines_num')
+    if factors['same_plaintext'] is not None and remove_tags(text) != factors['same_plaintext']:
+        return ('text length', 'same_plaintext')
     if factors['lines_diff'] is not None:
         for line in factors['lines_diff']:
-            if line not in response.text:
-                return ('lines', params, 'lines_diff')
+            if line not in text:
+                return ('lines', 'lines_diff')
+    return ('', '')
+
+
+def reflected(word, tokens, response):
+    """
+    checks if word is in the body between quotes or whitespace
+    tokens are the pieces of the body between quotes and whitespace, so most words are found without a regex search
+    returns bool
+    """
+    if re_delimiter.search(word):
+        return re.search(r'[\'"\s]%s[\'"\s]' % re.escape(word), response.text) is not None
+    return word in tokens
+
+
+def compare(response, factors, params):
+    """
+    detects anomalies by comparing a HTTP response against a rule list
+    once factors has a 'fingerprints' dict, responses already seen get the verdict of the rules without being checked again
+    returns string, list (anomaly, list of parameters that caused it)
+    """
+    if response == '' or type(response) == str:
+        return ('', [], '')
+    fingerprints = factors.get('fingerprints')
+    key, masked = fingerprint(response, factors) if fingerprints is not None else (None, False)
+    if key is not None and key in fingerprints:
+        anomaly, reason, tokens = fingerprints[key]
+    else:
+        text = response.text
+        anomaly, reason = check_response(response, text, factors)
+        tokens = None
+        if not anomaly:
+            tokens = set(re_delimiter.split(text)[1:-1])
+        # chunk responses are mostly alike, so a few hundred verdicts cover nearly all of them
+        # the tokens are only kept if the whole body went into the fingerprint, a left out line may reflect a parameter
+        if key is not None and len(fingerprints) < 256:
+            fingerprints[key] = (anomaly, reason, None if masked else tokens)
+    if anomaly:
+        return (anomaly, params, reason)
+    if tokens is None:
+        tokens = set(re_delimiter.split(response.text)[1:-1])
     if factors['param_missing'] is not None:
         for param in params.keys():
             if len(param) < 5:
                 continue
-            if param not in factors['param_missing'] and re.search(r'[\'"\s]%s[\'"\s]' % re.escape(param), response.text):
+            if param not in factors['param_missing'] and reflected(param, tokens, response):
                 return ('param name reflection', params, 'param_missing')
     if factors['value_missing'] is not None:
         for value in params.values():
             if type(value) != str or len(value) != 6:
                 continue
-            if value in response.text and re.search(r'[\'"\s]%s[\'"\s]' % re.escape(value), response.text):
+            if reflected(value, tokens, response):
                 return ('param value reflection', params, 'value_missing')
     return ('', [], '')
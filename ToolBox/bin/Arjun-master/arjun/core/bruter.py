@@ -10,14 +10,14 @@ def bruter(request, factors, params, mode='bruteforce'):
     returns anomaly detection result for a chunk of parameters
     returns list
     """
-    if mem.var['kill']:
+    if mem.state()['kill']:
         return []
     response = requester(request, params)
     conclusion = error_handler(response, factors)
     if conclusion == 'retry':
         return bruter(request, factors, params, mode=mode)
     elif conclusion == 'kill':
-        mem.var['kill'] = True
+        mem.state()['kill'] = True
         return []
     comparison_result = compare(response, factors, params)
     if mode == 'verify':
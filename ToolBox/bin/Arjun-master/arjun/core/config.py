@@ -1 +1,24 @@
+import contextvars
+
 var = {} # all the cli arguments are added to this variable to be accessed globally
+
+# kill switch, timeout, delay and bad request count of the target being scanned
+# targets scanned at the same time (--parallel) each get their own, otherwise they are kept in var
+_state = contextvars.ContextVar('state')
+
+
+def state():
+    """
+    returns dict holding the state of the target being scanned
+    """
+    return _state.get(var)
+
+
+def new_state():
+    """
+    gives the target being scanned in the current context a state of its own
+    returns dict
+    """
+    target = {'kill': False, 'bad_req_count': 0, 'timeout': var['timeout'], 'delay': var['delay']}
+    _state.set(target)
+    return target
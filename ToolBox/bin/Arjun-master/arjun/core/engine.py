@@ -0,0 +1,370 @@
+import ssl
+import zlib
+import json
+import random
+import asyncio
+import requests
+
+from urllib.parse import urlsplit
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import arjun.core.config as mem
+
+from arjun.core.colors import info
+from arjun.core.anomaly import compare
+from arjun.core.adaptive import Planner
+from arjun.core.error_handler import error_handler
+from arjun.core.requester import host_limiter
+from arjun.core.session import get_session
+from arjun.core.utils import dict_to_xml
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:
+    aiohttp = None
+
+
+def prepare(request, payload):
+    """
+    builds the same HTTP request requester() would send for a payload
+    returns requests.PreparedRequest
+    """
+    payload = dict(payload)
+    if request.get('include'):
+        payload.update(request['include'])
+    url, method, headers = request['url'], request['method'], dict(request['headers'])
+    if method == 'GET':
+        prepared = requests.Request('GET', url, params=payload, headers=headers)
+    elif method == 'JSON':
+        headers['Content-Type'] = 'application/json'
+        if mem.var['include'] and '$arjun$' in mem.var['include']:
+            data = mem.var['include'].replace('$arjun$', json.dumps(payload).rstrip('}').lstrip('{'))
+            prepared = requests.Request('POST', url, data=data, headers=headers)
+        else:
+            prepared = requests.Request('POST', url, json=payload, headers=headers)
+    elif method == 'XML':
+        headers['Content-Type'] = 'application/xml'
+        data = mem.var['include'].replace('$arjun$', dict_to_xml(payload))
+        prepared = requests.Request('POST', url, data=data, headers=headers)
+    else:
+        prepared = requests.Request('POST', url, data=payload, headers=headers)
+    return get_session().prepare_request(prepared)
+
+
+def build_response(url, status_code, headers, content):
+    """
+    wraps a raw HTTP response so that it decodes and compares exactly like one from requests
+    returns requests.Response
+    """
+    response = requests.models.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict()
+    for name, value in headers:
+        if name in response.headers:
+            response.headers[name] += ', ' + value
+        else:
+            response.headers[name] = value
+    response._content = content
+    response._content_consumed = True
+    response.url = url
+    response.encoding = get_encoding_from_headers(response.headers)
+    return response
+
+
+class RateLimiter:
+    """
+    spaces out requests so that no more than rate requests are started per second, across all workers
+    """
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next = 0
+
+    async def wait(self):
+        now = asyncio.get_running_loop().time()
+        delay = max(0, self.next - now)
+        self.next = max(self.next, now) + self.interval
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class Client:
+    """
+    a minimal asyncio HTTP/1.1 client with keep-alive, used when aiohttp isn't installed
+    """
+    def __init__(self):
+        self.idle = {}
+        # new connections are opened a few at a time, and only once one has answered a request is it trusted and
+        # reused, so a server with a small listen backlog isn't flooded with connections it can't accept yet
+        self.opening = asyncio.Semaphore(10)
+        self.context = ssl.create_default_context()
+        self.context.check_hostname = False
+        self.context.verify_mode = ssl.CERT_NONE
+
+    async def connect(self, scheme, host, port):
+        if scheme == 'https':
+            return await asyncio.open_connection(host, port, ssl=self.context, server_hostname=host)
+        return await asyncio.open_connection(host, port)
+
+    async def request(self, prepared):
+        parsed = urlsplit(prepared.url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        key = (parsed.scheme, parsed.hostname, port)
+        body = prepared.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        lines = ['%s %s HTTP/1.1' % (prepared.method, (parsed.path or '/') + ('?' + parsed.query if parsed.query else '')),
+            'Host: %s' % parsed.netloc]
+        for name, value in prepared.headers.items():
+            if name.lower() not in ('host', 'content-length'):
+                lines.append('%s: %s' % (name, value))
+        if body or prepared.method != 'GET':
+            lines.append('Content-Length: %i' % len(body))
+        raw = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+        # a kept-alive connection may have been closed by the server in the meantime, so retry those once
+        while True:
+            if self.idle.get(key):
+                status_code, headers, content, keep_alive, reader, writer = await self.exchange(key, raw, prepared.method, True)
+            else:
+                async with self.opening:
+                    # another request may have freed up a connection while this one waited
+                    reused = bool(self.idle.get(key))
+                    status_code, headers, content, keep_alive, reader, writer = await self.exchange(key, raw, prepared.method, reused)
+            if status_code is not None:
+                break
+        if keep_alive:
+            self.idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+        return build_response(prepared.url, status_code, headers, content)
+
+    async def exchange(self, key, raw, method, reused):
+        """
+        sends a raw request over an idle connection (if reused) or a new one
+        returns the response fields from read_response() and the connection, or Nones if a reused connection was closed
+        """
+        reader, writer = self.idle[key].pop() if reused else await self.connect(*key)
+        try:
+            writer.write(raw)
+            return (*await self.read_response(reader, method), reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            writer.close()
+            if not reused:
+                raise
+            return None, None, None, None, None, None
+        except BaseException:
+            writer.close()
+            raise
+
+    async def read_response(self, reader, method):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by the server')
+        version, status_code = status_line.decode('latin-1').split(' ', 2)[:2]
+        headers = []
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, value = line.decode('latin-1').split(':', 1)
+            headers.append((name.strip(), value.strip()))
+        fields = {name.lower(): value for name, value in headers}
+        status_code = int(status_code)
+        keep_alive = version == 'HTTP/1.1' and fields.get('connection', '').lower() != 'close'
+
+        if method == 'HEAD' or status_code in (204, 304) or 100 <= status_code < 200:
+            content = b''
+        elif 'chunked' in fields.get('transfer-encoding', '').lower():
+            content = b''
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                content += await reader.readexactly(size)
+                await reader.readline()
+        elif 'content-length' in fields:
+            content = await reader.readexactly(int(fields['content-length']))
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        encoding = fields.get('content-encoding', '').lower()
+        if encoding == 'gzip':
+            content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            try:
+                content = zlib.decompress(content)
+            except zlib.error:
+                content = zlib.decompress(content, -zlib.MAX_WBITS)
+        return status_code, headers, content, keep_alive
+
+    async def close(self):
+        for connections in self.idle.values():
+            for reader, writer in connections:
+                writer.close()
+        self.idle = {}
+
+
+class AiohttpClient:
+    """
+    sends requests with aiohttp, when it is installed
+    """
+    def __init__(self, limit):
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit, ssl=False), cookie_jar=aiohttp.DummyCookieJar())
+
+    async def request(self, prepared):
+        async with self.session.request(prepared.method, yarl.URL(prepared.url, encoded=True),
+            headers=dict(prepared.headers),
+            data=prepared.body,
+            allow_redirects=False) as response:
+            content = await response.read()
+            return build_response(prepared.url, response.status, response.headers.items(), content)
+
+    async def close(self):
+        await self.session.close()
+
+
+class Engine:
+    """
+    sends probes concurrently from one thread, with --rate-limit, --host-rate-limit and -d applied to all of them together
+    """
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(mem.var['rate_limit'])
+        self.client = AiohttpClient(concurrency) if aiohttp else Client()
+
+    async def send(self, request, payload):
+        """
+        the asynchronous counterpart of requester()
+        returns str on error otherwise response object of requests library
+        """
+        await self.limiter.wait()
+        delay = host_limiter.reserve(request['url'])
+        if delay:
+            await asyncio.sleep(delay)
+        if mem.var['stable']:
+            mem.state()['delay'] = random.choice(range(3, 10))
+        if mem.state()['delay']:
+            await asyncio.sleep(mem.state()['delay'])
+        if mem.state()['kill']:
+            return 'killed'
+        prepared = prepare(request, payload)
+        try:
+            while True:
+                timeout = mem.state()['timeout']
+                try:
+                    return await asyncio.wait_for(self.client.request(prepared), timeout=timeout)
+                except asyncio.TimeoutError:
+                    # probes in flight together time out together, but the timeout is only raised once for all of them:
+                    # if another probe raised it already, try again with the new timeout instead of raising it further
+                    if mem.state()['timeout'] > timeout and not mem.state()['kill']:
+                        continue
+                    return 'ReadTimeout: the request timed out'
+        except ConnectionRefusedError as e:
+            return 'ConnectionRefusedError: %s' % e
+        except Exception as e:
+            return '%s: \'%s\'' % (type(e).__name__, e)
+
+    async def close(self):
+        await self.client.close()
+
+
+async def narrow(engine, request, factors, param_groups, stability_probe, planner):
+    """
+    narrows chunks of parameters down to the parameters that cause anomalies, without waiting for rounds to finish
+    each chunk that shows an anomaly is split by the planner and queued again as soon as its response arrives
+    returns list of single parameter dicts, 'unstable' if the page changes by itself, 'killed' if the scan was stopped
+    """
+    queue = asyncio.Queue()
+    # per split depth: chunks sent, chunks answered, and chunks that caused an anomaly
+    sent, answered, anomalies = {}, {}, {}
+    state = {'unstable': False, 'processed': 0, 'checked': set()}
+
+    def add(depth, chunk):
+        sent[depth] = sent.get(depth, 0) + 1
+        queue.put_nowait((depth, chunk))
+
+    def depth_done(depth):
+        return answered.get(depth, 0) == sent.get(depth, 0) and (depth == 0 or depth_done(depth - 1))
+
+    async def check_stability(depth):
+        # like the rounds of narrower(): if more chunks were anomalous than not, make sure the page isn't changing by itself
+        if depth in state['checked'] or not depth_done(depth) or 2 * anomalies.get(depth, 0) <= sent[depth]:
+            return
+        state['checked'].add(depth)
+        response = await engine.send(request, stability_probe)
+        if compare(response, factors, stability_probe)[0] != '':
+            state['unstable'] = True
+
+    async def worker():
+        while True:
+            depth, chunk = await queue.get()
+            try:
+                if mem.state()['kill'] or state['unstable']:
+                    continue
+                params = chunk[0]
+                response = await engine.send(request, params)
+                conclusion = error_handler(response, factors)
+                if conclusion == 'retry':
+                    queue.put_nowait((depth, chunk))
+                    continue
+                elif conclusion == 'kill':
+                    mem.state()['kill'] = True
+                    continue
+                anomalous = bool(compare(response, factors, params)[1])
+                answered[depth] = answered.get(depth, 0) + 1
+                if depth == 0:
+                    planner.record(params, anomalous)
+                if anomalous:
+                    anomalies[depth] = anomalies.get(depth, 0) + 1
+                for each in planner.next(chunk, anomalous):
+                    add(depth + 1, each)
+                state['processed'] += 1
+                if not mem.var['quiet'] and mem.var['parallel'] == 1:
+                    print('%s Processing chunks: %i/%-6i' % (info, state['processed'], sum(sent.values())), end='\r')
+                # finishing this chunk may also complete the deeper splits that were waiting on it
+                for each in range(depth, max(sent) + 1):
+                    await check_stability(each)
+            finally:
+                queue.task_done()
+
+    for params in param_groups:
+        add(0, (params, None))
+    workers = [asyncio.create_task(worker()) for i in range(engine.concurrency)]
+    joined = asyncio.create_task(queue.join())
+    try:
+        # a worker only stops early if it crashed
+        await asyncio.wait([joined] + workers, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        joined.cancel()
+        for each in workers:
+            each.cancel()
+        results = await asyncio.gather(*workers, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+    if mem.state()['kill']:
+        return 'killed'
+    if state['unstable']:
+        return 'unstable'
+    return planner.found
+
+
+def find_anomalous(request, factors, param_groups, stability_probe):
+    """
+    runs narrow() with a new engine of --async concurrency
+    returns the same as narrow()
+    """
+    async def run():
+        engine = Engine(mem.var['async_requests'])
+        try:
+            return await narrow(engine, request, factors, param_groups, stability_probe, Planner(mem.var['adaptive']))
+        finally:
+            await engine.close()
+    return asyncio.run(run())
@@ -11,7 +11,7 @@ def connection_refused():
 	"""
 	if mem.var['stable']:
 		print('%s Hit rate limit, stabilizing the connection' % bad)
-		mem.var['kill'] = False
+		mem.state()['kill'] = False
 		time.sleep(30)
 		return 'retry'
 	print('%s Target has rate limiting in place, please use --stable switch' % bad)
@@ -27,7 +27,7 @@ def error_handler(response, factors):
 	"""
 	if type(response) != str and response.status_code in (400, 413, 418, 429, 503):
 		if response.status_code == 503:
-			mem.var['kill'] = True
+			mem.state()['kill'] = True
 			print('%s Target is unable to process requests, try --stable switch' % bad)
 			return 'kill'
 		elif response.status_code in (429, 418):
@@ -35,23 +35,23 @@ def error_handler(response, factors):
 			return 'kill'
 		else:
 			if factors['same_code'] != response.status_code:
-				mem.var['bad_req_count'] = mem.var.get('bad_req_count', 0) + 1
-				if mem.var['bad_req_count'] > 20:
-					mem.var['kill'] = True
+				mem.state()['bad_req_count'] = mem.state().get('bad_req_count', 0) + 1
+				if mem.state()['bad_req_count'] > 20:
+					mem.state()['kill'] = True
 					print('%s Server received a bad request. Try decreasing the chunk size with -c option' % bad)
 					return 'kill'
 			else:
 				return 'ok'
 	else:
 		if 'Timeout' in response:
-			if mem.var['timeout'] > 20:
-				mem.var['kill'] = True
+			if mem.state()['timeout'] > 20:
+				mem.state()['kill'] = True
 				print('%s Connection timed out, unable to increase timeout further' % bad)
 				print('%s Target might have a rate limit in place, try --stable switch' % bad)
 				return 'kill'
 			else:
 				print('%s Connection timed out, increased timeout by 5 seconds' % bad)
-				mem.var['timeout'] += 5
+				mem.state()['timeout'] += 5
 				return 'retry'
 		elif 'ConnectionRefused' in response:
 			return connection_refused()
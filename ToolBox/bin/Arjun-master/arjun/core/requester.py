@@ -1,16 +1,46 @@
 import json
 import time
 import random
-import requests
 import warnings
+import threading
 
 import arjun.core.config as mem
 
+from urllib.parse import urlsplit
 from ratelimit import limits, sleep_and_retry
 from arjun.core.utils import dict_to_xml
+from arjun.core.session import get_session
 
 warnings.filterwarnings('ignore') # Disable SSL related warnings
 
+
+class HostLimiter:
+    """
+    spaces out requests to the same host so that no more than --host-rate-limit are started per second
+    shared by all threads and event loops, so it holds across targets on the host scanned at once with --parallel
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next = {}
+
+    def reserve(self, url):
+        """
+        books the next free moment to send a request to the host of url
+        returns float, the seconds to wait before sending it
+        """
+        if not mem.var['host_rate_limit']:
+            return 0
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            start = max(self.next.get(host, now), now)
+            self.next[host] = start + 1 / mem.var['host_rate_limit']
+        return start - now
+
+
+host_limiter = HostLimiter()
+
+
 @sleep_and_retry
 @limits(calls=mem.var['rate_limit'], period=1)
 def requester(request, payload={}):
@@ -20,59 +50,60 @@ def requester(request, payload={}):
     """
     if request.get('include') and len(request.get('include', '')) != 0:
         payload.update(request['include'])
+    time.sleep(host_limiter.reserve(request['url']))
     if mem.var['stable']:
-        mem.var['delay'] = random.choice(range(3, 10))
-    time.sleep(mem.var['delay'])
+        mem.state()['delay'] = random.choice(range(3, 10))
+    time.sleep(mem.state()['delay'])
     url = request['url']
-    if mem.var['kill']:
+    if mem.state()['kill']:
         return 'killed'
     try:
         if request['method'] == 'GET':
-            response = requests.get(url,
+            response = get_session().get(url,
                 params=payload,
                 headers=request['headers'],
                 verify=False,
                 allow_redirects=False,
-                timeout=mem.var['timeout'],
+                timeout=mem.state()['timeout'],
             )
         elif request['method'] == 'JSON':
             request['headers']['Content-Type'] = 'application/json'
             if mem.var['include'] and '$arjun$' in mem.var['include']:
                 payload = mem.var['include'].replace('$arjun$',
                     json.dumps(payload).rstrip('}').lstrip('{'))
-                response = requests.post(url,
+                response = get_session().post(url,
                     data=payload,
                     headers=request['headers'],
                     verify=False,
                     allow_redirects=False,
-                    timeout=mem.var['timeout'],
+                    timeout=mem.state()['timeout'],
                 )
             else:
-                response = requests.post(url,
+                response = get_session().post(url,
                     json=payload,
                     headers=request['headers'],
                     verify=False,
                     allow_redirects=False,
-                    timeout=mem.var['timeout'],
+                    timeout=mem.state()['timeout'],
                 )
         elif request['method'] == 'XML':
             request['headers']['Content-Type'] = 'application/xml'
             payload = mem.var['include'].replace('$arjun$',
                 dict_to_xml(payload))
-            response = requests.post(url,
+            response = get_session().post(url,
                 data=payload,
                 headers=request['headers'],
                 verify=False,
                 allow_redirects=False,
-                timeout=mem.var['timeout'],
+                timeout=mem.state()['timeout'],
             )
         else:
-            response = requests.post(url,
+            response = get_session().post(url,
                 data=payload,
                 headers=request['headers'],
                 verify=False,
                 allow_redirects=False,
-                timeout=mem.var['timeout'],
+                timeout=mem.state()['timeout'],
             )
         return response
     except Exception as e:
@@ -0,0 +1,29 @@
+import requests
+
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+
+import arjun.core.config as mem
+
+_session = None
+
+
+def get_session():
+    """
+    returns the requests session shared by all threads, creating it on first use
+    connections to the target are kept alive and reused instead of doing a TCP/TLS handshake for every probe
+    returns requests.Session
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        # one pooled connection per thread, so no thread waits for another's connection
+        size = max(mem.var.get('threads', 5) * mem.var.get('parallel', 1), 10)
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=size, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.verify = False
+        # cookies set by the target must not leak into later probes, that would change the responses being compared
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        _session = session
+    return _session
@@ -2,7 +2,10 @@ import re
 import sys
 import json
 import random
-import requests
+import threading
+import functools
+import itertools
+import collections
 
 import concurrent.futures
 from dicttoxml import dicttoxml
@@ -10,6 +13,7 @@ from urllib.parse import urlparse
 
 from arjun.core.prompt import prompt
 from arjun.core.importer import importer
+from arjun.core.session import get_session
 
 from arjun.plugins.otx import otx
 from arjun.plugins.wayback import wayback
@@ -60,6 +64,75 @@ def populate(array):
     return {name: '1' * (6 - len(str(i))) + str(i) for i, name in enumerate(array)}
 
 
+_automaton_lock = threading.Lock()
+
+
+class Wordlist:
+    """
+    an ordered set of parameter names, with the names found on the page put in front of the others
+    promoting a name, checking for one and counting them are O(1), however many names a page has
+    """
+    def __init__(self, words=()):
+        # names are dict keys, so they stay in order and are never duplicated
+        self.promoted = {}
+        self.words = dict.fromkeys(words)
+        # the names it started with, the automaton that finds them is built once and shared with the copies
+        self.base = frozenset(self.words)
+        self.automaton = [None]
+
+    def promote(self, name):
+        """
+        moves name (new or not) in front of all the others, like wordlist.insert(0, name) on a list
+        """
+        self.words.pop(name, None)
+        self.promoted.pop(name, None)
+        self.promoted[name] = None
+
+    def copy(self):
+        """
+        returns Wordlist that can be promoted in without changing this one
+        """
+        wordlist = Wordlist()
+        wordlist.promoted, wordlist.words = dict(self.promoted), dict(self.words)
+        wordlist.base, wordlist.automaton = self.base, self.automaton
+        return wordlist
+
+    def search(self, text):
+        """
+        finds the names that occur in text, anywhere (like `name in text` does)
+        returns set
+        """
+        with _automaton_lock:
+            if self.automaton[0] is None:
+                self.automaton[0] = Automaton(self.base)
+        found = self.automaton[0].search(text)
+        # names promoted from the page that weren't in the wordlist are only a few, so they are looked for one by one
+        found.update(name for name in self.promoted if name not in self.base and name in text)
+        return found
+
+    def chunks(self, n, extra={}):
+        """
+        gives every name a value (like populate()) and divides them, followed by extra, into n chunks (like slicer())
+        returns list of n dicts
+        """
+        populated = populate(self)
+        populated.update(extra)
+        k, m = divmod(len(populated), n)
+        items = iter(populated.items())
+        return [dict(itertools.islice(items, k + (i < m))) for i in range(n)]
+
+    def __iter__(self):
+        # the most recently promoted name comes first
+        yield from reversed(list(self.promoted))
+        yield from self.words
+
+    def __contains__(self, name):
+        return name in self.promoted or name in self.words
+
+    def __len__(self):
+        return len(self.promoted) + len(self.words)
+
+
 def stable_request(url, headers):
     """
     guarantees crash-proof HTTP(S) requests
@@ -71,7 +144,7 @@ def stable_request(url, headers):
     schemes = (['https', 'http'] if scheme == 'https' else ['http', 'https'])
     for scheme in schemes:
         try:
-            response = requests.get(
+            response = get_session().get(
                 scheme + '://' + host + path,
                 headers=headers,
                 verify=False,
@@ -88,13 +161,80 @@ def stable_request(url, headers):
         return None
 
 
+@functools.lru_cache(maxsize=16)
 def remove_tags(html):
     """
     removes all the html from a webpage source
+    cached, because the same body is stripped again by each factor that compares plaintext
     """
     return re.sub(r'(?s)<.*?>', '', html)
 
 
+class Automaton:
+    """
+    an Aho-Corasick automaton, finds which of a large list of words occur in a text in a single pass over it
+    """
+    def __init__(self, words):
+        self.goto, self.fail, self.output = [{}], [0], [()]
+        for word in words:
+            if not word:
+                continue
+            state = 0
+            for char in word:
+                if char not in self.goto[state]:
+                    self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = self.goto[state][char]
+            self.output[state] += (word,)
+        # breadth first, so the fail state of a node is always complete before its children are linked
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] += self.output[self.fail[child]]
+        # no word can match across a character that none of the words contain
+        alphabet = set(char for state in self.goto for char in state)
+        self.separator = re.compile('[^%s]+' % ''.join(re.escape(char) for char in alphabet)) if alphabet else None
+
+    def search(self, text):
+        """
+        finds the words that occur in text, anywhere (like `word in text` does)
+        returns set
+        """
+        if self.separator is None:
+            return set()
+        goto, fail = self.goto, self.fail
+        visited = set()
+        # pages repeat the same words a lot, so each distinct run of characters is only scanned once
+        for run in set(self.separator.split(text)):
+            state = 0
+            for char in run:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                visited.add(state)
+        found = set()
+        for state in visited:
+            found.update(self.output[state])
+        return found
+
+
+def find_words(wordlist, text):
+    """
+    finds the words of wordlist that occur in text
+    returns list (in the order of wordlist)
+    """
+    found = wordlist.search(text)
+    return [word for word in wordlist if word in found]
+
+
 def diff_map(body_1, body_2):
     """
     creates a list of lines that are common between two multi-line strings
@@ -108,6 +248,14 @@ def diff_map(body_1, body_2):
     return sig
 
 
+def dynamic_lines(body_1, body_2):
+    """
+    finds the lines that differ between two bodies with the same number of lines, the ones diff_map() leaves out
+    returns list of line numbers
+    """
+    return [i for i, (line_1, line_2) in enumerate(zip(body_1.split('\n'), body_2.split('\n'))) if line_1 != line_2]
+
+
 def random_str(n):
     """
     generates a random string of length n
@@ -255,7 +403,7 @@ def prepare_requests(args):
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.5',
         'Accept-Encoding': 'gzip, deflate',
-        'Connection': 'close',
+        'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1'
     }
     if type(args.headers) == str:
@@ -45,9 +45,6 @@ def heuristic(raw_response, wordlist):
     for word in potential_params:
         if is_not_junk(word) and (word not in found):
             found.add(word)
-
-            if word in wordlist:
-                wordlist.remove(word)
-            wordlist.insert(0, word)
+            wordlist.promote(word)
 
     return list(found), words_exist
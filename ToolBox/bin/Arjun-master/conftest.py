@@ -0,0 +1 @@
+# puts the project root on sys.path, so the tests import arjun from the source tree
@@ -20,6 +20,7 @@ setup(
     url='https://github.com/s0md3v/Arjun',
     download_url='https://github.com/s0md3v/Arjun/archive/v%s.zip' % __import__('arjun').__version__,
     zip_safe=False,
+    python_requires='>=3.7',
     packages=find_packages(),
     package_data={'arjun': ['db/*']},
     install_requires=[
@@ -34,7 +35,7 @@ setup(
         'Operating System :: OS Independent',
         'Topic :: Security',
         'License :: OSI Approved :: GNU Affero General Public License v3',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3.7',
     ],
     entry_points={
         'console_scripts': [
@@ -0,0 +1,114 @@
+import random
+
+import arjun.core.config as mem
+
+mem.var = {'rate_limit': 9999, 'kill': False}
+
+from arjun.core import adaptive
+from arjun.core.adaptive import Planner, probe_chunk_size
+from arjun.core.utils import Wordlist
+
+
+def narrow(planner, param_groups, hidden):
+    """
+    drives the planner like initialize() does, with a set of hidden parameters standing in for bruter()
+    returns list of parameters confirmed, number of requests sent
+    """
+    chunks = [(params, None) for params in param_groups]
+    first_round = True
+    sent = 0
+    while chunks:
+        results = [(chunk, any(name in hidden for name in chunk[0])) for chunk in chunks]
+        sent += len(chunks)
+        if first_round:
+            for chunk, anomalous in results:
+                planner.record(chunk[0], anomalous)
+            first_round = False
+        chunks = []
+        for chunk, anomalous in results:
+            chunks.extend(planner.next(chunk, anomalous))
+    # parameters split off on their own aren't sent before they are verified, one by one
+    found = [name for params in planner.found for name in params]
+    return [name for name in found if name in hidden], sent + len(found)
+
+
+def scan(words, hidden, chunk_size):
+    param_groups = Wordlist(words).chunks(len(words) // chunk_size)
+    plain = narrow(Planner(), param_groups, hidden)
+    planned = narrow(Planner(adaptive=True), param_groups, hidden)
+    return plain, planned
+
+
+def test_sparse_parameters_are_found_in_fewer_requests():
+    rng = random.Random(1)
+    words = ['p%i' % i for i in range(5000)]
+    hidden = set(rng.sample(words, 4))
+    (plain_found, plain_sent), (found, sent) = scan(words, hidden, 250)
+    assert sorted(plain_found) == sorted(hidden)
+    assert sorted(found) == sorted(hidden)
+    # the first halves that don't cause an anomaly tell that the second halves do, so those aren't sent
+    assert sent < plain_sent
+
+
+def test_dense_parameters_are_found_in_fewer_requests():
+    rng = random.Random(2)
+    words = ['p%i' % i for i in range(5000)]
+    hidden = set(rng.sample(words, 150))
+    (plain_found, plain_sent), (found, sent) = scan(words, hidden, 250)
+    assert sorted(plain_found) == sorted(hidden)
+    assert sorted(found) == sorted(hidden)
+    assert sent < plain_sent
+
+
+def test_parts():
+    planner = Planner(adaptive=True)
+    assert planner.parts(250) == 2
+    for i in range(20):
+        planner.record(dict.fromkeys('p%i' % i for i in range(250)), i < 2)
+    # about one parameter in a chunk that caused an anomaly, split in halves
+    assert planner.parts(250) == 2
+    planner = Planner(adaptive=True)
+    for i in range(20):
+        planner.record(dict.fromkeys('p%i' % i for i in range(250)), True)
+    # most chunks cause an anomaly, so they likely hold several parameters each
+    assert 2 < planner.parts(250) <= 250
+    assert planner.parts(3) <= 3
+    assert Planner().parts(250) == 2
+
+
+def test_sibling_is_split_without_being_sent():
+    planner = Planner(adaptive=True)
+    params = dict.fromkeys('p%i' % i for i in range(8))
+    chunks = planner.split(params)
+    assert len(chunks) == 1
+    first, second = chunks[0]
+    assert list(first) == ['p0', 'p1', 'p2', 'p3'] and list(second) == ['p4', 'p5', 'p6', 'p7']
+    # the first half doesn't cause an anomaly, so the second half is split right away
+    assert planner.next(chunks[0], False) == [(dict.fromkeys(['p4', 'p5']), dict.fromkeys(['p6', 'p7']))]
+    # the first half causes one, so it is split and the second half still has to be sent
+    assert planner.next(chunks[0], True)[-1] == (second, None)
+
+
+def accepting(largest, calls):
+    def accepts(request, factors, size):
+        calls.append(size)
+        return size <= largest
+    return accepts
+
+
+def test_probe_chunk_size(monkeypatch):
+    for largest in (10, 37, 300, 999, 1500, 4000):
+        calls = []
+        monkeypatch.setattr(adaptive, 'accepts', accepting(largest, calls))
+        size = probe_chunk_size({}, {}, 250, 3000)
+        assert size <= min(largest, 3000)
+        assert min(largest, 3000) - size <= max(size // 8, 1)
+        assert len(calls) <= 12
+
+
+def test_probe_chunk_size_gives_up(monkeypatch):
+    calls = []
+    monkeypatch.setattr(adaptive, 'accepts', lambda request, factors, size: calls.append(size))
+    # the target is refusing or limiting requests, so the configured size is kept
+    assert probe_chunk_size({}, {}, 250, 3000) == 250
+    assert calls == [250]
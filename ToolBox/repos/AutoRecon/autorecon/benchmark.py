@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+
+# Measures AutoRecon's own overhead by running synthetic targets through the real main.run() loop. The plugins
+# are generated fakes whose commands print scripted output at scripted speeds using printf and sleep, so no
+# network access, nmap or other tools are needed, and every run does exactly the same work.
+#
+# Each run happens in a fresh Python process with its own config and data directories (so the user's config,
+# plugins and scan history are neither used nor changed), and reports:
+#   wall time, AutoRecon's own CPU time, slot-seconds left idle, and output lines processed per second.
+#
+# Usage: python3 -m autorecon.benchmark [--targets N] [--services N] [--lines N] [--runs N] [-m N] [-mp N]
+#        python3 -m autorecon.benchmark --logging [--calls N]
+#
+# --logging instead times single calls to the logging functions in autorecon.io, in microseconds per call.
+
+import argparse, json, os, shutil, statistics, subprocess, sys, tempfile, time
+
+plugin_template = '''from autorecon.plugins import PortScan, ServiceScan
+
+class BenchPorts(PortScan):
+
+	def __init__(self):
+		super().__init__()
+		self.name = 'Bench Ports'
+		self.type = 'tcp'
+		self.tags = ['default']
+
+	async def run(self, target):
+		process, stdout, stderr = await target.execute({port_command!r}, blocking=False)
+		services = await target.extract_services(stdout)
+		await process.wait()
+		return services
+
+class BenchService(ServiceScan):
+
+	def __init__(self):
+		super().__init__()
+		self.name = 'Bench Service'
+		self.tags = ['default']
+
+	def configure(self):
+		self.match_all_service_names(True)
+		self.add_pattern('Server: ([^\\\\n]+)', description='Server: {{match1}}')
+
+	async def run(self, service):
+		await service.execute({service_command!r}, outfile='{{protocol}}_{{port}}_bench.txt')
+
+	def manual(self, service, plugin_was_run):
+		service.add_manual_command('Bench manual command', 'echo {{address}}:{{port}}')
+'''
+
+def write_plugins(path, services, lines, port_delay, service_delay):
+	# The port scan "finds" services on ports 10000 and up. Each service scan prints its lines of output in ten
+	# batches spread over service_delay seconds, with a line matching a pattern after each batch.
+	port_lines = ''.join(str(10000 + i) + '/tcp open http\\n' for i in range(services))
+	port_command = 'sleep ' + str(port_delay) + '; printf "' + port_lines + '"'
+
+	batches = 10
+	per_batch = max(1, lines // batches)
+	service_command = 'for b in $(seq 1 ' + str(batches) + '); do seq -f "line %g of {port}" 1 ' + str(per_batch) + '; echo "Server: bench/{port}"; sleep ' + str(round(service_delay / batches, 3)) + '; done'
+
+	with open(os.path.join(path, 'bench.py'), 'w') as file:
+		file.write(plugin_template.format(port_command=port_command, service_command=service_command))
+
+def child(args):
+	from autorecon import main as autorecon_main
+	from autorecon.metrics import metrics
+
+	targets = ['127.0.' + str(i // 250) + '.' + str(i % 250 + 1) for i in range(args.targets)]
+	sys.argv = ['autorecon', '--plugins-dir', args.plugins_dir, '-o', args.output, '--disable-keyboard-control', '-m', str(args.max_scans), '-mp', str(args.max_port_scans)] + targets
+
+	# AutoRecon's output would swamp the results, so send it to /dev/null for the run.
+	results = os.fdopen(os.dup(1), 'w')
+	devnull = os.open(os.devnull, os.O_WRONLY)
+	os.dup2(devnull, 1)
+
+	start_wall = time.perf_counter()
+	start_cpu = time.process_time()
+	autorecon_main.main()
+	cpu = time.process_time() - start_cpu
+	wall = time.perf_counter() - start_wall
+
+	busy = sum(histogram.sum for (name, labels), histogram in metrics.histograms.items() if name == 'autorecon_scan_duration_seconds' and dict(labels).get('kind') != 'report')
+	lines = sum(value for (name, labels), value in metrics.counters.items() if name == 'autorecon_output_lines_total')
+	scans = sum(value for (name, labels), value in metrics.counters.items() if name == 'autorecon_scans_total')
+
+	json.dump({'wall': wall, 'cpu': cpu, 'idle': max(0.0, args.max_scans * wall - busy), 'busy': busy, 'lines': lines, 'lines_per_second': lines / wall if wall else 0, 'scans': scans}, results)
+	results.close()
+
+def logging_benchmark(calls):
+	import timeit
+	from autorecon.config import config
+	from autorecon.io import e, debug, info
+
+	address = '127.0.0.1'
+	port = 80
+	line = 'line of output from a command'
+	output = open(os.devnull, 'w')
+	config['verbose'] = 0
+
+	def discarded():
+		debug('Line from a scan: ' + line)
+
+	def colors_only():
+		info('{bright}[{yellow}' + address + '{crst}/{bgreen}tcp/80/bench{crst}]{rst} scan finished', file=output)
+
+	def explicit():
+		info('{bright}[{yellow}' + address + '{crst}/{bgreen}tcp/80/bench{crst}]{rst} {line}', line=line, file=output)
+
+	def introspected():
+		info('{bright}[{yellow}{address}{crst}/{bgreen}tcp/{port}/bench{crst}]{rst} scan finished', file=output)
+
+	def command():
+		e('curl -sSik http://{address}:{port}/', address=address, port=port)
+
+	results = []
+	for label, function in [('Discarded debug()', discarded), ('info(), colors only', colors_only), ('info(), explicit values', explicit), ('info(), caller variables', introspected), ('e(), explicit values', command)]:
+		best = min(timeit.repeat(function, number=calls, repeat=5))
+		results.append((label, best / calls * 1000000))
+	output.close()
+	return results
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark AutoRecon\'s scheduling and output handling with synthetic targets and fake plugins.')
+	parser.add_argument('--targets', action='store', type=int, default=10, help='Number of synthetic targets. Default: %(default)s')
+	parser.add_argument('--services', action='store', type=int, default=5, help='Number of services found on each target. Default: %(default)s')
+	parser.add_argument('--lines', action='store', type=int, default=2000, help='Lines of output printed by each service scan. Default: %(default)s')
+	parser.add_argument('--port-delay', action='store', type=float, default=0.5, help='How long each port scan takes, in seconds. Default: %(default)s')
+	parser.add_argument('--service-delay', action='store', type=float, default=1.0, help='How long each service scan takes, in seconds. Default: %(default)s')
+	parser.add_argument('--runs', action='store', type=int, default=3, help='Number of times to repeat the benchmark. Default: %(default)s')
+	parser.add_argument('-m', '--max-scans', action='store', type=int, default=50, help='The maximum number of concurrent scans. Default: %(default)s')
+	parser.add_argument('-mp', '--max-port-scans', action='store', type=int, default=10, help='The maximum number of concurrent port scans. Default: %(default)s')
+	parser.add_argument('--json', action='store_true', help='Print the results of every run as JSON.')
+	parser.add_argument('--logging', action='store_true', help='Time calls to the logging functions instead of running scans.')
+	parser.add_argument('--calls', action='store', type=int, default=20000, help='Number of calls timed by --logging. Default: %(default)s')
+	parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+	parser.add_argument('--plugins-dir', action='store', help=argparse.SUPPRESS)
+	parser.add_argument('--output', action='store', help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.child:
+		child(args)
+		return
+
+	if args.logging:
+		for label, microseconds in logging_benchmark(args.calls):
+			print('{:<26} {:>8.2f} us/call'.format(label, microseconds))
+		return
+
+	if args.max_port_scans > args.max_scans:
+		print('--max-port-scans cannot be greater than --max-scans.')
+		sys.exit(1)
+
+	workdir = tempfile.mkdtemp(prefix='autorecon-benchmark-')
+	try:
+		plugins_dir = os.path.join(workdir, 'plugins')
+		os.makedirs(plugins_dir)
+		write_plugins(plugins_dir, args.services, args.lines, args.port_delay, args.service_delay)
+
+		results = []
+		for run in range(args.runs):
+			home = os.path.join(workdir, 'home-' + str(run))
+			env = dict(os.environ, XDG_CONFIG_HOME=os.path.join(home, 'config'), XDG_DATA_HOME=os.path.join(home, 'data'))
+			cmd = [sys.executable, '-m', 'autorecon.benchmark', '--child', '--plugins-dir', plugins_dir, '--output', os.path.join(workdir, 'results-' + str(run)), '--targets', str(args.targets), '-m', str(args.max_scans), '-mp', str(args.max_port_scans)]
+			process = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+			if process.returncode != 0:
+				print('Benchmark run ' + str(run + 1) + ' failed with exit code ' + str(process.returncode) + ':\n' + process.stderr.decode('utf8', errors='replace'))
+				sys.exit(1)
+			results.append(json.loads(process.stdout.decode('utf8')))
+	finally:
+		shutil.rmtree(workdir, ignore_errors=True)
+
+	if args.json:
+		print(json.dumps(results, indent='\t'))
+		return
+
+	print('Benchmarked ' + str(args.targets) + ' target(s) with ' + str(args.services) + ' service(s) each, ' + str(args.runs) + ' run(s), ' + str(results[0]['scans']) + ' scans per run.')
+	for key, label, unit in [('wall', 'Wall time', 's'), ('cpu', 'AutoRecon CPU', 's'), ('idle', 'Idle slot time', ' slot-s'), ('lines_per_second', 'Line throughput', ' lines/s')]:
+		values = [result[key] for result in results]
+		print('{:<16} median {:>10.2f}{:<9} min {:>10.2f}  max {:>10.2f}'.format(label, statistics.median(values), unit, min(values), max(values)))
+
+if __name__ == '__main__':
+	main()
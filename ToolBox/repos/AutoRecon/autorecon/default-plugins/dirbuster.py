@@ -1,7 +1,8 @@
 from autorecon.plugins import ServiceScan
 from autorecon.config import config
+from autorecon.wordlists import merge_wordlists, merge_results, partition_wordlist
 from shutil import which
-import os
+import asyncio, os
 
 class DirBuster(ServiceScan):
 
@@ -11,10 +12,12 @@ class DirBuster(ServiceScan):
 		self.slug = 'dirbuster'
 		self.priority = 0
 		self.tags = ['default', 'safe', 'long', 'http']
+		self.cost = 3
 
 	def configure(self):
 		self.add_choice_option('tool', default='feroxbuster', choices=['feroxbuster', 'gobuster', 'dirsearch', 'ffuf', 'dirb'], help='The tool to use for directory busting. Default: %(default)s')
-		self.add_list_option('wordlist', default=[os.path.join(config['data_dir'], 'wordlists', 'dirbuster.txt')], help='The wordlist(s) to use when directory busting. Separate multiple wordlists with spaces. Default: %(default)s')
+		self.add_list_option('wordlist', default=[os.path.join(config['data_dir'], 'wordlists', 'dirbuster.txt')], help='The wordlist(s) to use when directory busting. Separate multiple wordlists with spaces. Multiple wordlists are merged, with duplicate words removed, and busted in one run. Default: %(default)s')
+		self.add_option('partitions', default=1, help='Split the merged wordlist into this many parts and bust them in parallel, using extra scan slots as they become free. Default: %(default)s')
 		self.add_option('threads', default=10, help='The number of threads to use when directory busting. Default: %(default)s')
 		self.add_option('ext', default='txt,html,php,asp,aspx,jsp', help='The extensions you wish to fuzz (no dot, comma separated). Default: %(default)s')
 		self.add_true_option('recursive', help='Enables recursive searching (where available). Warning: This may cause significant increases to scan times. Default: %(default)s')
@@ -41,26 +44,58 @@ class DirBuster(ServiceScan):
 			return False
 
 	async def run(self, service):
+		wordlists = self.get_option('wordlist')
+		partitions = max(1, int(self.get_option('partitions')))
+
+		if len(wordlists) == 1 and partitions == 1:
+			await self.bust(service, wordlists[0], os.path.splitext(os.path.basename(wordlists[0]))[0])
+			return
+
+		# Merge the wordlists so that words in more than one of them are only requested once.
+		name = os.path.splitext(os.path.basename(wordlists[0]))[0] if len(wordlists) == 1 else 'merged'
+		try:
+			wordlist = await asyncio.get_running_loop().run_in_executor(None, merge_wordlists, wordlists, os.path.join(config['data_dir'], 'cache', 'wordlists'))
+		except OSError as ex:
+			service.error('Could not merge wordlists: ' + str(ex))
+			return
+
+		if partitions == 1:
+			await self.bust(service, wordlist, name)
+			return
+
+		# Split the merged wordlist into parts which are busted in parallel, then combine the results.
+		parts = await asyncio.get_running_loop().run_in_executor(None, partition_wordlist, wordlist, partitions)
+		part_names = [name + '_part' + str(i + 1) for i in range(len(parts))]
+		await self.run_parallel(service, [(service, part, part_name) for part, part_name in zip(parts, part_names)], self.bust_part, partitions)
+
+		scandir = service.target.scandir if config['no_port_dirs'] else os.path.join(service.target.scandir, service.protocol + str(service.port))
+		http_scheme = 'https' if 'https' in service.name or service.secure is True else 'http'
+		prefix = os.path.join(scandir, service.protocol + '_' + str(service.port) + '_' + http_scheme + '_' + self.get_option('tool') + '_')
+		merge_results([prefix + part_name + '.txt' for part_name in part_names], prefix + name + '.txt')
+
+	async def bust_part(self, part):
+		service, wordlist, name = part
+		await self.bust(service, wordlist, name)
+
+	async def bust(self, service, wordlist, name):
 		dot_extensions = ','.join(['.' + x for x in self.get_option('ext').split(',')])
-		for wordlist in self.get_option('wordlist'):
-			name = os.path.splitext(os.path.basename(wordlist))[0]
-			if self.get_option('tool') == 'feroxbuster':
-				await service.execute('feroxbuster -u {http_scheme}://{addressv6}:{port}/ -t ' + str(self.get_option('threads')) + ' -w ' + wordlist + ' -x "' + self.get_option('ext') + '" -v -k ' + ('' if self.get_option('recursive') else '-n ')  + '-q -e -r -o "{scandir}/{protocol}_{port}_{http_scheme}_feroxbuster_' + name + '.txt"' + (' ' + self.get_option('extras') if self.get_option('extras') else ''))
+		if self.get_option('tool') == 'feroxbuster':
+			await service.execute('feroxbuster -u {http_scheme}://{addressv6}:{port}/ -t ' + str(self.get_option('threads')) + ' -w ' + wordlist + ' -x "' + self.get_option('ext') + '" -v -k ' + ('' if self.get_option('recursive') else '-n ')  + '-q -e -r -o "{scandir}/{protocol}_{port}_{http_scheme}_feroxbuster_' + name + '.txt"' + (' ' + self.get_option('extras') if self.get_option('extras') else ''))
 
-			elif self.get_option('tool') == 'gobuster':
-				await service.execute('gobuster dir -u {http_scheme}://{addressv6}:{port}/ -t ' + str(self.get_option('threads')) + ' -w ' + wordlist + ' -e -k -x "' + self.get_option('ext') + '" -z -r -o "{scandir}/{protocol}_{port}_{http_scheme}_gobuster_' + name + '.txt"' + (' ' + self.get_option('extras') if self.get_option('extras') else ''))
+		elif self.get_option('tool') == 'gobuster':
+			await service.execute('gobuster dir -u {http_scheme}://{addressv6}:{port}/ -t ' + str(self.get_option('threads')) + ' -w ' + wordlist + ' -e -k -x "' + self.get_option('ext') + '" -z -r -o "{scandir}/{protocol}_{port}_{http_scheme}_gobuster_' + name + '.txt"' + (' ' + self.get_option('extras') if self.get_option('extras') else ''))
 
-			elif self.get_option('tool') == 'dirsearch':
-				if service.target.ipversion == 'IPv6':
-					service.error('dirsearch does not support IPv6.')
-				else:
-					await service.execute('dirsearch -u {http_scheme}://{address}:{port}/ -t ' + str(self.get_option('threads')) + ' -e "' + self.get_option('ext') + '" -f -q -F ' + ('-r ' if self.get_option('recursive') else '') + '-w ' + wordlist + ' --format=plain -o "{scandir}/{protocol}_{port}_{http_scheme}_dirsearch_' + name + '.txt"' + (' ' + self.get_option('extras') if self.get_option('extras') else ''))
+		elif self.get_option('tool') == 'dirsearch':
+			if service.target.ipversion == 'IPv6':
+				service.error('dirsearch does not support IPv6.')
+			else:
+				await service.execute('dirsearch -u {http_scheme}://{address}:{port}/ -t ' + str(self.get_option('threads')) + ' -e "' + self.get_option('ext') + '" -f -q -F ' + ('-r ' if self.get_option('recursive') else '') + '-w ' + wordlist + ' --format=plain -o "{scandir}/{protocol}_{port}_{http_scheme}_dirsearch_' + name + '.txt"' + (' ' + self.get_option('extras') if self.get_option('extras') else ''))
 
-			elif self.get_option('tool') == 'ffuf':
-				await service.execute('ffuf -u {http_scheme}://{addressv6}:{port}/FUZZ -t ' + str(self.get_option('threads')) + ' -w ' + wordlist + ' -e "' + dot_extensions + '" -v -r ' + ('-recursion ' if self.get_option('recursive') else '') + '-noninteractive' + (' ' + self.get_option('extras') if self.get_option('extras') else '') + ' | tee {scandir}/{protocol}_{port}_{http_scheme}_ffuf_' + name + '.txt')
+		elif self.get_option('tool') == 'ffuf':
+			await service.execute('ffuf -u {http_scheme}://{addressv6}:{port}/FUZZ -t ' + str(self.get_option('threads')) + ' -w ' + wordlist + ' -e "' + dot_extensions + '" -v -r ' + ('-recursion ' if self.get_option('recursive') else '') + '-noninteractive' + (' ' + self.get_option('extras') if self.get_option('extras') else '') + ' | tee {scandir}/{protocol}_{port}_{http_scheme}_ffuf_' + name + '.txt')
 
-			elif self.get_option('tool') == 'dirb':
-				await service.execute('dirb {http_scheme}://{addressv6}:{port}/ ' + wordlist + ' -l ' + ('' if self.get_option('recursive') else '-r ')  + '-S -X ",' + dot_extensions + '" -f -o "{scandir}/{protocol}_{port}_{http_scheme}_dirb_' + name + '.txt"' + (' ' + self.get_option('extras') if self.get_option('extras') else ''))
+		elif self.get_option('tool') == 'dirb':
+			await service.execute('dirb {http_scheme}://{addressv6}:{port}/ ' + wordlist + ' -l ' + ('' if self.get_option('recursive') else '-r ')  + '-S -X ",' + dot_extensions + '" -f -o "{scandir}/{protocol}_{port}_{http_scheme}_dirb_' + name + '.txt"' + (' ' + self.get_option('extras') if self.get_option('extras') else ''))
 
 	def manual(self, service, plugin_was_run):
 		dot_extensions = ','.join(['.' + x for x in self.get_option('ext').split(',')])
@@ -9,6 +9,7 @@ class DnsReconSubdomainBruteforce(ServiceScan):
 		self.slug = 'dnsrecon-brute'
 		self.priority = 0
 		self.tags = ['default', 'safe', 'long', 'dns']
+		self.cost = 2
 
 	def configure(self):
 		self.match_service_name('^domain')
@@ -1,6 +1,6 @@
 from autorecon.plugins import PortScan
 from autorecon.config import config
-import re, requests
+import asyncio, os, re, requests
 
 class AllTCPPortScan(PortScan):
 
@@ -12,6 +12,33 @@ class AllTCPPortScan(PortScan):
 		self.specific_ports = True
 		self.tags = ['default', 'default-port-scan', 'long']
 
+	def configure(self):
+		self.add_option('shards', default=1, help='Split the full port range between this many nmap processes, each using a port scan slot when one is free. Default: %(default)s')
+
+	# Check if HTTP service appears to be WinRM. If so, override service name as wsman.
+	async def check_winrm(self, target, service):
+		if service.name == 'http' and service.port in [5985, 5986]:
+			try:
+				wsman = await target.http_get(('https' if service.secure else 'http') + '://' + target.address + ':' + str(service.port) + '/wsman')
+				if wsman.status_code == 405:
+					service.name = 'wsman'
+					wsman = await target.http_post(('https' if service.secure else 'http') + '://' + target.address + ':' + str(service.port) + '/wsman')
+				else:
+					if wsman.status_code == 401:
+						service.name = 'wsman'
+			except requests.exceptions.RequestException:
+				pass
+
+	async def report_open_ports(self, target, stdout):
+		while True:
+			line = await stdout.readline()
+			if line is not None:
+				match = re.search('^Discovered open port ([0-9]+)/tcp', line)
+				if match:
+					target.info('Discovered open port {bmagenta}tcp/' + match.group(1) + '{rst} on {byellow}' + target.address + '{rst}', verbosity=1)
+			else:
+				break
+
 	async def run(self, target):
 		if config['proxychains']:
 			traceroute_os = ''
@@ -24,29 +51,28 @@ class AllTCPPortScan(PortScan):
 			else:
 				return []
 		else:
+			shards = int(self.get_option('shards'))
+			if shards > 1:
+				# Scan slices of the port range as separate jobs, so services from finished slices can be scanned early.
+				services = []
+				async for service in self.scan_shards(target, 'nmap {nmap_extra} -sV -sC --version-all' + traceroute_os + ' -p {ports} -oN "{scandir}/_full_tcp_nmap_{ports}.txt" -oX "{scandir}/xml/_full_tcp_nmap_{ports}.xml" {address}', '_full_tcp_nmap_{ports}.xml', shards):
+					await self.check_winrm(target, service)
+					await target.add_service(service)
+					services.append(service)
+				return services
+
 			process, stdout, stderr = await target.execute('nmap {nmap_extra} -sV -sC --version-all' + traceroute_os + ' -p- -oN "{scandir}/_full_tcp_nmap.txt" -oX "{scandir}/xml/_full_tcp_nmap.xml" {address}', blocking=False)
+
+		# Report ports as nmap discovers them.
+		open_ports = asyncio.create_task(self.report_open_ports(target, stdout))
+
+		# Read services from the XML output as nmap writes it, and hand each one over straight away.
 		services = []
-		while True:
-			line = await stdout.readline()
-			if line is not None:
-				match = re.search('^Discovered open port ([0-9]+)/tcp', line)
-				if match:
-					target.info('Discovered open port {bmagenta}tcp/' + match.group(1) + '{rst} on {byellow}' + target.address + '{rst}', verbosity=1)
-				service = target.extract_service(line)
-
-				if service:
-					# Check if HTTP service appears to be WinRM. If so, override service name as wsman.
-					if service.name == 'http' and service.port in [5985, 5986]:
-						wsman = requests.get(('https' if service.secure else 'http') + '://' + target.address + ':' + str(service.port) + '/wsman', verify=False)
-						if wsman.status_code == 405:
-							service.name = 'wsman'
-							wsman = requests.post(('https' if service.secure else 'http') + '://' + target.address + ':' + str(service.port) + '/wsman', verify=False)
-						else:
-							if wsman.status_code == 401:
-								service.name = 'wsman'
+		async for service in target.extract_services_xml(os.path.join(target.scandir, 'xml', '_full_tcp_nmap.xml'), process):
+			await self.check_winrm(target, service)
+			await target.add_service(service)
+			services.append(service)
 
-					services.append(service)
-			else:
-				break
+		await open_ports
 		await process.wait()
 		return services
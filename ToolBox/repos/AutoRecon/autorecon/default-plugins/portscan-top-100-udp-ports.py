@@ -1,6 +1,6 @@
 from autorecon.plugins import PortScan
 from autorecon.config import config
-import os, re
+import asyncio, os, re
 
 class Top100UDPPortScan(PortScan):
 
@@ -12,28 +12,39 @@ class Top100UDPPortScan(PortScan):
 		self.specific_ports = True
 		self.tags = ['default', 'default-port-scan', 'long']
 
+	async def report_open_ports(self, target, stdout):
+		while True:
+			line = await stdout.readline()
+			if line is not None:
+				match = re.search('^Discovered open port ([0-9]+)/udp', line)
+				if match:
+					target.info('Discovered open port {bmagenta}udp/' + match.group(1) + '{rst} on {byellow}' + target.address + '{rst}', verbosity=1)
+			else:
+				break
+
 	async def run(self, target):
 		# Only run UDP scan if user is root.
 		if os.getuid() == 0 or config['disable_sanity_checks']:
 			if target.ports:
 				if target.ports['udp']:
 					process, stdout, stderr = await target.execute('nmap {nmap_extra} -sU -A --osscan-guess -p ' + target.ports['udp'] + ' -oN "{scandir}/_custom_ports_udp_nmap.txt" -oX "{scandir}/xml/_custom_ports_udp_nmap.xml" {address}', blocking=False)
+					xml_file = '_custom_ports_udp_nmap.xml'
 				else:
 					return []
 			else:
 				process, stdout, stderr = await target.execute('nmap {nmap_extra} -sU -A --top-ports 100 -oN "{scandir}/_top_100_udp_nmap.txt" -oX "{scandir}/xml/_top_100_udp_nmap.xml" {address}', blocking=False)
+				xml_file = '_top_100_udp_nmap.xml'
+
+			# Report ports as nmap discovers them.
+			open_ports = asyncio.create_task(self.report_open_ports(target, stdout))
+
+			# Read services from the XML output as nmap writes it, and hand each one over straight away.
 			services = []
-			while True:
-				line = await stdout.readline()
-				if line is not None:
-					match = re.search('^Discovered open port ([0-9]+)/udp', line)
-					if match:
-						target.info('Discovered open port {bmagenta}udp/' + match.group(1) + '{rst} on {byellow}' + target.address + '{rst}', verbosity=1)
-					service = target.extract_service(line)
-					if service:
-						services.append(service)
-				else:
-					break
+			async for service in target.extract_services_xml(os.path.join(target.scandir, 'xml', xml_file), process):
+				await target.add_service(service)
+				services.append(service)
+
+			await open_ports
 			await process.wait()
 			return services
 		else:
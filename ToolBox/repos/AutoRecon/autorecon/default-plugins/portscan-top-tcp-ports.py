@@ -1,6 +1,6 @@
 from autorecon.plugins import PortScan
 from autorecon.config import config
-import requests
+import os, requests
 
 class QuickTCPPortScan(PortScan):
 
@@ -22,18 +22,25 @@ class QuickTCPPortScan(PortScan):
 			traceroute_os = ' -A --osscan-guess'
 
 		process, stdout, stderr = await target.execute('nmap {nmap_extra} -sV -sC --version-all' + traceroute_os + ' -oN "{scandir}/_quick_tcp_nmap.txt" -oX "{scandir}/xml/_quick_tcp_nmap.xml" {address}', blocking=False)
-		services = await target.extract_services(stdout)
 
-		for service in services:
+		# Read services from the XML output as nmap writes it, and hand each one over straight away.
+		services = []
+		async for service in target.extract_services_xml(os.path.join(target.scandir, 'xml', '_quick_tcp_nmap.xml'), process):
 			# Check if HTTP service appears to be WinRM. If so, override service name as wsman.
 			if service.name == 'http' and service.port in [5985, 5986]:
-				wsman = requests.get(('https' if service.secure else 'http') + '://' + target.address + ':' + str(service.port) + '/wsman', verify=False)
-				if wsman.status_code == 405:
-					service.name = 'wsman'
-					wsman = requests.post(('https' if service.secure else 'http') + '://' + target.address + ':' + str(service.port) + '/wsman', verify=False)
-				else:
-					if wsman.status_code == 401:
+				try:
+					wsman = await target.http_get(('https' if service.secure else 'http') + '://' + target.address + ':' + str(service.port) + '/wsman')
+					if wsman.status_code == 405:
 						service.name = 'wsman'
+						wsman = await target.http_post(('https' if service.secure else 'http') + '://' + target.address + ':' + str(service.port) + '/wsman')
+					else:
+						if wsman.status_code == 401:
+							service.name = 'wsman'
+				except requests.exceptions.RequestException:
+					pass
+
+			await target.add_service(service)
+			services.append(service)
 
 		await process.wait()
 		return services
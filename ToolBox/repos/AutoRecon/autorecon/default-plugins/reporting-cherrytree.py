@@ -1,7 +1,8 @@
 from autorecon.plugins import Report
 from autorecon.config import config
+from autorecon.reporting import command_files, copy_output
 from xml.sax.saxutils import escape
-import os, glob
+import os
 
 class CherryTree(Report):
 
@@ -23,8 +24,6 @@ class CherryTree(Report):
 			for target in targets:
 				output.writelines('<node name="' + escape(target.address) + '" is_bold="1" custom_icon_id="1">\n')
 
-				files = [os.path.abspath(filename) for filename in glob.iglob(os.path.join(target.scandir, '**/*'), recursive=True) if os.path.isfile(filename) and filename.endswith(('.txt', '.html'))]
-
 				if target.scans['ports']:
 					output.writelines('<node name="Port Scans" custom_icon_id="2">\n')
 					for scan in target.scans['ports'].keys():
@@ -32,11 +31,10 @@ class CherryTree(Report):
 							output.writelines('<node name="PortScan: ' + escape(target.scans['ports'][scan]['plugin'].name) + '" custom_icon_id="21">\n')
 							for command in target.scans['ports'][scan]['commands']:
 								output.writelines('<rich_text>' + escape(command[0]))
-								for filename in files:
-									if filename in command[0] or (command[1] is not None and filename == command[1]) or (command[2] is not None and filename == command[2]):
-										output.writelines('\n\n' + escape(filename) + ':\n\n')
-										with open(filename, 'r') as file:
-											output.writelines(escape(file.read()) + '\n')
+								for filename in command_files(command, target.scandir):
+									output.writelines('\n\n' + escape(filename) + ':\n\n')
+									copy_output(output, filename, transform=escape)
+									output.writelines('\n')
 								output.writelines('</rich_text>\n')
 							output.writelines('</node>\n')
 					output.writelines('</node>\n')
@@ -49,11 +47,10 @@ class CherryTree(Report):
 								output.writelines('<node name="' + escape(target.scans['services'][service][plugin]['plugin'].name) + '" custom_icon_id="21">\n')
 								for command in target.scans['services'][service][plugin]['commands']:
 									output.writelines('<rich_text>' + escape(command[0]))
-									for filename in files:
-										if filename in command[0] or (command[1] is not None and filename == command[1]) or (command[2] is not None and filename == command[2]):
-											output.writelines('\n\n' + escape(filename) + ':\n\n')
-											with open(filename, 'r') as file:
-												output.writelines(escape(file.read()) + '\n')
+									for filename in command_files(command, target.scandir):
+										output.writelines('\n\n' + escape(filename) + ':\n\n')
+										copy_output(output, filename, transform=escape)
+										output.writelines('\n')
 									output.writelines('</rich_text>\n')
 								output.writelines('</node>\n')
 						output.writelines('</node>\n')
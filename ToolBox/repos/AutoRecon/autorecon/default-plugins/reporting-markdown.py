@@ -1,12 +1,53 @@
 from autorecon.plugins import Report
 from autorecon.config import config
-import os, glob
+from autorecon.reporting import command_files, copy_output
+import os, shutil
 
 class Markdown(Report):
 
 	def __init__(self):
 		super().__init__()
 		self.name = 'Markdown'
+		# Scan pages already written while the scan was running, by target address.
+		self.written = {}
+
+	def configure(self):
+		self.add_option('max-output', default=100000, help='The maximum number of characters of each output file to include in the report. Longer files are truncated and linked to instead. Use 0 for no limit. Default: %(default)s')
+
+	def scan_page(self, target, scan, service=None):
+		if service is None:
+			return os.path.join('Port Scans', 'PortScan - ' + target.scans['ports'][scan]['plugin'].name + '.md')
+		return os.path.join('Services', 'Service - ' + service.tag().replace('/', '-'), target.scans['services'][service][scan]['plugin'].name + '.md')
+
+	def write_scan_page(self, filename, target, commands):
+		limit = int(self.get_option('max-output'))
+		os.makedirs(os.path.dirname(filename), exist_ok=True)
+		with open(filename, 'w') as output:
+			for command in commands:
+				output.write('```bash\n' + command[0] + '\n```')
+				for outfile in command_files(command, target.scandir):
+					output.write('\n\n[' + outfile + '](file://' + outfile + '):\n\n')
+					output.write('```\n')
+					truncated = copy_output(output, outfile, limit)
+					output.write('\n```\n')
+					if truncated:
+						output.write('\n*Output truncated after ' + str(limit) + ' characters. See [' + outfile + '](file://' + outfile + ') for the full output.*\n')
+
+	# Write a scan's page as soon as the scan finishes, so the per-target report is always up to date.
+	async def update(self, target, scan, service=None):
+		commands = target.scans['ports'][scan]['commands'] if service is None else target.scans['services'][service][scan]['commands']
+		if len(commands) > 0:
+			page = self.scan_page(target, scan, service)
+			self.write_scan_page(os.path.join(target.reportdir, 'report.md', target.address, page), target, commands)
+			self.written.setdefault(target.address, set()).add(page)
+
+	def write_page(self, filename, source, fence=None):
+		with open(filename, 'w') as output:
+			if fence is not None:
+				output.write('```' + fence + '\n')
+			copy_output(output, source)
+			if fence is not None:
+				output.write('\n```')
 
 	async def run(self, targets):
 		if len(targets) > 1:
@@ -21,55 +62,44 @@ class Markdown(Report):
 		for target in targets:
 			os.makedirs(os.path.join(report, target.address), exist_ok=True)
 
-			files = [os.path.abspath(filename) for filename in glob.iglob(os.path.join(target.scandir, '**/*'), recursive=True) if os.path.isfile(filename) and filename.endswith(('.txt', '.html'))]
+			# Pages written during the scan are reused, and only scans that weren't (e.g. skipped by --resume) are written now.
+			incremental = os.path.join(target.reportdir, 'report.md', target.address)
+			written = self.written.get(target.address, set())
 
+			pages = []
 			if target.scans['ports']:
 				os.makedirs(os.path.join(report, target.address, 'Port Scans'), exist_ok=True)
 				for scan in target.scans['ports'].keys():
 					if len(target.scans['ports'][scan]['commands']) > 0:
-						with open(os.path.join(report, target.address, 'Port Scans', 'PortScan - ' + target.scans['ports'][scan]['plugin'].name + '.md'), 'w') as output:
-							for command in target.scans['ports'][scan]['commands']:
-								output.writelines('```bash\n' + command[0] + '\n```')
-								for filename in files:
-									if filename in command[0] or (command[1] is not None and filename == command[1]) or (command[2] is not None and filename == command[2]):
-										output.writelines('\n\n[' + filename + '](file://' + filename + '):\n\n')
-										with open(filename, 'r') as file:
-											output.writelines('```\n' + file.read() + '\n```\n')
+						pages.append((self.scan_page(target, scan), target.scans['ports'][scan]['commands']))
 			if target.scans['services']:
 				os.makedirs(os.path.join(report, target.address, 'Services'), exist_ok=True)
 				for service in target.scans['services'].keys():
 					os.makedirs(os.path.join(report, target.address, 'Services', 'Service - ' + service.tag().replace('/', '-')), exist_ok=True)
 					for plugin in target.scans['services'][service].keys():
 						if len(target.scans['services'][service][plugin]['commands']) > 0:
-							with open(os.path.join(report, target.address, 'Services', 'Service - ' + service.tag().replace('/', '-'), target.scans['services'][service][plugin]['plugin'].name + '.md'), 'w') as output:
-								for command in target.scans['services'][service][plugin]['commands']:
-									output.writelines('```bash\n' + command[0] + '\n```')
-									for filename in files:
-										if filename in command[0] or (command[1] is not None and filename == command[1]) or (command[2] is not None and filename == command[2]):
-											output.writelines('\n\n[' + filename + '](file://' + filename + '):\n\n')
-											with open(filename, 'r') as file:
-												output.writelines('```\n' + file.read() + '\n```\n')
+							pages.append((self.scan_page(target, plugin, service), target.scans['services'][service][plugin]['commands']))
+
+			for page, commands in pages:
+				filename = os.path.join(report, target.address, page)
+				if page in written and os.path.isfile(os.path.join(incremental, page)):
+					if os.path.abspath(filename) != os.path.abspath(os.path.join(incremental, page)):
+						shutil.copyfile(os.path.join(incremental, page), filename)
+				else:
+					self.write_scan_page(filename, target, commands)
 
 			manual_commands = os.path.join(target.scandir, '_manual_commands.txt')
 			if os.path.isfile(manual_commands):
-				with open(os.path.join(report, target.address, 'Manual Commands' + '.md'), 'w') as output:
-					with open(manual_commands, 'r') as file:
-						output.writelines('```bash\n' + file.read() + '\n```')
+				self.write_page(os.path.join(report, target.address, 'Manual Commands' + '.md'), manual_commands, fence='bash')
 
 			patterns = os.path.join(target.scandir, '_patterns.log')
 			if os.path.isfile(patterns):
-				with open(os.path.join(report, target.address, 'Patterns' + '.md'), 'w') as output:
-					with open(patterns, 'r') as file:
-						output.writelines(file.read())
+				self.write_page(os.path.join(report, target.address, 'Patterns' + '.md'), patterns)
 
 			commands = os.path.join(target.scandir, '_commands.log')
 			if os.path.isfile(commands):
-				with open(os.path.join(report, target.address, 'Commands' + '.md'), 'w') as output:
-					with open(commands, 'r') as file:
-						output.writelines('```bash\n' + file.read() + '\n```')
+				self.write_page(os.path.join(report, target.address, 'Commands' + '.md'), commands, fence='bash')
 
 			errors = os.path.join(target.scandir, '_errors.log')
 			if os.path.isfile(errors):
-				with open(os.path.join(report, target.address, 'Errors' + '.md'), 'w') as output:
-					with open(errors, 'r') as file:
-						output.writelines('```\n' + file.read() + '\n```')
+				self.write_page(os.path.join(report, target.address, 'Errors' + '.md'), errors, fence='')
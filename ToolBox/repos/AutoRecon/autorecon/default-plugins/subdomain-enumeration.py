@@ -8,6 +8,7 @@ class SubdomainEnumeration(ServiceScan):
 		self.name = "Subdomain Enumeration"
 		self.slug = "subdomain-enum"
 		self.tags = ['default', 'safe', 'long', 'dns']
+		self.cost = 2
 
 	def configure(self):
 		self.add_option('domain', help='The domain to use as the base domain (e.g. example.com) for subdomain enumeration. Default: %(default)s')
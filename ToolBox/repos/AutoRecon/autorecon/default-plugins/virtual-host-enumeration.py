@@ -1,7 +1,6 @@
 from autorecon.plugins import ServiceScan
 from shutil import which
-import os, requests, random, string, urllib3
-urllib3.disable_warnings()
+import os, random, requests, string
 
 class VirtualHost(ServiceScan):
 
@@ -10,6 +9,7 @@ class VirtualHost(ServiceScan):
 		self.name = 'Virtual Host Enumeration'
 		self.slug = 'vhost-enum'
 		self.tags = ['default', 'safe', 'http', 'long']
+		self.cost = 2
 
 	def configure(self):
 		self.add_option('hostname', help='The hostname to use as the base host (e.g. example.com) for virtual host enumeration. Default: %(default)s')
@@ -31,7 +31,11 @@ class VirtualHost(ServiceScan):
 			for wordlist in self.get_option('wordlist'):
 				name = os.path.splitext(os.path.basename(wordlist))[0]
 				for hostname in hostnames:
-					wildcard = requests.get(('https' if service.secure else 'http') + '://' + service.target.address + ':' + str(service.port) + '/', headers={'Host':''.join(random.choice(string.ascii_letters) for i in range(20)) + '.' + hostname}, verify=False)
+					try:
+						wildcard = await service.target.http_get(('https' if service.secure else 'http') + '://' + service.target.address + ':' + str(service.port) + '/', headers={'Host':''.join(random.choice(string.ascii_letters) for i in range(20)) + '.' + hostname})
+					except requests.exceptions.RequestException:
+						service.error('Could not get a baseline response for ' + hostname + ', skipping virtual host enumeration for it.')
+						continue
 
 					size = str(len(wildcard.content))
 					await service.execute('ffuf -u {http_scheme}://' + hostname + ':{port}/ -t ' + str(self.get_option('threads')) + ' -w ' + wordlist + ' -H "Host: FUZZ.' + hostname + '" -mc all -fs ' + size + ' -r -noninteractive -s | tee "{scandir}/{protocol}_{port}_{http_scheme}_' + hostname + '_vhosts_' + name + '.txt"')
@@ -0,0 +1,63 @@
+import json, os, time
+
+# Moving averages of how long each plugin takes, overall and per service name (e.g. dirbuster against http).
+# The scheduler uses them to start the longest scans first, so they don't end up deciding the total run time.
+class History:
+
+	def __init__(self, path, alpha=0.3, save_interval=60):
+		self.path = path
+		self.alpha = alpha
+		self.save_interval = save_interval
+		self.durations = {}
+		self.last_save = time.time()
+
+		if path is not None and os.path.isfile(path):
+			try:
+				with open(path, 'r') as file:
+					self.durations = json.load(file)
+			except (OSError, ValueError):
+				self.durations = {}
+
+	def key(self, slug, service_name=None):
+		if service_name is None:
+			return slug
+		return slug + ':' + service_name
+
+	# Expected duration in seconds, falling back to the plugin's overall average, or None if it has never run.
+	def expected(self, slug, service_name=None):
+		entry = self.durations.get(self.key(slug, service_name))
+		if entry is None and service_name is not None:
+			entry = self.durations.get(self.key(slug))
+		if entry is None:
+			return None
+		return entry['average']
+
+	def record(self, slug, service_name, duration):
+		keys = [self.key(slug)]
+		if service_name is not None:
+			keys.append(self.key(slug, service_name))
+
+		for key in keys:
+			entry = self.durations.get(key)
+			if entry is None:
+				self.durations[key] = {'average': duration, 'count': 1}
+			else:
+				entry['average'] += self.alpha * (duration - entry['average'])
+				entry['count'] += 1
+
+		if time.time() - self.last_save >= self.save_interval:
+			self.save()
+
+	def save(self):
+		if self.path is None:
+			return
+		self.last_save = time.time()
+
+		# Write to a temporary file first so an interrupted save can't corrupt the history.
+		tmp_path = self.path + '.tmp'
+		try:
+			with open(tmp_path, 'w') as file:
+				json.dump(self.durations, file, indent='\t', sort_keys=True)
+			os.replace(tmp_path, self.path)
+		except OSError:
+			pass
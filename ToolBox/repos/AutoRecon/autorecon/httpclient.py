@@ -0,0 +1,96 @@
+import asyncio, functools, requests, sys, threading, time, urllib3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from autorecon.io import warn
+
+urllib3.disable_warnings()
+
+# HTTP requests for plugins that don't block the event loop. Requests run on a small thread pool using a shared
+# session (so connections are reused), with a limit on how many requests can be sent to one host at a time.
+class HTTPClient:
+
+	def __init__(self, max_workers=10, max_per_host=4, timeout=(5, 10)):
+		self.max_per_host = max_per_host
+		self.timeout = timeout
+		self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='autorecon-http')
+		self.hosts = {}
+
+		self.session = requests.Session()
+		adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+		self.session.mount('http://', adapter)
+		self.session.mount('https://', adapter)
+
+	def host_limit(self, url):
+		host = urlsplit(url).netloc
+		if host not in self.hosts:
+			self.hosts[host] = asyncio.Semaphore(self.max_per_host)
+		return self.hosts[host]
+
+	async def request(self, method, url, **kwargs):
+		kwargs.setdefault('timeout', self.timeout)
+		kwargs.setdefault('verify', False)
+
+		async with self.host_limit(url):
+			return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(self.session.request, method, url, **kwargs))
+
+	async def get(self, url, **kwargs):
+		return await self.request('GET', url, **kwargs)
+
+	async def post(self, url, **kwargs):
+		return await self.request('POST', url, **kwargs)
+
+	def close(self):
+		self.executor.shutdown(wait=False)
+		self.session.close()
+
+# Warns when something (usually a plugin making a blocking call) stops the event loop from running for longer than
+# threshold seconds. A heartbeat task runs on the loop, and a thread checks it hasn't gone quiet. While the loop is
+# stuck, the thread looks at the main thread's stack to find out which plugin is responsible.
+class LoopWatchdog:
+
+	def __init__(self, threshold=0.5, interval=0.1):
+		self.threshold = threshold
+		self.interval = interval
+		self.last_beat = time.monotonic()
+		self.culprit = None
+		self.stopped = False
+		self.loop_thread = None
+		self.task = None
+
+	def start(self):
+		self.loop_thread = threading.get_ident()
+		self.last_beat = time.monotonic()
+		self.task = asyncio.ensure_future(self.heartbeat())
+		threading.Thread(target=self.watch, name='autorecon-watchdog', daemon=True).start()
+
+	def stop(self):
+		self.stopped = True
+		if self.task is not None:
+			self.task.cancel()
+
+	async def heartbeat(self):
+		while not self.stopped:
+			before = time.monotonic()
+			await asyncio.sleep(self.interval)
+			self.last_beat = time.monotonic()
+
+			blocked = self.last_beat - before - self.interval
+			if blocked > self.threshold:
+				warn('{byellow}The event loop was blocked for ' + str(round(blocked, 2)) + ' seconds' + ((' by ' + self.culprit) if self.culprit else '') + '.{rst}')
+			self.culprit = None
+
+	def watch(self):
+		while not self.stopped:
+			time.sleep(self.interval)
+			if self.culprit is None and time.monotonic() - self.last_beat > self.threshold:
+				self.culprit = self.find_culprit()
+
+	# Walk the loop thread's stack to find the innermost plugin method that is running.
+	def find_culprit(self):
+		frame = sys._current_frames().get(self.loop_thread)
+		while frame is not None:
+			plugin = frame.f_locals.get('self')
+			if plugin is not None and hasattr(plugin, 'slug') and hasattr(plugin, 'autorecon'):
+				return plugin.name + ' (' + plugin.slug + ') at ' + frame.f_code.co_filename + ':' + str(frame.f_lineno)
+			frame = frame.f_back
+		return None
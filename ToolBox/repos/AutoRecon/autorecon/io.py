@@ -1,11 +1,75 @@
-import asyncio, colorama, os, re, string, sys, unidecode
+import asyncio, collections, colorama, functools, json, re, string, sys, time, unidecode
 from colorama import Fore, Style
 from autorecon.config import config
+from autorecon.metrics import metrics
+
+try:
+	from re import _parser as sre_parse
+except ImportError: # Python < 3.11
+	import sre_parse
 
 def slugify(name):
 	return re.sub(r'[\W_]+', '-', unidecode.unidecode(name).lower()).strip('-')
 
+# Names usable in messages for colors and styles, e.g. info('{bright}Done{rst}').
+colors = {
+	'bgreen':  Fore.GREEN  + Style.BRIGHT,
+	'bred':	Fore.RED	+ Style.BRIGHT,
+	'bblue':   Fore.BLUE   + Style.BRIGHT,
+	'byellow': Fore.YELLOW + Style.BRIGHT,
+	'bmagenta': Fore.MAGENTA + Style.BRIGHT,
+
+	'green':  Fore.GREEN,
+	'red':	Fore.RED,
+	'blue':   Fore.BLUE,
+	'yellow': Fore.YELLOW,
+	'magenta': Fore.MAGENTA,
+
+	'bright': Style.BRIGHT,
+	'srst':   Style.NORMAL,
+	'crst':   Fore.RESET,
+	'rst':	Style.NORMAL + Fore.RESET
+}
+no_colors = dict.fromkeys(colors, '')
+
+# An optional file that every printed message is also written to, as one JSON object per line.
+log_sink = None
+
+def set_log_sink(path):
+	global log_sink
+	if log_sink is not None:
+		log_sink.close()
+	log_sink = open(path, 'a') if path else None
+
+# The simple field names a template uses, or None if it uses anything else (e.g. {0}, {service.name} or {x[0]}).
+# Templates are only parsed once.
+@functools.lru_cache(maxsize=4096)
+def template_fields(template):
+	fields = set()
+	try:
+		for _, field_name, _, _ in string.Formatter().parse(template):
+			if field_name is None:
+				continue
+			if not field_name.isidentifier():
+				return None
+			fields.add(field_name)
+	except ValueError:
+		return None
+	return frozenset(fields)
+
+# Messages that only use color fields always format the same way, so they are formatted once.
+@functools.lru_cache(maxsize=4096)
+def format_colors(template, accessible):
+	return template.format_map(no_colors if accessible else colors)
+
 def e(*args, frame_index=1, **kvargs):
+	template = ' '.join(args)
+
+	# Values passed explicitly are enough, so there is no need to look at the caller's variables.
+	fields = template_fields(template)
+	if fields is not None and not args[1:] and fields <= kvargs.keys():
+		return template.format_map(kvargs)
+
 	frame = sys._getframe(frame_index)
 
 	vals = {}
@@ -14,47 +78,47 @@ def e(*args, frame_index=1, **kvargs):
 	vals.update(frame.f_locals)
 	vals.update(kvargs)
 
-	return string.Formatter().vformat(' '.join(args), args, vals)
+	return string.Formatter().vformat(template, args, vals)
 
 def fformat(s):
 	return e(s, frame_index=3)
 
-def cprint(*args, color=Fore.RESET, char='*', sep=' ', end='\n', frame_index=1, file=sys.stdout, printmsg=True, verbosity=0, **kvargs):
+def cprint(*args, color=Fore.RESET, char='*', sep=' ', end='\n', frame_index=1, file=sys.stdout, printmsg=True, verbosity=0, level='info', **kvargs):
 	if printmsg and verbosity > config['verbose']:
 		return ''
-	frame = sys._getframe(frame_index)
 
-	vals = {
-		'bgreen':  Fore.GREEN  + Style.BRIGHT,
-		'bred':	Fore.RED	+ Style.BRIGHT,
-		'bblue':   Fore.BLUE   + Style.BRIGHT,
-		'byellow': Fore.YELLOW + Style.BRIGHT,
-		'bmagenta': Fore.MAGENTA + Style.BRIGHT,
-
-		'green':  Fore.GREEN,
-		'red':	Fore.RED,
-		'blue':   Fore.BLUE,
-		'yellow': Fore.YELLOW,
-		'magenta': Fore.MAGENTA,
-
-		'bright': Style.BRIGHT,
-		'srst':   Style.NORMAL,
-		'crst':   Fore.RESET,
-		'rst':	Style.NORMAL + Fore.RESET
-	}
+	prefix = ''
+	if char is not None and not config['accessible']:
+		prefix = color + '[' + Style.BRIGHT + char + Style.NORMAL + ']' + Fore.RESET + sep
+	unfmt = sep.join(args)
+
+	# Fast path: every field is a color or was passed explicitly, so the caller's frame isn't needed.
+	fields = template_fields(unfmt)
+	if fields is not None and not kvargs and fields <= colors.keys():
+		fmted = format_colors(unfmt, config['accessible'])
+	elif fields is not None and fields <= (colors.keys() | kvargs.keys()):
+		vals = dict(no_colors if config['accessible'] else colors)
+		vals.update(kvargs)
+		fmted = unfmt.format_map(vals)
+	else:
+		fmted = legacy_format(unfmt, args, kvargs, frame_index + 1)
 
-	if config['accessible']:
-		 vals = {'bgreen':'', 'bred':'', 'bblue':'', 'byellow':'', 'bmagenta':'', 'green':'', 'red':'', 'blue':'', 'yellow':'', 'magenta':'', 'bright':'', 'srst':'', 'crst':'', 'rst':''}
+	if printmsg:
+		print(prefix + fmted, sep=sep, end=end, file=file)
+		if log_sink is not None:
+			write_log(level, fmted, kvargs)
+	else:
+		return prefix + fmted
+
+# Format a message using the caller's variables, escaping any fields that can't be found.
+def legacy_format(unfmt, args, kvargs, frame_index):
+	frame = sys._getframe(frame_index)
 
+	vals = dict(no_colors if config['accessible'] else colors)
 	vals.update(frame.f_globals)
 	vals.update(frame.f_locals)
 	vals.update(kvargs)
 
-	unfmt = ''
-	if char is not None and not config['accessible']:
-		unfmt += color + '[' + Style.BRIGHT + char + Style.NORMAL + ']' + Fore.RESET + sep
-	unfmt += sep.join(args)
-
 	fmted = unfmt
 
 	for attempt in range(10):
@@ -65,120 +129,285 @@ def cprint(*args, color=Fore.RESET, char='*', sep=' ', end='\n', frame_index=1,
 			key = err.args[0]
 			unfmt = unfmt.replace('{' + key + '}', '{{' + key + '}}')
 
-	if printmsg:
-		print(fmted, sep=sep, end=end, file=file)
-	else:
-		return fmted
+	return fmted
+
+ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
+
+def write_log(level, message, kvargs):
+	record = {'time': round(time.time(), 3), 'level': level, 'message': ansi_escape.sub('', message)}
+	for key, value in kvargs.items():
+		if isinstance(value, (str, int, float, bool)) or value is None:
+			record[key] = value
+	log_sink.write(json.dumps(record) + '\n')
+	log_sink.flush()
 
 def debug(*args, color=Fore.GREEN, sep=' ', end='\n', file=sys.stdout, **kvargs):
 	if config['verbose'] >= 2:
 		if config['accessible']:
 			args = ('Debug:',) + args
-		cprint(*args, color=color, char='-', sep=sep, end=end, file=file, frame_index=2, **kvargs)
+		cprint(*args, color=color, char='-', sep=sep, end=end, file=file, frame_index=2, level='debug', **kvargs)
 
-def info(*args, sep=' ', end='\n', file=sys.stdout, **kvargs):
-	cprint(*args, color=Fore.BLUE, char='*', sep=sep, end=end, file=file, frame_index=2, **kvargs)
+def info(*args, sep=' ', end='\n', file=sys.stdout, verbosity=0, **kvargs):
+	if verbosity > config['verbose']:
+		return
+	cprint(*args, color=Fore.BLUE, char='*', sep=sep, end=end, file=file, frame_index=2, verbosity=verbosity, level='info', **kvargs)
 
-def warn(*args, sep=' ', end='\n', file=sys.stderr,**kvargs):
+def warn(*args, sep=' ', end='\n', file=sys.stderr, verbosity=0, **kvargs):
+	if verbosity > config['verbose']:
+		return
 	if config['accessible']:
 		args = ('Warning:',) + args
-	cprint(*args, color=Fore.YELLOW, char='!', sep=sep, end=end, file=file, frame_index=2, **kvargs)
+	cprint(*args, color=Fore.YELLOW, char='!', sep=sep, end=end, file=file, frame_index=2, verbosity=verbosity, level='warning', **kvargs)
 
-def error(*args, sep=' ', end='\n', file=sys.stderr, **kvargs):
+def error(*args, sep=' ', end='\n', file=sys.stderr, verbosity=0, **kvargs):
+	if verbosity > config['verbose']:
+		return
 	if config['accessible']:
 		args = ('Error:',) + args
-	cprint(*args, color=Fore.RED, char='!', sep=sep, end=end, file=file, frame_index=2, **kvargs)
+	cprint(*args, color=Fore.RED, char='!', sep=sep, end=end, file=file, frame_index=2, verbosity=verbosity, level='error', **kvargs)
 
 def fail(*args, sep=' ', end='\n', file=sys.stderr, **kvargs):
 	if config['accessible']:
 		args = ('Failure:',) + args
-	cprint(*args, color=Fore.RED, char='!', sep=sep, end=end, file=file, frame_index=2, **kvargs)
+	cprint(*args, color=Fore.RED, char='!', sep=sep, end=end, file=file, frame_index=2, level='failure', **kvargs)
 	exit(-1)
 
+# Flags that can be applied to part of a regex with (?flags:...).
+scoped_flags = {re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's', re.VERBOSE: 'x'}
+
+# Walk a parsed regex and yield every (op, av) pair, including those in nested groups.
+def _regex_ops(parsed):
+	for op, av in parsed:
+		yield op, av
+		for item in (av if isinstance(av, (list, tuple)) else [av]):
+			if isinstance(item, sre_parse.SubPattern):
+				yield from _regex_ops(item)
+			elif isinstance(item, (list, tuple)):
+				for subitem in item:
+					if isinstance(subitem, sre_parse.SubPattern):
+						yield from _regex_ops(subitem)
+
+# Find the longest literal string that every match of the regex must contain, or None.
+def _required_literal(parsed):
+	best = ''
+	run = ''
+	for op, av in parsed:
+		if op == sre_parse.LITERAL:
+			run += chr(av)
+			continue
+		if op == sre_parse.SUBPATTERN and not av[1] and not av[2]: # A plain group is always part of the match.
+			inner = _required_literal(av[-1])
+			if inner is not None and len(inner) > len(best):
+				best = inner
+		if len(run) > len(best):
+			best = run
+		run = ''
+	if len(run) > len(best):
+		best = run
+	return best if len(best) >= 3 else None
+
+class PatternMatcher(object):
+
+	def __init__(self, patterns):
+		self.patterns = list(patterns)
+		self.literals = []
+		self.combinable = []
+		self.references = []
+
+		sources = []
+		for p in self.patterns:
+			literal = None
+			source = self._scoped_source(p.pattern)
+			if source is not None:
+				parsed = sre_parse.parse(p.pattern.pattern, p.pattern.flags)
+				if not p.pattern.flags & re.IGNORECASE:
+					literal = _required_literal(parsed)
+				# Back references would point at the wrong groups once patterns are joined together.
+				if any(op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS) for op, _ in _regex_ops(parsed)):
+					source = None
+
+			self.literals.append(literal)
+			self.combinable.append(source is not None)
+			if source is not None:
+				sources.append(source)
+
+			# Highest {matchN} the description uses.
+			self.references.append(max([int(n) for n in re.findall(r'\{match(\d+)\}', p.description or '')] or [0]))
+
+		# One regex that matches if any of the combinable patterns would, so most lines are only scanned once.
+		self.combined = None
+		if sources:
+			try:
+				self.combined = re.compile('|'.join('(?:' + source + ')' for source in sources))
+			except re.error: # e.g. the same named group in two patterns.
+				self.combined = None
+
+	# Rewrite a regex so that it can be embedded in a larger one, or return None if that isn't possible.
+	def _scoped_source(self, compiled):
+		if not isinstance(compiled.pattern, str):
+			return None
+
+		source = compiled.pattern
+		flags = ''
+		for flag, letter in scoped_flags.items():
+			if compiled.flags & flag:
+				flags += letter
+
+		if compiled.flags & ~(re.UNICODE | re.IGNORECASE | re.MULTILINE | re.DOTALL | re.VERBOSE):
+			return None
+
+		# Global inline flags such as (?i) must be at the start of a regex, so move them into a scoped group.
+		leading = re.match(r'\(\?[imsx]+\)', source)
+		if leading:
+			source = source[leading.end():]
+		if '(?' in source and re.search(r'\(\?[aiLmsux]+\)', source):
+			return None
+
+		if flags:
+			return '(?' + flags + ':' + source + ')'
+		return source
+
+	# Return (pattern, match, substitutions) for every pattern that matches the line, in pattern order.
+	def match(self, line):
+		matches = []
+		if not self.patterns:
+			return matches
+
+		any_combinable = self.combined is None or self.combined.search(line) is not None
+
+		for i, p in enumerate(self.patterns):
+			if self.combinable[i] and not any_combinable:
+				continue
+			if self.literals[i] is not None and self.literals[i] not in line:
+				continue
+
+			match = p.pattern.search(line)
+			if match:
+				matches.append((p, match, self._substitutions(i, p, match, line)))
+		return matches
+
+	# Values for {match1}, {match2}, ... in the description.
+	def _substitutions(self, i, p, match, line):
+		if not p.description or not self.references[i]:
+			return []
+		if p.pattern.groups > 1:
+			return ['' if group is None else group for group in match.groups()]
+		if self.references[i] == 1:
+			return [match.group(p.pattern.groups) or '']
+		# Descriptions that refer to later occurrences need every match on the line.
+		return p.pattern.findall(line)
+
 class CommandStreamReader(object):
 
-	def __init__(self, stream, target, tag, patterns=None, outfile=None):
+	# How much output to read from the stream at once. Lines are processed a chunk at a time.
+	chunk_size = 65536
+
+	def __init__(self, stream, target, tag, patterns=None, outfile=None, matcher=None):
 		self.stream = stream
 		self.target = target
 		self.tag = tag
-		self.lines = []
+		self.lines = collections.deque()
 		self.patterns = patterns or []
+		self.matcher = matcher if matcher is not None else PatternMatcher(self.patterns)
 		self.outfile = outfile
 		self.ended = False
+		self.writer = None
 
-		# Empty files that already exist.
+		# Set whenever new lines are available, and when the stream ends.
+		self.updated = asyncio.Event()
+		self.ended_event = asyncio.Event()
+
+		# Empty files that already exist, and keep them open for the lifetime of the stream.
 		if self.outfile != None:
-			with open(self.outfile, 'w'): pass
+			self.writer = open(self.outfile, 'w')
 
 	# Read lines from the stream until it ends.
 	async def _read(self):
-		while True:
-			if self.stream.at_eof():
-				break
-			try:
-				line = (await self.stream.readline()).decode('utf8').rstrip()
-			except ValueError:
-				error('{bright}[{yellow}' + self.target.address + '{crst}/{bgreen}' + self.tag + '{crst}]{rst} A line was longer than 64 KiB and cannot be processed. Ignoring.')
-				continue
-
-			if line != '':
-				info('{bright}[{yellow}' + self.target.address + '{crst}/{bgreen}' + self.tag + '{crst}]{rst} ' + line.strip().replace('{', '{{').replace('}', '}}'), verbosity=3)
+		try:
+			buffer = b''
+			while True:
+				chunk = await self.stream.read(self.chunk_size)
+				if chunk:
+					metrics.inc('autorecon_output_bytes_total', len(chunk))
+					buffer += chunk
+					if b'\n' not in chunk:
+						continue
+					raw_lines = buffer.split(b'\n')
+					buffer = raw_lines.pop()
+				elif buffer:
+					# The stream ended without a trailing newline.
+					raw_lines = [buffer]
+					buffer = b''
+				else:
+					break
+
+				# Tools don't always print valid UTF-8, and a line that can't be decoded must not stop the reader (nothing would drain the pipe).
+				self._process([raw_line.decode('utf8', errors='replace').rstrip() for raw_line in raw_lines])
+				await asyncio.sleep(0) # Let other tasks run between chunks of a very chatty command.
+		finally:
+			if self.writer is not None:
+				self.writer.close()
+			self.ended = True
+			self.ended_event.set()
+			self.updated.set()
+
+	# Check a chunk of lines for pattern matches, then write and cache them.
+	def _process(self, lines):
+		matched = []
+		# The prefix is the same for every line, so the message template is only parsed once per command.
+		prefix = '{bright}[{yellow}' + self.target.address + '{crst}/{bgreen}' + self.tag + '{crst}]{rst} '
+		show_lines = config['verbose'] >= 3
+		for line in lines:
+			if show_lines and line != '':
+				info(prefix + '{line}', line=line.strip(), verbosity=3)
 
 			# Check lines for pattern matches.
-			for p in self.patterns:
-				description = ''
-
-				# Match and replace entire pattern.
-				match = p.pattern.search(line)
-				if match:
-					if p.description:
-						description = p.description.replace('{match}', line[match.start():match.end()])
-
-						# Match and replace substrings.
-						matches = p.pattern.findall(line)
-						if len(matches) > 0 and isinstance(matches[0], tuple):
-							matches = list(matches[0])
-
-						match_count = 1
-						for match in matches:
-							if p.description:
-								description = description.replace('{match' + str(match_count) + '}', match)
-							match_count += 1
-
-						async with self.target.lock:
-							with open(os.path.join(self.target.scandir, '_patterns.log'), 'a') as file:
-								info('{bright}[{yellow}' + self.target.address + '{crst}/{bgreen}' + self.tag + '{crst}]{rst} {bmagenta}' + description + '{rst}', verbosity=2)
-								file.writelines(description + '\n\n')
-					else:
-						info('{bright}[{yellow}' + self.target.address + '{crst}/{bgreen}' + self.tag + '{crst}]{rst} {bmagenta}Matched Pattern: ' + line[match.start():match.end()] + '{rst}', verbosity=2)
-						async with self.target.lock:
-							with open(os.path.join(self.target.scandir, '_patterns.log'), 'a') as file:
-								file.writelines('Matched Pattern: ' + line[match.start():match.end()] + '\n\n')
-
-			if self.outfile is not None:
-				with open(self.outfile, 'a') as writer:
-					writer.write(line + '\n')
-			self.lines.append(line)
-		self.ended = True
+			for p, match, substitutions in self.matcher.match(line):
+				if p.description:
+					# Match and replace entire pattern.
+					description = p.description.replace('{match}', match.group(0))
+
+					# Match and replace substrings.
+					match_count = 1
+					for value in substitutions:
+						description = description.replace('{match' + str(match_count) + '}', value)
+						match_count += 1
+
+					info(prefix + '{bmagenta}' + description + '{rst}', verbosity=2)
+					matched.append(description + '\n\n')
+				else:
+					info(prefix + '{bmagenta}Matched Pattern: {match}{rst}', match=match.group(0), verbosity=2)
+					matched.append('Matched Pattern: ' + match.group(0) + '\n\n')
+
+		metrics.inc('autorecon_output_lines_total', len(lines))
+
+		if matched:
+			metrics.inc('autorecon_pattern_matches_total', len(matched))
+			self.target.write_patterns(matched)
+
+		if self.writer is not None:
+			self.writer.writelines(line + '\n' for line in lines)
+			self.writer.flush()
+
+		self.lines.extend(lines)
+		self.updated.set()
+
+	# Wait until the stream has ended.
+	async def wait(self):
+		await self.ended_event.wait()
 
 	# Read a line from the stream cache.
 	async def readline(self):
-		while True:
-			try:
-				return self.lines.pop(0)
-			except IndexError:
-				if self.ended:
-					return None
-				else:
-					await asyncio.sleep(0.1)
+		while not self.lines:
+			if self.ended:
+				return None
+			self.updated.clear()
+			await self.updated.wait()
+		return self.lines.popleft()
 
 	# Read all lines from the stream cache.
 	async def readlines(self):
-		lines = []
-		while True:
-			line = await self.readline()
-			if line is not None:
-				lines.append(line)
-			else:
-				break
+		await self.wait()
+		lines = list(self.lines)
+		self.lines.clear()
 		return lines
@@ -0,0 +1,107 @@
+import json, os, time
+
+# An append-only record of what happened to each scan, so an interrupted run can be resumed with --resume.
+# Each line is a JSON object. A line that was only partly written when AutoRecon died is ignored.
+class Journal:
+
+	# load_paths are the journals to resume from, if not just this one (e.g. the journals of every worker).
+	def __init__(self, path, resume=False, load_paths=None):
+		self.path = path
+		self.targets = {}
+
+		if resume:
+			for load_path in (load_paths if load_paths is not None else [path]):
+				if os.path.isfile(load_path):
+					self.load(load_path)
+
+		# Without --resume, start a new journal.
+		self.file = open(path, 'a' if resume else 'w')
+
+	def target_state(self, address):
+		if address not in self.targets:
+			self.targets[address] = {'ports':set(), 'services':set(), 'service_slugs':set(), 'discovered':{}, 'commands':{}, 'finished':False}
+		return self.targets[address]
+
+	def load(self, path):
+		with open(path, 'r') as file:
+			for line in file:
+				try:
+					record = json.loads(line)
+				except ValueError:
+					continue
+
+				if 'target' not in record:
+					continue
+
+				state = self.target_state(record['target'])
+				event = record.get('event')
+
+				if event == 'command':
+					state['commands'].setdefault(record['tag'], []).append([record['cmd'], record.get('outfile'), record.get('errfile')])
+				elif event == 'service':
+					service = (record['protocol'], record['port'], record['name'], record['secure'])
+					state['discovered'][service] = True
+				elif event == 'completed':
+					if record['kind'] == 'port':
+						state['ports'].add(record['tag'])
+					elif record['kind'] == 'service':
+						state['services'].add(record['tag'])
+						state['service_slugs'].add(record['plugin'])
+				elif event == 'finished':
+					state['finished'] = True
+
+	def write(self, event, sync=False, **fields):
+		record = {'time': round(time.time(), 3), 'event': event}
+		record.update(fields)
+		self.file.write(json.dumps(record) + '\n')
+		self.file.flush()
+
+		# Completed scans are what --resume relies on, so make sure they reach the disk.
+		if sync:
+			os.fsync(self.file.fileno())
+
+	def write_service(self, address, service):
+		self.write('service', target=address, protocol=service.protocol, port=service.port, name=service.name, secure=service.secure)
+
+	def is_completed(self, address, kind, tag, plugin=None, run_once=False):
+		state = self.targets.get(address)
+		if state is None:
+			return False
+		if kind == 'port':
+			return tag in state['ports']
+		if run_once and plugin in state['service_slugs']:
+			return True
+		return tag in state['services']
+
+	# Whether a worker finished scanning the target in a previous run (only recorded with --workers).
+	def is_finished(self, address):
+		state = self.targets.get(address)
+		return state is not None and state['finished']
+
+	# Targets that a worker finished scanning, in the order they were handed out (only recorded with --workers).
+	def finished_targets(self):
+		return [address for address, state in self.targets.items() if state['finished']]
+
+	# Services found in previous runs, in the order they were found.
+	def discovered_services(self, address):
+		state = self.targets.get(address)
+		if state is None:
+			return []
+		return list(state['discovered'])
+
+	# Commands (and their output files) that previous runs used for a scan.
+	def commands(self, address, tag):
+		state = self.targets.get(address)
+		if state is None:
+			return []
+		return state['commands'].get(tag, [])
+
+	# Tags of the scans that ran commands against the target, in the order they ran them.
+	def scan_tags(self, address):
+		state = self.targets.get(address)
+		if state is None:
+			return []
+		return list(state['commands'])
+
+	def close(self):
+		self.file.close()
@@ -0,0 +1,91 @@
+import asyncio, os
+from autorecon.metrics import metrics
+
+# Read the host's load figures from /proc. Returns None where /proc isn't available (e.g. macOS).
+class LoadSampler:
+
+	def __init__(self):
+		self.cpus = os.cpu_count() or 1
+		self.last_cpu = None
+
+	def read_cpu_times(self):
+		with open('/proc/stat', 'r') as file:
+			fields = file.readline().split()
+		# cpu user nice system idle iowait irq softirq steal ...
+		times = [int(field) for field in fields[1:9]]
+		return sum(times), times[4]
+
+	def sample(self):
+		try:
+			with open('/proc/loadavg', 'r') as file:
+				loadavg = file.read().split()
+
+			meminfo = {}
+			with open('/proc/meminfo', 'r') as file:
+				for line in file:
+					key, value = line.split(':', 1)
+					meminfo[key] = int(value.split()[0])
+
+			total, iowait = self.read_cpu_times()
+		except (OSError, ValueError, IndexError):
+			return None
+
+		iowait_fraction = 0.0
+		if self.last_cpu is not None and total > self.last_cpu[0]:
+			iowait_fraction = (iowait - self.last_cpu[1]) / (total - self.last_cpu[0])
+		self.last_cpu = (total, iowait)
+
+		return {
+			'load': float(loadavg[0]) / self.cpus,
+			# Runnable tasks right now (this includes AutoRecon itself), which reacts faster than the load average.
+			'runnable': max(0, int(loadavg[3].split('/')[0]) - 1) / self.cpus,
+			'memory': meminfo.get('MemAvailable', meminfo.get('MemFree', 0)) / max(1, meminfo.get('MemTotal', 1)),
+			'iowait': iowait_fraction
+		}
+
+# Additive increase, multiplicative decrease of the scan slots in use, between 1 and the configured maximum.
+# When the host is overloaded the number of slots is cut by decrease; otherwise it grows by increase slots each time.
+class LoadController:
+
+	def __init__(self, max_slots, min_slots=1, max_load=1.0, min_memory=0.1, max_iowait=0.3, increase=1, decrease=0.75):
+		self.max_slots = max_slots
+		self.min_slots = min(min_slots, max_slots)
+		self.max_load = max_load
+		self.min_memory = min_memory
+		self.max_iowait = max_iowait
+		self.increase = increase
+		self.decrease = decrease
+		self.slots = max_slots
+
+	def overloaded(self, sample):
+		# Use whichever of the load average and the current run queue is lower, so a spike that has already
+		# passed (load average) or a momentary burst (run queue) doesn't cut the slots on its own.
+		load = min(sample['load'], sample['runnable'])
+		return load > self.max_load or sample['memory'] < self.min_memory or sample['iowait'] > self.max_iowait
+
+	def update(self, sample):
+		if sample is None:
+			return self.slots
+
+		if self.overloaded(sample):
+			self.slots = max(self.min_slots, int(self.slots * self.decrease))
+		else:
+			self.slots = min(self.max_slots, self.slots + self.increase)
+		return self.slots
+
+# Adjust the scheduler's limits from the host's load every interval seconds.
+async def control_load(scheduler, interval=5, sampler=None, controller=None):
+	sampler = sampler or LoadSampler()
+	controller = controller or LoadController(scheduler.max_slots())
+	sampler.sample() # The first sample sets the baseline for iowait.
+
+	while True:
+		await asyncio.sleep(interval)
+		sample = sampler.sample()
+		slots = controller.update(sample)
+		scheduler.set_scale(slots / controller.max_slots)
+
+		if sample is not None:
+			for name, value in sample.items():
+				metrics.set('autorecon_host_' + name, round(value, 4))
+		metrics.set('autorecon_adaptive_slots', slots)
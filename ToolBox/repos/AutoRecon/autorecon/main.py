@@ -13,9 +13,16 @@ except ModuleNotFoundError:
 colorama.init()
 
 from autorecon.config import config, configurable_keys, configurable_boolean_keys
-from autorecon.io import slugify, e, fformat, cprint, debug, info, warn, error, fail, CommandStreamReader
+from autorecon.io import slugify, e, fformat, cprint, debug, info, warn, error, fail, set_log_sink, CommandStreamReader
 from autorecon.plugins import Pattern, PortScan, ServiceScan, Report, AutoRecon
-from autorecon.targets import Target, Service
+from autorecon.history import History
+from autorecon.httpclient import LoopWatchdog
+from autorecon.journal import Journal
+from autorecon.load import control_load
+from autorecon.metrics import metrics
+from autorecon.scheduler import Scheduler, wait_for_change
+from autorecon.targets import Target, TargetSource, Service
+from autorecon.workers import Coordinator, WorkerTargetSource
 
 VERSION = "2.0.35"
 
@@ -232,40 +239,6 @@ async def keyboard():
 					input = input[1:]
 		await asyncio.sleep(0.1)
 
-async def get_semaphore(autorecon):
-	semaphore = autorecon.service_scan_semaphore
-	while True:
-		# If service scan semaphore is locked, see if we can use port scan semaphore.
-		if semaphore.locked():
-			if semaphore != autorecon.port_scan_semaphore: # This will be true unless user sets max_scans == max_port_scans
-
-				port_scan_task_count = 0
-				for target in autorecon.scanning_targets:
-					for process_list in target.running_tasks.values():
-						if issubclass(process_list['plugin'].__class__, PortScan):
-							port_scan_task_count += 1
-
-				if not autorecon.pending_targets and (config['max_port_scans'] - port_scan_task_count) >= 1: # If no more targets, and we have room, use port scan semaphore.
-					if autorecon.port_scan_semaphore.locked():
-						await asyncio.sleep(1)
-						continue
-					semaphore = autorecon.port_scan_semaphore
-					break
-				else: # Do some math to see if we can use the port scan semaphore.
-					if (config['max_port_scans'] - (port_scan_task_count + (len(autorecon.pending_targets) * config['port_scan_plugin_count']))) >= 1:
-						if autorecon.port_scan_semaphore.locked():
-							await asyncio.sleep(1)
-							continue
-						semaphore = autorecon.port_scan_semaphore
-						break
-					else:
-						await asyncio.sleep(1)
-			else:
-				break
-		else:
-			break
-	return semaphore
-
 async def port_scan(plugin, target):
 	if config['ports']:
 		if config['ports']['tcp'] or config['ports']['udp']:
@@ -285,7 +258,14 @@ async def port_scan(plugin, target):
 					warn('Port scan {bblue}' + plugin.name + ' {green}(' + plugin.slug + '){rst} is a UDP port scan but no UDP ports were set using --ports. Skipping', verbosity=2)
 					return {'type':'port', 'plugin':plugin, 'result':[]}
 
-	async with target.autorecon.port_scan_semaphore:
+	journal = target.autorecon.journal
+	if journal is not None and journal.is_completed(target.address, 'port', plugin.slug):
+		# Services this scan found are replayed from the journal by scan_target.
+		target.scans['ports'][plugin.slug]['commands'] = list(journal.commands(target.address, plugin.slug))
+		info('Port scan {bblue}' + plugin.name + ' {green}(' + plugin.slug + '){rst} already finished against {byellow}' + target.address + '{rst} in a previous run. Skipping.', verbosity=1)
+		return {'type':'port', 'plugin':plugin, 'result':[]}
+
+	async with target.autorecon.scheduler.port_scan(target, plugin):
 		info('Port scan {bblue}' + plugin.name + ' {green}(' + plugin.slug + '){rst} running against {byellow}' + target.address + '{rst}', verbosity=1)
 
 		start_time = time.time()
@@ -305,6 +285,9 @@ async def port_scan(plugin, target):
 				warn('A process was left running after port scan {bblue}' + plugin.name + ' {green}(' + plugin.slug + '){rst} against {byellow}' + target.address + '{rst} finished. Please ensure non-blocking processes are awaited before the run coroutine finishes. Awaiting now.', verbosity=2)
 				await process_dict['process'].wait()
 
+			if journal is not None:
+				journal.write('exited', target=target.address, kind='port', tag=plugin.slug, cmd=process_dict['cmd'], returncode=process_dict['process'].returncode)
+
 			if process_dict['process'].returncode != 0:
 				errors = []
 				while True:
@@ -328,140 +311,161 @@ async def port_scan(plugin, target):
 		async with target.lock:
 			target.running_tasks.pop(plugin.slug, None)
 
+		if journal is not None:
+			for service in (result or []):
+				journal.write_service(target.address, service)
+			journal.write('completed', sync=True, target=target.address, kind='port', plugin=plugin.slug, tag=plugin.slug)
+
+		await update_reports(target, plugin.slug)
+
 		info('Port scan {bblue}' + plugin.name + ' {green}(' + plugin.slug + '){rst} against {byellow}' + target.address + '{rst} finished in ' + elapsed_time, verbosity=2)
 		return {'type':'port', 'plugin':plugin, 'result':result}
 
 async def service_scan(plugin, service):
-	semaphore = service.target.autorecon.service_scan_semaphore
+	tag = service.tag() + '/' + plugin.slug
+
+	journal = service.target.autorecon.journal
+	if journal is not None and journal.is_completed(service.target.address, 'service', tag, plugin=plugin.slug, run_once=plugin.run_once_boolean):
+		plugin_tag = plugin.slug if plugin.run_once_boolean else tag
+		service.target.scans['services'][service][plugin_tag]['commands'] = list(journal.commands(service.target.address, tag))
+		info('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} already finished against {byellow}' + service.target.address + '{rst} in a previous run. Skipping.', verbosity=1)
+		return {'type':'service', 'plugin':plugin, 'result':None}
+
+	# The scheduler waits until both a scan slot and the plugin's instance limits allow this plugin to run.
+	async with service.target.autorecon.scheduler.service_scan(service.target, plugin, tag, service_name=service.name):
+		# Create variables for fformat references.
+		address = service.target.address
+		addressv6 = service.target.address
+		ipaddress = service.target.ip
+		ipaddressv6 = service.target.ip
+		scandir = service.target.scandir
+		protocol = service.protocol
+		port = service.port
+		name = service.name
+
+		if not config['no_port_dirs']:
+			scandir = os.path.join(scandir, protocol + str(port))
+			os.makedirs(scandir, exist_ok=True)
+			os.makedirs(os.path.join(scandir, 'xml'), exist_ok=True)
+
+		# Special cases for HTTP.
+		http_scheme = 'https' if 'https' in service.name or service.secure is True else 'http'
+
+		nmap_extra = service.target.autorecon.args.nmap
+		if service.target.autorecon.args.nmap_append:
+			nmap_extra += ' ' + service.target.autorecon.args.nmap_append
+
+		if protocol == 'udp':
+			nmap_extra += ' -sU'
+
+		if service.target.ipversion == 'IPv6':
+			nmap_extra += ' -6'
+			if addressv6 == service.target.ip:
+				addressv6 = '[' + addressv6 + ']'
+			ipaddressv6 = '[' + ipaddressv6 + ']'
+
+		if config['proxychains'] and protocol == 'tcp':
+			nmap_extra += ' -sT'
+
+		info('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} running against {byellow}' + service.target.address + '{rst}', verbosity=1)
 
-	if not config['force_services']:
-		semaphore = await get_semaphore(service.target.autorecon)
-
-	plugin_pending = True
-
-	while plugin_pending:
-		global_plugin_count = 0
-		target_plugin_count = 0
-
-		if plugin.max_global_instances and plugin.max_global_instances > 0:
-			async with service.target.autorecon.lock:
-				# Count currently running plugin instances.
-				for target in service.target.autorecon.scanning_targets:
-					for task in target.running_tasks.values():
-						if plugin == task['plugin']:
-							global_plugin_count += 1
-							if global_plugin_count >= plugin.max_global_instances:
-								break
-					if global_plugin_count >= plugin.max_global_instances:
-						break
-			if global_plugin_count >= plugin.max_global_instances:
-				await asyncio.sleep(1)
-				continue
-
-		if plugin.max_target_instances and plugin.max_target_instances > 0:
-			async with service.target.lock:
-				# Count currently running plugin instances.
-				for task in service.target.running_tasks.values():
-					if plugin == task['plugin']:
-						target_plugin_count += 1
-						if target_plugin_count >= plugin.max_target_instances:
-							break
-			if target_plugin_count >= plugin.max_target_instances:
-				await asyncio.sleep(1)
-				continue
-
-		# If we get here, we can run the plugin.
-		plugin_pending = False
+		start_time = time.time()
 
-		async with semaphore:
-			# Create variables for fformat references.
-			address = service.target.address
-			addressv6 = service.target.address
-			ipaddress = service.target.ip
-			ipaddressv6 = service.target.ip
-			scandir = service.target.scandir
-			protocol = service.protocol
-			port = service.port
-			name = service.name
+		async with service.target.lock:
+			service.target.running_tasks[tag] = {'plugin': plugin, 'processes': [], 'start': start_time}
 
-			if not config['no_port_dirs']:
-				scandir = os.path.join(scandir, protocol + str(port))
-				os.makedirs(scandir, exist_ok=True)
-				os.makedirs(os.path.join(scandir, 'xml'), exist_ok=True)
+		try:
+			result = await plugin.run(service)
+		except Exception as ex:
+			exc_type, exc_value, exc_tb = sys.exc_info()
+			error_text = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb)[-2:])
+			raise Exception(cprint('Error: Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} running against {byellow}' + service.target.address + '{rst} produced an exception:\n\n' + error_text, color=Fore.RED, char='!', printmsg=False))
 
-			# Special cases for HTTP.
-			http_scheme = 'https' if 'https' in service.name or service.secure is True else 'http'
+		for process_dict in service.target.running_tasks[tag]['processes']:
+			if process_dict['process'].returncode is None:
+				warn('A process was left running after service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} against {byellow}' + service.target.address + '{rst} finished. Please ensure non-blocking processes are awaited before the run coroutine finishes. Awaiting now.', verbosity=2)
+				await process_dict['process'].wait()
 
-			nmap_extra = service.target.autorecon.args.nmap
-			if service.target.autorecon.args.nmap_append:
-				nmap_extra += ' ' + service.target.autorecon.args.nmap_append
+			if journal is not None:
+				journal.write('exited', target=service.target.address, kind='service', tag=tag, cmd=process_dict['cmd'], returncode=process_dict['process'].returncode)
 
-			if protocol == 'udp':
-				nmap_extra += ' -sU'
+			if process_dict['process'].returncode != 0 and not (process_dict['cmd'].startswith('curl') and process_dict['process'].returncode == 22):
+				errors = []
+				while True:
+					line = await process_dict['stderr'].readline()
+					if line is not None:
+						errors.append(line + '\n')
+					else:
+						break
+				error('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} ran a command against {byellow}' + service.target.address + '{rst} which returned a non-zero exit code (' + str(process_dict['process'].returncode) + '). Check ' + service.target.scandir + '/_errors.log for more details.', verbosity=2)
+				async with service.target.lock:
+					with open(os.path.join(service.target.scandir, '_errors.log'), 'a') as file:
+						file.writelines('[*] Service scan ' + plugin.name + ' (' + tag + ') ran a command which returned a non-zero exit code (' + str(process_dict['process'].returncode) + ').\n')
+						file.writelines('[-] Command: ' + process_dict['cmd'] + '\n')
+						if errors:
+							file.writelines(['[-] Error Output:\n'] + errors + ['\n'])
+						else:
+							file.writelines('\n')
 
-			if service.target.ipversion == 'IPv6':
-				nmap_extra += ' -6'
-				if addressv6 == service.target.ip:
-					addressv6 = '[' + addressv6 + ']'
-				ipaddressv6 = '[' + ipaddressv6 + ']'
+		elapsed_time = calculate_elapsed_time(start_time)
 
-			if config['proxychains'] and protocol == 'tcp':
-				nmap_extra += ' -sT'
+		async with service.target.lock:
+			service.target.running_tasks.pop(tag, None)
 
-			tag = service.tag() + '/' + plugin.slug
+		if journal is not None:
+			journal.write('completed', sync=True, target=service.target.address, kind='service', plugin=plugin.slug, tag=tag)
 
-			info('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} running against {byellow}' + service.target.address + '{rst}', verbosity=1)
+		await update_reports(service.target, plugin.slug if plugin.run_once_boolean else tag, service)
 
-			start_time = time.time()
+		info('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} against {byellow}' + service.target.address + '{rst} finished in ' + elapsed_time, verbosity=2)
+		return {'type':'service', 'plugin':plugin, 'result':result}
 
-			async with service.target.lock:
-				service.target.running_tasks[tag] = {'plugin': plugin, 'processes': [], 'start': start_time}
+# Report plugins enabled by --reports or the tags.
+def report_plugins():
+	plugins = []
+	for plugin in autorecon.plugin_types['report']:
+		if config['reports'] and plugin.slug in config['reports']:
+			matching_tags = True
+			excluded_tags = False
+		else:
+			plugin_tag_set = set(plugin.tags)
 
-			try:
-				result = await plugin.run(service)
-			except Exception as ex:
-				exc_type, exc_value, exc_tb = sys.exc_info()
-				error_text = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb)[-2:])
-				raise Exception(cprint('Error: Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} running against {byellow}' + service.target.address + '{rst} produced an exception:\n\n' + error_text, color=Fore.RED, char='!', printmsg=False))
-
-			for process_dict in service.target.running_tasks[tag]['processes']:
-				if process_dict['process'].returncode is None:
-					warn('A process was left running after service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} against {byellow}' + service.target.address + '{rst} finished. Please ensure non-blocking processes are awaited before the run coroutine finishes. Awaiting now.', verbosity=2)
-					await process_dict['process'].wait()
-
-				if process_dict['process'].returncode != 0 and not (process_dict['cmd'].startswith('curl') and process_dict['process'].returncode == 22):
-					errors = []
-					while True:
-						line = await process_dict['stderr'].readline()
-						if line is not None:
-							errors.append(line + '\n')
-						else:
-							break
-					error('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} ran a command against {byellow}' + service.target.address + '{rst} which returned a non-zero exit code (' + str(process_dict['process'].returncode) + '). Check ' + service.target.scandir + '/_errors.log for more details.', verbosity=2)
-					async with service.target.lock:
-						with open(os.path.join(service.target.scandir, '_errors.log'), 'a') as file:
-							file.writelines('[*] Service scan ' + plugin.name + ' (' + tag + ') ran a command which returned a non-zero exit code (' + str(process_dict['process'].returncode) + ').\n')
-							file.writelines('[-] Command: ' + process_dict['cmd'] + '\n')
-							if errors:
-								file.writelines(['[-] Error Output:\n'] + errors + ['\n'])
-							else:
-								file.writelines('\n')
+			matching_tags = False
+			for tag_group in autorecon.tags:
+				if set(tag_group).issubset(plugin_tag_set):
+					matching_tags = True
+					break
 
-			elapsed_time = calculate_elapsed_time(start_time)
+			excluded_tags = False
+			for tag_group in autorecon.excluded_tags:
+				if set(tag_group).issubset(plugin_tag_set):
+					excluded_tags = True
+					break
 
-			async with service.target.lock:
-				service.target.running_tasks.pop(tag, None)
+		if matching_tags and not excluded_tags:
+			plugins.append(plugin)
+	return plugins
+
+# Let report plugins that support it add a scan to their report as soon as it finishes.
+async def update_reports(target, scan, service=None):
+	for plugin in report_plugins():
+		if not autorecon.plugin_hooks[plugin.slug]['update']:
+			continue
+		try:
+			await plugin.update(target, scan, service)
+		except Exception as ex:
+			exc_type, exc_value, exc_tb = sys.exc_info()
+			error_text = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb)[-2:])
+			cprint('Error: Report plugin {bblue}' + plugin.name + ' {green}(' + plugin.slug + '){rst} could not update its report for {byellow}' + target.address + '{rst}:\n\n' + error_text, color=Fore.RED, char='!')
 
-			info('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} against {byellow}' + service.target.address + '{rst} finished in ' + elapsed_time, verbosity=2)
-			return {'type':'service', 'plugin':plugin, 'result':result}
+# Keep the metrics snapshot file up to date while scans are running.
+async def write_metrics(path, interval=10):
+	while True:
+		metrics.write_snapshot(path)
+		await asyncio.sleep(interval)
 
 async def generate_report(plugin, targets):
-	semaphore = autorecon.service_scan_semaphore
-
-	if not config['force_services']:
-		semaphore = await get_semaphore(autorecon)
-
-	async with semaphore:
+	async with autorecon.scheduler.report(plugin):
 		try:
 			result = await plugin.run(targets)
 		except Exception as ex:
@@ -562,6 +566,13 @@ async def scan_target(target):
 				target.scans['ports'][plugin.slug] = {'plugin':plugin, 'commands':[]}
 				pending.append(asyncio.create_task(port_scan(plugin, target)))
 
+		# Replay services found in a previous run (--resume), so they don't depend on their port scans running again.
+		if autorecon.journal is not None:
+			for protocol, port, name, secure in autorecon.journal.discovered_services(target.address):
+				service = Service(protocol, port, name, secure)
+				service.resumed = True
+				target.pending_services.append(service)
+
 	async with autorecon.lock:
 		autorecon.scanning_targets.append(target)
 
@@ -570,13 +581,16 @@ async def scan_target(target):
 
 	timed_out = False
 	while pending:
-		done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED, timeout=1)
+		# Sleep until a scan finishes, a port scan reports a new service, or the target timeout is reached.
+		timeout = None
+		if config['target_timeout'] is not None:
+			timeout = max(0, (config['target_timeout'] * 60) - (time.time() - start_time))
+
+		done, pending = await wait_for_change(pending, target.changed, timeout=timeout)
 
 		# Check if global timeout has occurred.
 		if config['target_timeout'] is not None:
-			elapsed_seconds = round(time.time() - start_time)
-			m, s = divmod(elapsed_seconds, 60)
-			if m >= config['target_timeout']:
+			if time.time() - start_time >= config['target_timeout'] * 60:
 				timed_out = True
 				break
 
@@ -608,7 +622,8 @@ async def scan_target(target):
 
 			info('Identified service {bmagenta}' + service.name + '{rst} on {bmagenta}' + service.protocol + '/' + str(service.port) + '{rst} on {byellow}' + target.address + '{rst}', verbosity=1)
 
-			if not config['only_scans_dir']:
+			# Notes and manual commands for resumed services were already written by the previous run.
+			if not config['only_scans_dir'] and not service.resumed:
 				with open(os.path.join(target.reportdir, 'notes.txt'), 'a') as file:
 					file.writelines('[*] ' + service.name + ' found on ' + service.protocol + '/' + str(service.port) + '.\n\n\n\n')
 
@@ -651,129 +666,98 @@ async def scan_target(target):
 			matching_plugins = []
 			heading = False
 
-			for plugin in target.autorecon.plugin_types['service']:
+			# Only plugins whose service names match are returned, so there's no need to check names again here.
+			for plugin, ignored in target.autorecon.service_plugins(protocol, port, service.name):
 				plugin_was_run = False
-				plugin_service_match = False
 				plugin_tag = service.tag() + '/' + plugin.slug
+				hooks = target.autorecon.plugin_hooks[plugin.slug]
 
-				for service_dict in plugin.services:
-					if service_dict['protocol'] == protocol and port in service_dict['port']:
-						for name in service_dict['name']:
-							if service_dict['negative_match']:
-								if name not in plugin.ignore_service_names:
-									plugin.ignore_service_names.append(name)
-							else:
-								if name not in plugin.service_names:
-									plugin.service_names.append(name)
-					else:
-						continue
-
-				for s in plugin.service_names:
-					if re.search(s, service.name):
-						plugin_service_match = True
+				if config['service_scans'] and plugin.slug in config['service_scans']:
+					matching_tags = True
+					excluded_tags = False
+				else:
+					plugin_tag_set = set(plugin.tags)
 
-					if plugin_service_match:
-						if config['service_scans'] and plugin.slug in config['service_scans']:
+					matching_tags = False
+					for tag_group in target.autorecon.tags:
+						if set(tag_group).issubset(plugin_tag_set):
 							matching_tags = True
-							excluded_tags = False
-						else:
-							plugin_tag_set = set(plugin.tags)
-
-							matching_tags = False
-							for tag_group in target.autorecon.tags:
-								if set(tag_group).issubset(plugin_tag_set):
-									matching_tags = True
-									break
-
-							excluded_tags = False
-							for tag_group in target.autorecon.excluded_tags:
-								if set(tag_group).issubset(plugin_tag_set):
-									excluded_tags = True
-									break
-
-						# TODO: Maybe make this less messy, keep manual-only plugins separate?
-						plugin_is_runnable = False
-						for member_name, _ in inspect.getmembers(plugin, predicate=inspect.ismethod):
-							if member_name == 'run':
-								plugin_is_runnable = True
-								break
+							break
 
-						if plugin_is_runnable and matching_tags and not excluded_tags:
-							# Skip plugin if run_once_boolean and plugin already in target scans
-							if plugin.run_once_boolean:
-								plugin_queued = False
-								for s in target.scans['services']:
-									if plugin.slug in target.scans['services'][s]:
-										plugin_queued = True
-										warn('{byellow}[' + plugin_tag + ' against ' + target.address + ']{srst} Plugin should only be run once and it appears to have already been queued. Skipping.{rst}', verbosity=2)
-										break
-								if plugin_queued:
-									break
-
-							# Skip plugin if require_ssl_boolean and port is not secure
-							if plugin.require_ssl_boolean and not service.secure:
-								plugin_service_match = False
-								break
+					excluded_tags = False
+					for tag_group in target.autorecon.excluded_tags:
+						if set(tag_group).issubset(plugin_tag_set):
+							excluded_tags = True
+							break
 
-							# Skip plugin if service port is in ignore_ports:
-							if port in plugin.ignore_ports[protocol]:
-								plugin_service_match = False
-								warn('{byellow}[' + plugin_tag + ' against ' + target.address + ']{srst} Plugin cannot be run against ' + protocol + ' port ' + str(port) + '. Skipping.{rst}', verbosity=2)
+				# TODO: Maybe make this less messy, keep manual-only plugins separate?
+				if hooks['run'] and matching_tags and not excluded_tags:
+					# Skip plugin if run_once_boolean and plugin already in target scans
+					if plugin.run_once_boolean:
+						plugin_queued = False
+						for s in target.scans['services']:
+							if plugin.slug in target.scans['services'][s]:
+								plugin_queued = True
+								warn('{byellow}[' + plugin_tag + ' against ' + target.address + ']{srst} Plugin should only be run once and it appears to have already been queued. Skipping.{rst}', verbosity=2)
 								break
+						if plugin_queued:
+							service_match = True
+							continue
 
-							# Skip plugin if plugin has required ports and service port is not in them:
-							if plugin.ports[protocol] and port not in plugin.ports[protocol]:
-								plugin_service_match = False
-								warn('{byellow}[' + plugin_tag + ' against ' + target.address + ']{srst} Plugin can only run on specific ports. Skipping.{rst}', verbosity=2)
-								break
+					# Skip plugin if require_ssl_boolean and port is not secure
+					if plugin.require_ssl_boolean and not service.secure:
+						continue
 
-							for i in plugin.ignore_service_names:
-								if re.search(i, service.name):
-									warn('{byellow}[' + plugin_tag + ' against ' + target.address + ']{srst} Plugin cannot be run against this service. Skipping.{rst}', verbosity=2)
-									break
+					# Skip plugin if service port is in ignore_ports:
+					if port in plugin.ignore_ports[protocol]:
+						warn('{byellow}[' + plugin_tag + ' against ' + target.address + ']{srst} Plugin cannot be run against ' + protocol + ' port ' + str(port) + '. Skipping.{rst}', verbosity=2)
+						continue
 
-							# TODO: check if plugin matches tags, BUT run manual commands anyway!
-							plugin_was_run = True
-							matching_plugins.append(plugin)
+					# Skip plugin if plugin has required ports and service port is not in them:
+					if plugin.ports[protocol] and port not in plugin.ports[protocol]:
+						warn('{byellow}[' + plugin_tag + ' against ' + target.address + ']{srst} Plugin can only run on specific ports. Skipping.{rst}', verbosity=2)
+						continue
 
-						for member_name, _ in inspect.getmembers(plugin, predicate=inspect.ismethod):
-							if member_name == 'manual':
-								try:
-									plugin.manual(service, plugin_was_run)
-								except Exception as ex:
-									exc_type, exc_value, exc_tb = sys.exc_info()
-									error_text = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb)[-2:])
-									cprint('Error: Service scan {bblue}' + plugin.name + ' {green}(' + plugin_tag + '){rst} running against {byellow}' + target.address + '{rst} produced an exception when generating manual commands:\n\n' + error_text, color=Fore.RED, char='!', printmsg=True)
-
-								if service.manual_commands:
-									plugin_run = False
-									for s in target.scans['services']:
-										if plugin.slug in target.scans['services'][s]:
-											plugin_run = True
-											break
-									if not plugin.run_once_boolean or (plugin.run_once_boolean and not plugin_run):
-										with open(os.path.join(target.scandir, '_manual_commands.txt'), 'a') as file:
-											if not heading:
-												file.write(e('[*] {service.name} on {service.protocol}/{service.port}\n\n'))
-												heading = True
-											for description, commands in service.manual_commands.items():
-												try:
-													file.write('\t[-] ' + e(description) + '\n\n')
-													for command in commands:
-														file.write('\t\t' + e(command) + '\n\n')
-												except Exception as ex:
-													exc_type, exc_value, exc_tb = sys.exc_info()
-													error_text = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb)[-2:])
-													cprint('Error: Service scan {bblue}' + plugin.name + ' {green}(' + plugin_tag + '){rst} running against {byellow}' + target.address + '{rst} produced an exception when evaluating manual commands:\n\n' + error_text, color=Fore.RED, char='!', printmsg=True)
-											file.flush()
-
-								service.manual_commands = {}
-								break
+					if ignored:
+						warn('{byellow}[' + plugin_tag + ' against ' + target.address + ']{srst} Plugin cannot be run against this service. Skipping.{rst}', verbosity=2)
 
-						break
+					# TODO: check if plugin matches tags, BUT run manual commands anyway!
+					plugin_was_run = True
+					matching_plugins.append(plugin)
 
-				if plugin_service_match:
-					service_match = True
+				service_match = True
+
+				if hooks['manual'] and not service.resumed:
+					try:
+						plugin.manual(service, plugin_was_run)
+					except Exception as ex:
+						exc_type, exc_value, exc_tb = sys.exc_info()
+						error_text = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb)[-2:])
+						cprint('Error: Service scan {bblue}' + plugin.name + ' {green}(' + plugin_tag + '){rst} running against {byellow}' + target.address + '{rst} produced an exception when generating manual commands:\n\n' + error_text, color=Fore.RED, char='!', printmsg=True)
+
+					if service.manual_commands:
+						plugin_run = False
+						for s in target.scans['services']:
+							if plugin.slug in target.scans['services'][s]:
+								plugin_run = True
+								break
+						if not plugin.run_once_boolean or (plugin.run_once_boolean and not plugin_run):
+							with open(os.path.join(target.scandir, '_manual_commands.txt'), 'a') as file:
+								if not heading:
+									file.write(e('[*] {service.name} on {service.protocol}/{service.port}\n\n'))
+									heading = True
+								for description, commands in service.manual_commands.items():
+									try:
+										file.write('\t[-] ' + e(description) + '\n\n')
+										for command in commands:
+											file.write('\t\t' + e(command) + '\n\n')
+									except Exception as ex:
+										exc_type, exc_value, exc_tb = sys.exc_info()
+										error_text = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb)[-2:])
+										cprint('Error: Service scan {bblue}' + plugin.name + ' {green}(' + plugin_tag + '){rst} running against {byellow}' + target.address + '{rst} produced an exception when evaluating manual commands:\n\n' + error_text, color=Fore.RED, char='!', printmsg=True)
+								file.flush()
+
+					service.manual_commands = {}
 
 			for plugin in matching_plugins:
 				plugin_tag = service.tag() + '/' + plugin.slug
@@ -803,30 +787,11 @@ async def scan_target(target):
 				if service.name not in config['service_exceptions'] and service.full_tag() not in target.autorecon.missing_services:
 					target.autorecon.missing_services.append(service.full_tag())
 
-	for plugin in target.autorecon.plugin_types['report']:
-		if config['reports'] and plugin.slug in config['reports']:
-			matching_tags = True
-			excluded_tags = False
-		else:
-			plugin_tag_set = set(plugin.tags)
-
-			matching_tags = False
-			for tag_group in target.autorecon.tags:
-				if set(tag_group).issubset(plugin_tag_set):
-					matching_tags = True
-					break
-
-			excluded_tags = False
-			for tag_group in target.autorecon.excluded_tags:
-				if set(tag_group).issubset(plugin_tag_set):
-					excluded_tags = True
-					break
-
-		if matching_tags and not excluded_tags:
-			pending.add(asyncio.create_task(generate_report(plugin, [target])))
+	for plugin in report_plugins():
+		pending.add(asyncio.create_task(generate_report(plugin, [target])))
 
 	while pending:
-		done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED, timeout=1)
+		done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
 
 	heartbeat.cancel()
 	elapsed_time = calculate_elapsed_time(start_time)
@@ -847,9 +812,92 @@ async def scan_target(target):
 	else:
 		info('Finished scanning target {byellow}' + target.address + '{rst} in ' + elapsed_time)
 
+	target.close_patterns_log()
+
 	async with autorecon.lock:
 		autorecon.completed_targets.append(target)
 		autorecon.scanning_targets.remove(target)
+	autorecon.pending_targets.completed(target.address)
+
+# Rebuild the scans of a target that a worker finished from the journals, so report plugins can run over it.
+def restore_target(journal, address):
+	target = Target(address, None, None, None, autorecon)
+	target.basedir = os.path.join(os.path.abspath(config['output']), address)
+	target.scandir = os.path.join(target.basedir, 'scans')
+	target.reportdir = target.scandir if config['only_scans_dir'] else os.path.join(target.basedir, 'report')
+
+	services = {}
+	for protocol, port, name, secure in journal.discovered_services(address):
+		service = Service(protocol, port, name, secure)
+		service.target = target
+		services.setdefault(service.tag(), service)
+
+	for tag in journal.scan_tags(address):
+		commands = list(journal.commands(address, tag))
+
+		# Port scans are tagged with the plugin slug, service scans with the service tag followed by the plugin slug.
+		if '/' not in tag:
+			if tag in autorecon.plugins:
+				target.scans['ports'][tag] = {'plugin':autorecon.plugins[tag], 'commands':commands}
+			continue
+
+		service_tag, slug = tag.rsplit('/', 1)
+		if slug not in autorecon.plugins:
+			continue
+		plugin = autorecon.plugins[slug]
+
+		if service_tag not in services:
+			protocol, port, name = service_tag.split('/', 2)
+			services[service_tag] = Service(protocol, port, name)
+			services[service_tag].target = target
+		service = services[service_tag]
+
+		plugin_tag = plugin.slug if plugin.run_once_boolean else tag
+		target.scans['services'].setdefault(service, {})[plugin_tag] = {'plugin':plugin, 'commands':commands}
+
+	return target
+
+# Run as the coordinator for --workers, handing the targets out to worker processes.
+async def coordinate(args):
+	output = os.path.abspath(config['output'])
+	if not args.resume:
+		# Journals from the workers of a previous run would otherwise be resumed from later.
+		for filename in os.listdir(output):
+			if filename.startswith('_journal-worker') and filename.endswith('.jsonl'):
+				os.remove(os.path.join(output, filename))
+
+	journal = Journal(os.path.join(output, '_journal.jsonl'), resume=args.resume)
+	if args.resume:
+		info('Resuming from ' + journal.path)
+
+	start_time = time.time()
+	coordinator = Coordinator(autorecon.pending_targets, journal, args.workers, sys.argv[1:])
+	try:
+		failed = await coordinator.run()
+	finally:
+		journal.close()
+
+	# Workers only see some of the targets, so the combined report is written here, from what their journals recorded.
+	journals = [os.path.join(output, filename) for filename in sorted(os.listdir(output)) if filename.startswith('_journal-worker') and filename.endswith('.jsonl')]
+	if not args.resume:
+		journals.insert(0, journal.path)
+	for path in journals:
+		journal.load(path)
+
+	targets = [restore_target(journal, address) for address in journal.finished_targets()]
+	if len(targets) > 1:
+		pending = set()
+		for plugin in report_plugins():
+			pending.add(asyncio.create_task(generate_report(plugin, targets)))
+
+		while pending:
+			done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+	elapsed_time = calculate_elapsed_time(start_time)
+	if failed:
+		warn('{byellow}The following targets were not scanned: ' + ', '.join(failed) + '{rst}')
+	info('{bright}Finished scanning ' + str(coordinator.finished) + ' target(s) with ' + str(args.workers) + ' workers in ' + elapsed_time + '!{rst}')
+	info('{bright}Don\'t forget to check out more commands to run manually in the _manual_commands.txt file in each target\'s scans directory!')
 
 async def run():
 	# Find config file.
@@ -890,6 +938,10 @@ async def run():
 	parser.add_argument('--single-target', action='store_true', help='Only scan a single target. A directory named after the target will not be created. Instead, the directory structure will be created within the output directory. Default: %(default)s')
 	parser.add_argument('--only-scans-dir', action='store_true', help='Only create the "scans" directory for results. Other directories (e.g. exploit, loot, report) will not be created. Default: %(default)s')
 	parser.add_argument('--no-port-dirs', action='store_true', help='Don\'t create directories for ports (e.g. scans/tcp80, scans/udp53). Instead store all results in the "scans" directory itself. Default: %(default)s')
+	parser.add_argument('--workers', action='store', type=int, default=1, help='Split the targets between this many worker processes, each running its own scans, so that output processing and reporting for large scopes can use more than one CPU core. -m/--max-scans and -mp/--max-port-scans apply to each worker. Default: %(default)s')
+	parser.add_argument('--worker', action='store', help=argparse.SUPPRESS)
+	parser.add_argument('--worker-id', action='store', type=int, default=0, help=argparse.SUPPRESS)
+	parser.add_argument('--resume', action='store_true', help='Resume an interrupted run using the journal in the output directory. Scans that already finished are skipped, and services that were already found are scanned without repeating the port scans that found them. Default: %(default)s')
 	parser.add_argument('--heartbeat', action='store', type=int, help='Specifies the heartbeat interval (in seconds) for scan status messages. Default: %(default)s')
 	parser.add_argument('--timeout', action='store', type=int, help='Specifies the maximum amount of time in minutes that AutoRecon should run for. Default: %(default)s')
 	parser.add_argument('--target-timeout', action='store', type=int, help='Specifies the maximum amount of time in minutes that a target should be scanned for before abandoning it and moving on. Default: %(default)s')
@@ -903,6 +955,10 @@ async def run():
 	parser.add_argument('-mpti', '--max-plugin-target-instances', action='store', nargs='+', metavar='PLUGIN:NUMBER', help='A space separated list of plugin slugs with the max number of instances (per target) in the following style: nmap-http:2 dirbuster:1. Default: %(default)s')
 	parser.add_argument('-mpgi', '--max-plugin-global-instances', action='store', nargs='+', metavar='PLUGIN:NUMBER', help='A space separated list of plugin slugs with the max number of global instances in the following style: nmap-http:2 dirbuster:1. Default: %(default)s')
 	parser.add_argument('--accessible', action='store_true', help='Attempts to make AutoRecon output more accessible to screenreaders. Default: %(default)s')
+	parser.add_argument('--adaptive-concurrency', action='store_true', help='Lower the number of concurrent scans while the host is overloaded (load average, free memory, iowait), and raise it back up to --max-scans / --max-port-scans when it recovers. Linux only. Default: %(default)s')
+	parser.add_argument('--metrics-port', action='store', type=int, metavar='PORT', help='Serve scheduler and output metrics for Prometheus on http://127.0.0.1:PORT/metrics (and as JSON on /metrics.json). A snapshot is always written to _metrics.json in the output directory. Default: %(default)s')
+	parser.add_argument('--log-json', action='store', metavar='FILE', help='Also write every message that is printed to FILE as JSON lines (time, level and message without colors). Default: %(default)s')
+	parser.add_argument('--debug-blocking', action='store', type=float, nargs='?', const=0.5, metavar='SECONDS', help='Warn whenever a plugin blocks the event loop (and so every other scan) for longer than this many seconds. Default threshold: %(const)s')
 	parser.add_argument('-v', '--verbose', action='count', help='Enable verbose output. Repeat for more verbosity.')
 	parser.add_argument('--version', action='store_true', help='Prints the AutoRecon version and exits.')
 	parser.error = lambda s: fail(s[0].upper() + s[1:])
@@ -1154,6 +1210,12 @@ async def run():
 			config[key] = args_dict[key]
 	autorecon.args = args
 
+	if args.log_json:
+		try:
+			set_log_sink(args.log_json)
+		except OSError as ex:
+			fail('Could not open ' + args.log_json + ' for logging: ' + str(ex))
+
 	if args.list:
 		type = args.list.lower()
 		if type in ['plugin', 'plugins', 'port', 'ports', 'portscan', 'portscans']:
@@ -1320,16 +1382,13 @@ async def run():
 		error('Argument --timeout cannot be less than --target-timeout.')
 		errors = True
 
+	if args.workers <= 0:
+		error('Argument --workers must be at least 1.')
+		errors = True
+
 	if not errors:
-		if config['force_services']:
-			autorecon.service_scan_semaphore = asyncio.Semaphore(config['max_scans'])
-		else:
-			autorecon.port_scan_semaphore = asyncio.Semaphore(config['max_port_scans'])
-			# If max scans and max port scans is the same, the service scan semaphore and port scan semaphore should be the same object
-			if config['max_scans'] == config['max_port_scans']:
-				autorecon.service_scan_semaphore = autorecon.port_scan_semaphore
-			else:
-				autorecon.service_scan_semaphore = asyncio.Semaphore(config['max_scans'] - config['max_port_scans'])
+		history = History(os.path.join(config['data_dir'], 'history.json'))
+		autorecon.scheduler = Scheduler(autorecon, config['max_scans'], config['max_port_scans'], force_services=bool(config['force_services']), history=history)
 
 	tags = []
 	for tag_group in list(set(filter(None, args.tags.lower().split(',')))):
@@ -1357,49 +1416,41 @@ async def run():
 	if config['reports']:
 		config['reports'] = [x.strip().lower() for x in config['reports'].split(',')]
 
-	raw_targets = args.targets
+	autorecon.pending_targets = TargetSource(autorecon)
 
-	if len(args.target_file) > 0:
-		if not os.path.isfile(args.target_file):
-			error('The target file "' + args.target_file + '" was not found.')
-			sys.exit(1)
-		try:
-			with open(args.target_file, 'r') as f:
-				lines = f.read()
-				for line in lines.splitlines():
-					line = line.strip()
-					if line.startswith('#'): continue
-					match = re.match('([^#]+)#', line)
-					if match:
-						line = match.group(1).strip()
-					if len(line) == 0: continue
-					if line not in raw_targets:
-						raw_targets.append(line)
-		except OSError:
-			error('The target file ' + args.target_file + ' could not be read.')
-			sys.exit(1)
+	# Read targets from the command line, then the target file (if any), skipping duplicate entries.
+	def read_raw_targets():
+		yield from args.targets
 
+		if len(args.target_file) > 0:
+			if not os.path.isfile(args.target_file):
+				error('The target file "' + args.target_file + '" was not found.')
+				sys.exit(1)
+			try:
+				with open(args.target_file, 'r') as f:
+					for line in f:
+						line = line.strip()
+						if line.startswith('#'): continue
+						match = re.match('([^#]+)#', line)
+						if match:
+							line = match.group(1).strip()
+						if len(line) == 0: continue
+						yield line
+			except OSError:
+				error('The target file ' + args.target_file + ' could not be read.')
+				sys.exit(1)
+
+	raw_targets = set()
 	unresolvable_targets = False
-	for target in raw_targets:
+	# Workers get their targets from the coordinator instead.
+	for target in (read_raw_targets() if not args.worker else []):
+		if target in raw_targets:
+			continue
+		raw_targets.add(target)
+
 		try:
 			ip = ipaddress.ip_address(target)
-			ip_str = str(ip)
-
-			found = False
-			for t in autorecon.pending_targets:
-				if t.address == ip_str:
-					found = True
-					break
-
-			if found:
-				continue
-
-			if isinstance(ip, ipaddress.IPv4Address):
-				autorecon.pending_targets.append(Target(ip_str, ip_str, 'IPv4', 'ip', autorecon))
-			elif isinstance(ip, ipaddress.IPv6Address):
-				autorecon.pending_targets.append(Target(ip_str, ip_str, 'IPv6', 'ip', autorecon))
-			else:
-				fail('This should never happen unless IPv8 is invented.')
+			autorecon.pending_targets.add_ip(ip)
 		except ValueError:
 
 			try:
@@ -1408,56 +1459,20 @@ async def run():
 					fail(target + ' contains ' + str(target_range.num_addresses) + ' addresses. Check that your CIDR notation is correct. If it is, re-run with the --disable-sanity-checks option to suppress this check.')
 					errors = True
 				else:
-					for ip in target_range.hosts():
-						ip_str = str(ip)
-
-						found = False
-						for t in autorecon.pending_targets:
-							if t.address == ip_str:
-								found = True
-								break
-
-						if found:
-							continue
-
-						if isinstance(ip, ipaddress.IPv4Address):
-							autorecon.pending_targets.append(Target(ip_str, ip_str, 'IPv4', 'ip', autorecon))
-						elif isinstance(ip, ipaddress.IPv6Address):
-							autorecon.pending_targets.append(Target(ip_str, ip_str, 'IPv6', 'ip', autorecon))
-						else:
-							fail('This should never happen unless IPv8 is invented.')
+					# Hosts in the range are only generated as targets are dequeued.
+					autorecon.pending_targets.add_network(target_range)
 
 			except ValueError:
 
 				try:
 					addresses = socket.getaddrinfo(target, None, socket.AF_INET)
 					ip = addresses[0][4][0]
-
-					found = False
-					for t in autorecon.pending_targets:
-						if t.address == target:
-							found = True
-							break
-
-					if found:
-						continue
-
-					autorecon.pending_targets.append(Target(target, ip, 'IPv4', 'hostname', autorecon))
+					autorecon.pending_targets.add_hostname(target, ip, 'IPv4')
 				except socket.gaierror:
 					try:
 						addresses = socket.getaddrinfo(target, None, socket.AF_INET6)
 						ip = addresses[0][4][0]
-
-						found = False
-						for t in autorecon.pending_targets:
-							if t.address == target:
-								found = True
-								break
-
-						if found:
-							continue
-
-						autorecon.pending_targets.append(Target(target, ip, 'IPv6', 'hostname', autorecon))
+						autorecon.pending_targets.add_hostname(target, ip, 'IPv6')
 					except socket.gaierror:
 						unresolvable_targets = True
 						error(target + ' does not appear to be a valid IP address, IP range, or resolvable hostname.')
@@ -1466,16 +1481,19 @@ async def run():
 		error('AutoRecon will not run if any targets are invalid / unresolvable. To override this, re-run with the --disable-sanity-checks option.')
 		errors = True
 
-	if len(autorecon.pending_targets) == 0:
+	# Only count as far as the checks below need, so huge ranges don't have to be expanded up front.
+	target_count = autorecon.pending_targets.count(limit=257) if not args.worker else 1
+
+	if target_count == 0:
 		error('You must specify at least one target to scan!')
 		errors = True
 
-	if config['single_target'] and len(autorecon.pending_targets) != 1:
+	if config['single_target'] and target_count != 1:
 		error('You cannot provide more than one target when scanning in single-target mode.')
 		errors = True
 
-	if not args.disable_sanity_checks and len(autorecon.pending_targets) > 256:
-		error('A total of ' + str(len(autorecon.pending_targets)) + ' targets would be scanned. If this is correct, re-run with the --disable-sanity-checks option to suppress this check.')
+	if not args.disable_sanity_checks and target_count > 256:
+		error('A total of ' + str(autorecon.pending_targets.count()) + ' targets would be scanned. If this is correct, re-run with the --disable-sanity-checks option to suppress this check.')
 		errors = True
 
 	if not config['force_services']:
@@ -1513,6 +1531,53 @@ async def run():
 
 	num_initial_targets = max(1, math.ceil(config['max_port_scans'] / port_scan_plugin_count))
 
+	os.makedirs(os.path.abspath(config['output']), exist_ok=True)
+
+	if args.workers > 1 and not args.worker:
+		await coordinate(args)
+		return
+
+	if args.worker:
+		# Every worker keeps its own journal, and resumes from all of them (plus any from a run without workers).
+		output = os.path.abspath(config['output'])
+		journals = [os.path.join(output, filename) for filename in sorted(os.listdir(output)) if filename.startswith('_journal') and filename.endswith('.jsonl')]
+		autorecon.journal = Journal(os.path.join(output, '_journal-worker' + str(args.worker_id) + '.jsonl'), resume=args.resume, load_paths=journals)
+
+		autorecon.pending_targets = WorkerTargetSource(autorecon, args.worker, args.worker_id)
+		try:
+			await autorecon.pending_targets.connect()
+		except OSError as ex:
+			error('Worker ' + str(args.worker_id) + ' could not connect to the coordinator at ' + args.worker + ': ' + str(ex))
+			sys.exit(1)
+		await autorecon.pending_targets.request(num_initial_targets)
+	else:
+		autorecon.journal = Journal(os.path.join(os.path.abspath(config['output']), '_journal.jsonl'), resume=args.resume)
+		if args.resume:
+			info('Resuming from ' + autorecon.journal.path)
+
+	metrics_file = os.path.join(os.path.abspath(config['output']), '_metrics.json' if not args.worker else '_metrics-worker' + str(args.worker_id) + '.json')
+	metrics_task = asyncio.create_task(write_metrics(metrics_file))
+
+	load_task = None
+	if args.adaptive_concurrency:
+		if os.path.isfile('/proc/loadavg'):
+			load_task = asyncio.create_task(control_load(autorecon.scheduler))
+		else:
+			warn('Adaptive concurrency needs /proc, which is not available on this system. Using fixed limits.')
+
+	metrics_server = None
+	if args.metrics_port is not None and not args.worker:
+		try:
+			metrics_server = await metrics.serve('127.0.0.1', args.metrics_port)
+			info('Serving metrics on {bblue}http://127.0.0.1:' + str(args.metrics_port) + '/metrics{rst}')
+		except OSError as ex:
+			warn('Could not serve metrics on port ' + str(args.metrics_port) + ': ' + str(ex))
+
+	watchdog = None
+	if args.debug_blocking is not None:
+		watchdog = LoopWatchdog(threshold=args.debug_blocking)
+		watchdog.start()
+
 	start_time = time.time()
 
 	if not config['disable_keyboard_control']:
@@ -1521,7 +1586,7 @@ async def run():
 	pending = []
 	i = 0
 	while autorecon.pending_targets:
-		pending.append(asyncio.create_task(scan_target(autorecon.pending_targets.pop(0))))
+		pending.append(asyncio.create_task(scan_target(autorecon.pending_targets.pop())))
 		i+=1
 		if i >= num_initial_targets:
 			break
@@ -1532,7 +1597,12 @@ async def run():
 
 	timed_out = False
 	while pending:
-		done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED, timeout=1)
+		# Sleep until a target finishes, a scan slot is taken or released, or the global timeout is reached.
+		timeout = None
+		if config['timeout'] is not None:
+			timeout = max(0, (config['timeout'] * 60) - (time.time() - start_time))
+
+		done, pending = await wait_for_change(pending, autorecon.scheduler.changed, timeout=timeout)
 
 		# If something failed in scan_target, autorecon.errors will be true.
 		if autorecon.errors:
@@ -1541,67 +1611,55 @@ async def run():
 
 		# Check if global timeout has occurred.
 		if config['timeout'] is not None:
-			elapsed_seconds = round(time.time() - start_time)
-			m, s = divmod(elapsed_seconds, 60)
-			if m >= config['timeout']:
+			if time.time() - start_time >= config['timeout'] * 60:
 				timed_out = True
 				break
 
+		# Workers fetch as many targets as the loop below could start.
+		if args.worker:
+			await autorecon.pending_targets.request(len(done) + max(0, autorecon.scheduler.new_target_count(port_scan_plugin_count)) - len(autorecon.pending_targets))
+
+		targets_started = False
 		for task in done:
 			if autorecon.pending_targets:
-				pending.add(asyncio.create_task(scan_target(autorecon.pending_targets.pop(0))))
+				pending.add(asyncio.create_task(scan_target(autorecon.pending_targets.pop())))
+				targets_started = True
 			if task in pending:
 				pending.remove(task)
 
-		port_scan_task_count = 0
-		for targ in autorecon.scanning_targets:
-			for process_list in targ.running_tasks.values():
-				# If we're not scanning ports, count ServiceScans instead.
-				if config['force_services']:
-					if issubclass(process_list['plugin'].__class__, ServiceScan): # TODO should we really count ServiceScans? Test...
-						port_scan_task_count += 1
-				else:
-					if issubclass(process_list['plugin'].__class__, PortScan):
-						port_scan_task_count += 1
-
-		num_new_targets = math.ceil((config['max_port_scans'] - port_scan_task_count) / port_scan_plugin_count)
+		num_new_targets = autorecon.scheduler.new_target_count(port_scan_plugin_count)
 		if num_new_targets > 0:
 			i = 0
 			while autorecon.pending_targets:
-				pending.add(asyncio.create_task(scan_target(autorecon.pending_targets.pop(0))))
+				pending.add(asyncio.create_task(scan_target(autorecon.pending_targets.pop())))
+				targets_started = True
 				i+=1
 				if i >= num_new_targets:
 					break
 
+		# Fewer pending targets may let queued service scans borrow port scan slots.
+		if targets_started:
+			autorecon.scheduler.notify()
+
 	if not config['disable_keyboard_control']:
 		keyboard_monitor.cancel()
 
-	# If there's only one target we don't need a combined report
-	if len(autorecon.completed_targets) > 1:
-		for plugin in autorecon.plugin_types['report']:
-			if config['reports'] and plugin.slug in config['reports']:
-				matching_tags = True
-				excluded_tags = False
-			else:
-				plugin_tag_set = set(plugin.tags)
-
-				matching_tags = False
-				for tag_group in autorecon.tags:
-					if set(tag_group).issubset(plugin_tag_set):
-						matching_tags = True
-						break
+	# If there's only one target we don't need a combined report. Workers only see some of the targets, so they don't write one either.
+	if len(autorecon.completed_targets) > 1 and not args.worker:
+		for plugin in report_plugins():
+			pending.add(asyncio.create_task(generate_report(plugin, autorecon.completed_targets)))
 
-				excluded_tags = False
-				for tag_group in autorecon.excluded_tags:
-					if set(tag_group).issubset(plugin_tag_set):
-						excluded_tags = True
-						break
+		while pending:
+			done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
 
-			if matching_tags and not excluded_tags:
-				pending.add(asyncio.create_task(generate_report(plugin, autorecon.completed_targets)))
+	if watchdog is not None:
+		watchdog.stop()
 
-		while pending:
-			done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED, timeout=1)
+	metrics_task.cancel()
+	if load_task is not None:
+		load_task.cancel()
+	if metrics_server is not None:
+		metrics_server.close()
 
 	if timed_out:
 		cancel_all_tasks(None, None)
@@ -1609,12 +1667,18 @@ async def run():
 		elapsed_time = calculate_elapsed_time(start_time)
 		warn('{byellow}AutoRecon took longer than the specified timeout period (' + str(config['timeout']) + ' min). Cancelling all scans and exiting.{rst}')
 	else:
-		while len(asyncio.all_tasks()) > 1: # this code runs in the main() task so it will be the only task left running
-			await asyncio.sleep(1)
+		# Wait for any remaining tasks (e.g. stream readers) to finish. This code runs in the main() task, so exclude it.
+		remaining = asyncio.all_tasks() - {asyncio.current_task()}
+		while remaining:
+			await asyncio.wait(remaining)
+			remaining = asyncio.all_tasks() - {asyncio.current_task()}
 
 		elapsed_time = calculate_elapsed_time(start_time)
-		info('{bright}Finished scanning all targets in ' + elapsed_time + '!{rst}')
-		info('{bright}Don\'t forget to check out more commands to run manually in the _manual_commands.txt file in each target\'s scans directory!')
+		if args.worker:
+			info('{bright}Worker ' + str(args.worker_id) + ' finished scanning its targets in ' + elapsed_time + '.{rst}')
+		else:
+			info('{bright}Finished scanning all targets in ' + elapsed_time + '!{rst}')
+			info('{bright}Don\'t forget to check out more commands to run manually in the _manual_commands.txt file in each target\'s scans directory!')
 
 	if autorecon.missing_services:
 		warn('{byellow}AutoRecon identified the following services, but could not match them to any plugins based on the service name. Please report these to Tib3rius: ' + ', '.join(autorecon.missing_services) + '{rst}')
@@ -1624,6 +1688,14 @@ async def run():
 		if terminal_settings is not None:
 			termios.tcsetattr(sys.stdin, termios.TCSADRAIN, terminal_settings)
 
+	if args.worker:
+		await autorecon.pending_targets.close()
+
+	autorecon.journal.close()
+	autorecon.scheduler.history.save()
+	autorecon.http.close()
+	metrics.write_snapshot(metrics_file)
+
 def main():
 	# Capture Ctrl+C and cancel everything.
 	signal.signal(signal.SIGINT, cancel_all_tasks)
@@ -0,0 +1,145 @@
+import asyncio, bisect, json, math, os, time
+
+# Upper bounds (in seconds) of the histogram buckets used for scan durations and slot waits.
+duration_buckets = [0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600, 7200]
+
+class Histogram:
+
+	def __init__(self, buckets):
+		self.buckets = buckets
+		self.counts = [0] * (len(buckets) + 1)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		self.counts[bisect.bisect_left(self.buckets, value)] += 1
+		self.sum += value
+		self.count += 1
+
+# Counters, gauges and histograms describing a run, for tuning --max-scans and --max-port-scans.
+# Metrics are identified by a name plus a tuple of (label, value) pairs.
+class Metrics:
+
+	def __init__(self):
+		self.start = time.time()
+		self.counters = {}
+		self.gauges = {}
+		self.histograms = {}
+		self.help = {}
+
+	def describe(self, name, help):
+		self.help[name] = help
+
+	def inc(self, name, value=1, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		self.counters[key] = self.counters.get(key, 0) + value
+
+	def set(self, name, value, **labels):
+		self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+	def observe(self, name, value, buckets=duration_buckets, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		histogram = self.histograms.get(key)
+		if histogram is None:
+			histogram = self.histograms[key] = Histogram(buckets)
+		histogram.observe(value)
+
+	def labels_text(self, labels, extra=None):
+		labels = list(labels) + ([extra] if extra else [])
+		if not labels:
+			return ''
+		return '{' + ','.join(label + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"' for label, value in labels) + '}'
+
+	# The Prometheus text exposition format.
+	def prometheus(self):
+		lines = []
+		for kind, values in [('counter', self.counters), ('gauge', self.gauges)]:
+			described = set()
+			for (name, labels), value in sorted(values.items()):
+				if name not in described:
+					described.add(name)
+					if name in self.help:
+						lines.append('# HELP ' + name + ' ' + self.help[name])
+					lines.append('# TYPE ' + name + ' ' + kind)
+				lines.append(name + self.labels_text(labels) + ' ' + str(value))
+
+		described = set()
+		for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+			if name not in described:
+				described.add(name)
+				if name in self.help:
+					lines.append('# HELP ' + name + ' ' + self.help[name])
+				lines.append('# TYPE ' + name + ' histogram')
+			cumulative = 0
+			for bound, count in zip(histogram.buckets + [math.inf], histogram.counts):
+				cumulative += count
+				lines.append(name + '_bucket' + self.labels_text(labels, ('le', '+Inf' if bound == math.inf else bound)) + ' ' + str(cumulative))
+			lines.append(name + '_sum' + self.labels_text(labels) + ' ' + str(round(histogram.sum, 6)))
+			lines.append(name + '_count' + self.labels_text(labels) + ' ' + str(histogram.count))
+
+		return '\n'.join(lines) + '\n'
+
+	def snapshot(self):
+		def entries(values, convert):
+			return [{'name': name, 'labels': dict(labels), 'value': convert(value)} for (name, labels), value in sorted(values.items(), key=lambda item: item[0])]
+
+		return {
+			'time': round(time.time(), 3),
+			'uptime': round(time.time() - self.start, 3),
+			'counters': entries(self.counters, lambda value: value),
+			'gauges': entries(self.gauges, lambda value: value),
+			'histograms': entries(self.histograms, lambda histogram: {'buckets': histogram.buckets, 'counts': histogram.counts, 'sum': round(histogram.sum, 6), 'count': histogram.count})
+		}
+
+	def write_snapshot(self, path):
+		# Write to a temporary file first, so readers never see a partial snapshot.
+		tmp_path = path + '.tmp'
+		try:
+			with open(tmp_path, 'w') as file:
+				json.dump(self.snapshot(), file, indent='\t')
+			os.replace(tmp_path, path)
+		except OSError:
+			pass
+
+	# A minimal HTTP server for Prometheus to scrape. /metrics.json returns the JSON snapshot instead.
+	async def serve(self, host, port):
+		return await asyncio.start_server(self.handle_request, host, port)
+
+	async def handle_request(self, reader, writer):
+		try:
+			request = await asyncio.wait_for(reader.readline(), timeout=5)
+			# Skip the headers.
+			while True:
+				line = await asyncio.wait_for(reader.readline(), timeout=5)
+				if line in (b'\r\n', b'\n', b''):
+					break
+
+			parts = request.decode('latin-1').split(' ')
+			path = parts[1] if len(parts) > 1 else '/'
+
+			if path.startswith('/metrics.json'):
+				status, content_type, body = '200 OK', 'application/json', json.dumps(self.snapshot())
+			elif path == '/' or path.startswith('/metrics'):
+				status, content_type, body = '200 OK', 'text/plain; version=0.0.4', self.prometheus()
+			else:
+				status, content_type, body = '404 Not Found', 'text/plain', 'Not Found\n'
+
+			body = body.encode('utf8')
+			writer.write(('HTTP/1.1 ' + status + '\r\nContent-Type: ' + content_type + '\r\nContent-Length: ' + str(len(body)) + '\r\nConnection: close\r\n\r\n').encode('latin-1') + body)
+			await writer.drain()
+		except (asyncio.TimeoutError, ConnectionError):
+			pass
+		finally:
+			writer.close()
+
+metrics = Metrics()
+metrics.describe('autorecon_output_lines_total', 'Lines of output read from commands.')
+metrics.describe('autorecon_output_bytes_total', 'Bytes of output read from commands.')
+metrics.describe('autorecon_pattern_matches_total', 'Pattern matches found in command output.')
+metrics.describe('autorecon_scans_total', 'Scans that have finished, by kind and plugin.')
+metrics.describe('autorecon_scan_duration_seconds', 'How long scans ran for once they had a slot, by kind and plugin.')
+metrics.describe('autorecon_slot_wait_seconds', 'How long scans waited for a slot, by kind.')
+metrics.describe('autorecon_queue_depth', 'Scans waiting for a slot.')
+metrics.describe('autorecon_running_scans', 'Scans currently running, by kind.')
+metrics.describe('autorecon_slots_in_use', 'Slots in use, by pool.')
+metrics.describe('autorecon_slot_limit', 'Size of each pool of slots.')
@@ -0,0 +1,149 @@
+import asyncio, math, os
+from xml.etree import ElementTree
+from autorecon.targets import Service
+
+# Turn an nmap XML <port> element into a Service, the same way AutoRecon.extract_service() reads a line of
+# nmap's normal output (e.g. "443/tcp open ssl/http"). Ports that aren't "open" are ignored.
+def service_from_port(port):
+	state = port.find('state')
+	if state is None or state.get('state') != 'open':
+		return None
+
+	protocol = port.get('protocol').lower()
+	port_number = int(port.get('portid'))
+
+	service_element = port.find('service')
+	if service_element is None:
+		name = 'unknown'
+		tunnel = None
+	else:
+		name = service_element.get('name', 'unknown')
+		tunnel = service_element.get('tunnel')
+
+	# Normal output shows tunnelled services as e.g. ssl/http.
+	if tunnel:
+		name = tunnel + '/' + name
+
+	secure = True if 'ssl' in name or 'tls' in name else False
+
+	if name.startswith('ssl/') or name.startswith('tls/'):
+		name = name[4:]
+
+	service = Service(protocol, port_number, name, secure)
+
+	# Keep the extra details nmap found, which the normal output regex can't reliably get at.
+	if service_element is not None:
+		service.product = service_element.get('product')
+		service.version = service_element.get('version')
+		service.extrainfo = service_element.get('extrainfo')
+	return service
+
+# Incrementally parses nmap XML as it is written, returning a Service as soon as each <port> element is closed.
+class NmapXMLServiceExtractor:
+
+	def __init__(self):
+		self.parser = ElementTree.XMLPullParser(events=('end',))
+
+	def feed(self, data):
+		self.parser.feed(data)
+		return self.read_events()
+
+	def close(self):
+		try:
+			self.parser.close()
+		except ElementTree.ParseError: # nmap was interrupted before finishing the file.
+			pass
+		return self.read_events()
+
+	def read_events(self):
+		services = []
+		try:
+			for _, element in self.parser.read_events():
+				if element.tag == 'port':
+					service = service_from_port(element)
+					if service:
+						services.append(service)
+				elif element.tag == 'host':
+					# Nothing else needs a host once its ports have been read.
+					element.clear()
+		except ElementTree.ParseError:
+			pass
+		return services
+
+# Follow an nmap XML output file while the process runs, yielding each open port's Service as it appears.
+async def tail_services(path, process, interval=0.5):
+	extractor = NmapXMLServiceExtractor()
+	position = 0
+	exited = asyncio.ensure_future(process.wait())
+
+	while True:
+		finished = process.returncode is not None
+
+		if os.path.isfile(path):
+			with open(path, 'rb') as file:
+				file.seek(position)
+				data = file.read()
+			position += len(data)
+			if data:
+				for service in extractor.feed(data):
+					yield service
+
+		if finished:
+			break
+
+		# Wake up as soon as the process exits, or check the file again after interval seconds.
+		await asyncio.wait({exited}, timeout=interval)
+
+	for service in extractor.close():
+		yield service
+
+# Hands out slices of a port range to shards of a port scan. Slices start large and shrink as the range runs out
+# (so the last few finish close together), and shrink further if recent slices have been slower than average.
+class PortShards:
+
+	def __init__(self, first=1, last=65535, shards=4, min_size=None):
+		self.first = first
+		self.last = last
+		self.shards = shards
+
+		# Every nmap process has a fixed cost (host discovery, OS detection, scripts), so by default don't go
+		# below about four slices per shard.
+		if min_size is None:
+			min_size = max(256, math.ceil((last - first + 1) / (shards * 4)))
+		self.min_size = min_size
+		self.position = first
+		self.ports_done = 0
+		self.time_spent = 0.0
+		self.recent_rate = None
+
+	def next(self):
+		if self.position > self.last:
+			return None
+
+		remaining = self.last - self.position + 1
+		size = math.ceil(remaining / (self.shards * 2))
+
+		if self.recent_rate is not None and self.time_spent > 0:
+			average_rate = self.ports_done / self.time_spent
+			size = int(size * min(2.0, max(0.25, self.recent_rate / average_rate)))
+
+		size = max(size, self.min_size)
+
+		start = self.position
+		end = min(self.last, start + size - 1)
+		self.position = end + 1
+		return start, end
+
+	# Record how long a slice took, in seconds.
+	def record(self, start, end, duration):
+		duration = max(duration, 0.001)
+		ports = end - start + 1
+		rate = ports / duration
+
+		self.ports_done += ports
+		self.time_spent += duration
+
+		if self.recent_rate is None:
+			self.recent_rate = rate
+		else:
+			self.recent_rate += 0.5 * (rate - self.recent_rate)
@@ -1,7 +1,9 @@
-import asyncio, inspect, os, re, sys
+import asyncio, inspect, os, re, sys, time
 from typing import final
 from autorecon.config import config
-from autorecon.io import slugify, info, warn, error, fail, CommandStreamReader
+from autorecon.io import slugify, info, warn, error, fail, CommandStreamReader, PatternMatcher
+from autorecon.httpclient import HTTPClient
+from autorecon.nmap import PortShards, tail_services
 from autorecon.targets import Service
 
 class Pattern:
@@ -18,6 +20,8 @@ class Plugin(object):
 		self.description = None
 		self.tags = ['default']
 		self.priority = 1
+		# How much of the host a scan uses compared to a typical plugin. Used to share out slots.
+		self.cost = 1
 		self.patterns = []
 		self.autorecon = None
 		self.disabled = False
@@ -120,6 +124,80 @@ class PortScan(Plugin):
 	async def run(self, target):
 		raise NotImplementedError
 
+	# Split a port range into slices and scan them with separate nmap processes, yielding services as each slice
+	# finishes. The plugin's own slot scans slices straight away, and up to shards - 1 extra port scan slots join
+	# in as they become free. cmd and xml_file should contain {ports}, which is replaced with each slice (e.g. 1-4096).
+	@final
+	async def scan_shards(self, target, cmd, xml_file, shards, first=1, last=65535):
+		port_shards = PortShards(first, last, shards)
+		results = asyncio.Queue()
+		started = set()
+
+		workers = [asyncio.create_task(self.scan_shard_worker(target, cmd, xml_file, port_shards, results))]
+		helpers = []
+		for i in range(shards - 1):
+			helper = asyncio.create_task(self.scan_shard_helper(target, cmd, xml_file, port_shards, results, started))
+			helpers.append(helper)
+			workers.append(helper)
+
+		try:
+			remaining = len(workers)
+			while remaining:
+				services = await results.get()
+				if services is None:
+					remaining -= 1
+
+					# Once every slice has been handed out, helpers still waiting for a slot aren't needed.
+					if port_shards.position > port_shards.last:
+						for helper in helpers:
+							if helper not in started and not helper.done():
+								helper.cancel()
+					continue
+
+				for service in services:
+					yield service
+		finally:
+			for worker in workers:
+				if not worker.done():
+					worker.cancel()
+
+		for worker in workers:
+			if not worker.cancelled() and worker.exception():
+				raise worker.exception()
+
+	async def scan_shard_helper(self, target, cmd, xml_file, port_shards, results, started):
+		try:
+			async with target.autorecon.scheduler.port_scan_shard(target, self):
+				started.add(asyncio.current_task())
+				await self.scan_shard_worker(target, cmd, xml_file, port_shards, results, signal=False)
+		finally:
+			results.put_nowait(None)
+
+	async def scan_shard_worker(self, target, cmd, xml_file, port_shards, results, signal=True):
+		try:
+			while True:
+				ports = port_shards.next()
+				if ports is None:
+					break
+
+				start_time = time.time()
+				ports_arg = str(ports[0]) + '-' + str(ports[1])
+				process, stdout, stderr = await target.execute(cmd.replace('{ports}', ports_arg), blocking=False)
+
+				services = []
+				async for service in tail_services(os.path.join(target.scandir, 'xml', xml_file.replace('{ports}', ports_arg)), process):
+					services.append(service)
+
+				await stdout.wait()
+				await stderr.wait()
+				await process.wait()
+
+				port_shards.record(ports[0], ports[1], time.time() - start_time)
+				results.put_nowait(services)
+		finally:
+			if signal:
+				results.put_nowait(None)
+
 class ServiceScan(Plugin):
 
 	def __init__(self):
@@ -215,6 +293,37 @@ class ServiceScan(Plugin):
 			# Add a "match all" service name.
 			self.match_service_name('.*')
 
+	# Call work(item) for every item (e.g. parts of a wordlist). The plugin's own slot works through the items
+	# straight away, and up to parallel - 1 extra service scan slots join in as they become free, within the
+	# plugin's instance limits. work should be a method of the plugin, so that it can call service.execute().
+	@final
+	async def run_parallel(self, service, items, work, parallel):
+		queue = list(reversed(items))
+		started = set()
+
+		async def worker():
+			while queue:
+				await work(queue.pop())
+
+		async def helper():
+			async with service.target.autorecon.scheduler.service_scan_shard(service.target, self, service.tag() + '/' + self.slug, service_name=service.name):
+				started.add(asyncio.current_task())
+				await worker()
+
+		helpers = [asyncio.create_task(helper()) for i in range(min(parallel, len(items)) - 1)]
+		try:
+			await worker()
+		finally:
+			# Every item has been handed out, so helpers still waiting for a slot aren't needed.
+			for task in helpers:
+				if task not in started:
+					task.cancel()
+			results = await asyncio.gather(*helpers, return_exceptions=True)
+
+		for result in results:
+			if isinstance(result, Exception):
+				raise result
+
 class Report(Plugin):
 
 	def __init__(self):
@@ -229,8 +338,9 @@ class AutoRecon(object):
 		self.plugins = {}
 		self.__slug_regex = re.compile('^[a-z0-9\-]+$')
 		self.plugin_types = {'port':[], 'service':[], 'report':[]}
-		self.port_scan_semaphore = None
-		self.service_scan_semaphore = None
+		self.scheduler = None
+		self.journal = None
+		self.http = HTTPClient()
 		self.argparse = None
 		self.argparse_group = None
 		self.args = None
@@ -239,6 +349,9 @@ class AutoRecon(object):
 		self.tags = []
 		self.excluded_tags = []
 		self.patterns = []
+		self.pattern_matchers = {}
+		self.plugin_hooks = {}
+		self.service_index = None
 		self.errors = False
 		self.lock = asyncio.Lock()
 		self.load_slug = None
@@ -285,6 +398,10 @@ class AutoRecon(object):
 				break
 		return services
 
+	# Yield services from an nmap -oX file as nmap writes them, instead of waiting for the normal output.
+	def extract_services_xml(self, path, process):
+		return tail_services(path, process)
+
 	def register(self, plugin, filename):
 		if plugin.disabled:
 			return
@@ -314,7 +431,13 @@ class AutoRecon(object):
 			run_coroutine_found = False
 			manual_function_found = False
 
-			for member_name, member_value in inspect.getmembers(plugin, predicate=inspect.ismethod):
+			members = inspect.getmembers(plugin, predicate=inspect.ismethod)
+
+			# Remember which hooks the plugin has, so they don't need to be looked up for every service.
+			member_names = [member_name for member_name, _ in members]
+			self.plugin_hooks[plugin.slug] = {'run': 'run' in member_names, 'manual': 'manual' in member_names, 'update': 'update' in member_names}
+
+			for member_name, member_value in members:
 				if member_name == 'configure':
 					configure_function_found = True
 				elif member_name == 'run' and inspect.iscoroutinefunction(member_value):
@@ -353,9 +476,76 @@ class AutoRecon(object):
 			if configure_function_found:
 				plugin.configure()
 			self.plugins[plugin.slug] = plugin
+			self.service_index = None
 		else:
 			fail('Error: plugin slug "' + plugin.slug + '" in ' + filename + ' is already assigned.', file=sys.stderr)
 
+	# Build the lookup used to find the ServiceScan plugins for a service. Each distinct name regex is compiled once
+	# and shared by every plugin that uses it, and all of them are joined into one regex for a quick "no match" check.
+	def build_service_index(self):
+		regexes = {}
+		entries = []
+		for plugin in self.plugin_types['service']:
+			names = list(plugin.service_names)
+			ignore_names = list(plugin.ignore_service_names)
+			port_names = {}
+			port_ignore_names = {}
+
+			# Names from match_service() only apply to the given protocol and ports.
+			for service_dict in plugin.services:
+				for port in service_dict['port']:
+					key = (service_dict['protocol'], port)
+					if service_dict['negative_match']:
+						port_ignore_names.setdefault(key, []).extend(service_dict['name'])
+					else:
+						port_names.setdefault(key, []).extend(service_dict['name'])
+
+			for name in names + ignore_names + [n for l in port_names.values() for n in l] + [n for l in port_ignore_names.values() for n in l]:
+				if name not in regexes:
+					regexes[name] = re.compile(name)
+
+			entries.append({'plugin': plugin, 'names': names, 'ignore_names': ignore_names, 'port_names': port_names, 'port_ignore_names': port_ignore_names})
+
+		combined = None
+		if regexes:
+			try:
+				combined = re.compile('|'.join('(?:' + name + ')' for name in regexes))
+			except re.error: # e.g. inline flags or the same named group in two regexes.
+				combined = None
+
+		self.service_index = {'regexes': regexes, 'combined': combined, 'entries': entries, 'cache': {}}
+
+	# Return [(plugin, ignored), ...] for the ServiceScan plugins whose service names match, in registration order.
+	# ignored is True if one of the plugin's negative service names also matched.
+	def service_plugins(self, protocol, port, name):
+		if self.service_index is None:
+			self.build_service_index()
+
+		key = (protocol, port, name)
+		cache = self.service_index['cache']
+		if key in cache:
+			return cache[key]
+
+		regexes = self.service_index['regexes']
+		results = {}
+
+		def matches(pattern):
+			if pattern not in results:
+				results[pattern] = regexes[pattern].search(name) is not None
+			return results[pattern]
+
+		plugins = []
+		port_key = (protocol, port)
+		combined = self.service_index['combined']
+		if combined is None or combined.search(name) is not None:
+			for entry in self.service_index['entries']:
+				if any(matches(pattern) for pattern in entry['names'] + entry['port_names'].get(port_key, [])):
+					ignored = any(matches(pattern) for pattern in entry['ignore_names'] + entry['port_ignore_names'].get(port_key, []))
+					plugins.append((entry['plugin'], ignored))
+
+		cache[key] = plugins
+		return plugins
+
 	async def execute(self, cmd, target, tag, patterns=None, outfile=None, errfile=None):
 		if patterns:
 			combined_patterns = self.patterns + patterns
@@ -368,8 +558,14 @@ class AutoRecon(object):
 			stdout=asyncio.subprocess.PIPE,
 			stderr=asyncio.subprocess.PIPE)
 
-		cout = CommandStreamReader(process.stdout, target, tag, patterns=combined_patterns, outfile=outfile)
-		cerr = CommandStreamReader(process.stderr, target, tag, patterns=combined_patterns, outfile=errfile)
+		# Build each combination of global and plugin patterns into a matcher once, and reuse it for every command.
+		key = tuple(id(p) for p in combined_patterns)
+		matcher = self.pattern_matchers.get(key)
+		if matcher is None:
+			matcher = self.pattern_matchers[key] = PatternMatcher(combined_patterns)
+
+		cout = CommandStreamReader(process.stdout, target, tag, patterns=combined_patterns, outfile=outfile, matcher=matcher)
+		cerr = CommandStreamReader(process.stderr, target, tag, patterns=combined_patterns, outfile=errfile, matcher=matcher)
 
 		asyncio.create_task(cout._read())
 		asyncio.create_task(cerr._read())
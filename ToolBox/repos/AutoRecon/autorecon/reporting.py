@@ -0,0 +1,45 @@
+import os
+
+# Characters that can end a file path inside a command (e.g. -oN "/path/file.txt" | tee /path/file.txt).
+path_delimiters = set(' \t\n"\'`;|&<>(),=')
+
+# The output files of a command that a report should include: files under scandir that the command line mentions,
+# plus its outfile and errfile. Only the command itself is searched, so this doesn't depend on how many files exist.
+def command_files(command, scandir, extensions=('.txt', '.html')):
+	files = []
+	cmd = command[0]
+	scandir = os.path.abspath(scandir)
+
+	start = cmd.find(scandir)
+	while start != -1:
+		next_start = cmd.find(scandir, start + len(scandir))
+		end = start + len(scandir)
+		stop = len(cmd) if next_start == -1 else next_start
+		while end <= stop:
+			if end == len(cmd) or cmd[end] in path_delimiters:
+				filename = cmd[start:end]
+				if filename.endswith(extensions) and filename not in files and os.path.isfile(filename):
+					files.append(filename)
+			end += 1
+		start = next_start
+
+	for filename in command[1:3]:
+		if filename is not None and filename.endswith(extensions) and filename not in files and os.path.isfile(filename):
+			files.append(filename)
+
+	return files
+
+# Copy a file's contents into an open report in chunks, stopping after limit characters (0 means no limit).
+# Returns True if the file was truncated. transform is applied to each chunk (e.g. to escape it).
+def copy_output(output, filename, limit=0, transform=None, chunk_size=65536):
+	copied = 0
+	with open(filename, 'r', errors='replace') as file:
+		while True:
+			size = chunk_size if not limit else min(chunk_size, limit - copied)
+			if size <= 0:
+				return file.read(1) != ''
+			chunk = file.read(size)
+			if not chunk:
+				return False
+			copied += len(chunk)
+			output.write(transform(chunk) if transform else chunk)
@@ -0,0 +1,289 @@
+import asyncio, heapq, itertools, math, time
+from autorecon.config import config
+from autorecon.metrics import metrics
+
+# Wait until one of the tasks finishes, the event is set, or the timeout expires.
+async def wait_for_change(tasks, event, timeout=None):
+	event.clear()
+	event_waiter = asyncio.ensure_future(event.wait())
+	done, pending = await asyncio.wait(set(tasks) | {event_waiter}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+	if event_waiter in done:
+		done.discard(event_waiter)
+	else:
+		event_waiter.cancel()
+		pending.discard(event_waiter)
+	return done, pending
+
+class Slot:
+
+	def __init__(self, kind, target, plugin, tag=None, service_name=None, shard=False):
+		self.kind = kind
+		self.target = target
+		self.plugin = plugin
+		self.tag = tag
+		self.service_name = service_name
+		self.shard = shard
+		# Heavy plugins use more than one slot's worth of capacity.
+		self.cost = max(1, getattr(plugin, 'cost', 1)) if plugin is not None else 1
+		self.pool = None
+		self.future = None
+		self.queued = None
+		self.start = None
+
+class SlotContext:
+
+	def __init__(self, scheduler, kind, target, plugin, tag=None, service_name=None, shard=False):
+		self.scheduler = scheduler
+		self.slot = Slot(kind, target, plugin, tag, service_name, shard)
+
+	async def __aenter__(self):
+		await self.scheduler.acquire(self.slot)
+		return self.slot
+
+	async def __aexit__(self, exc_type, exc, tb):
+		self.scheduler.release(self.slot, completed=exc_type is None)
+
+class Scheduler:
+
+	def __init__(self, autorecon, max_scans, max_port_scans, force_services=False, history=None):
+		self.autorecon = autorecon
+		self.force_services = force_services
+		self.history = history
+
+		# With --force-services everything runs from a single pool of max_scans slots. Otherwise port scans get
+		# their own pool and service scans get the remainder. If both limits are the same, they share one pool.
+		if force_services:
+			self.limits = {'port': 0, 'service': max_scans}
+			self.shared = False
+		elif max_scans == max_port_scans:
+			self.limits = {'port': max_port_scans, 'service': 0}
+			self.shared = True
+		else:
+			self.limits = {'port': max_port_scans, 'service': max_scans - max_port_scans}
+			self.shared = False
+
+		# The limits above are the most that will be used. With adaptive concurrency they're scaled down when the host is busy.
+		self.base_limits = dict(self.limits)
+
+		self.max_port_scans = max_port_scans
+		self.in_use = {'port': 0, 'service': 0}
+
+		# Running slots by kind, plus port scans that have been requested but not yet released (queued or running).
+		self.running = {'port': 0, 'service': 0, 'report': 0}
+		self.outstanding_port_scans = 0
+
+		self.global_instances = {}
+		self.target_instances = {}
+
+		self.waiters = []
+		self.counter = itertools.count()
+
+		# Set whenever a slot is requested or released, so that loops waiting on capacity can wake up.
+		self.changed = asyncio.Event()
+
+	def port_scan(self, target, plugin):
+		return SlotContext(self, 'port', target, plugin, plugin.slug)
+
+	# An extra port scan slot for one shard of a sharded port scan, on top of the slot the plugin itself holds.
+	def port_scan_shard(self, target, plugin):
+		return SlotContext(self, 'port', target, plugin, plugin.slug, shard=True)
+
+	def service_scan(self, target, plugin, tag=None, service_name=None):
+		return SlotContext(self, 'service', target, plugin, tag, service_name)
+
+	# An extra service scan slot for one part of a service scan that's split up, on top of the slot the plugin itself holds.
+	def service_scan_shard(self, target, plugin, tag=None, service_name=None):
+		return SlotContext(self, 'service', target, plugin, tag, service_name, shard=True)
+
+	def report(self, plugin):
+		return SlotContext(self, 'report', None, plugin)
+
+	# Plugin priority comes first. Within a priority, scans expected to take the longest (going by previous runs)
+	# start first, so they don't start last and hold up the end of the run. Scans with no history go last.
+	def priority(self, slot):
+		priority = slot.plugin.priority if slot.plugin is not None else 0
+		expected = None
+		if self.history is not None and slot.plugin is not None:
+			expected = self.history.expected(slot.plugin.slug, slot.service_name)
+		return (priority, -(expected or 0))
+
+	async def acquire(self, slot):
+		if slot.kind == 'port':
+			self.outstanding_port_scans += 1
+
+		self.journal('queued', slot)
+
+		slot.future = asyncio.get_running_loop().create_future()
+		slot.queued = time.time()
+		heapq.heappush(self.waiters, (self.priority(slot), next(self.counter), slot))
+		self.dispatch()
+
+		try:
+			await slot.future
+		except asyncio.CancelledError:
+			if slot.pool is not None:
+				self.release(slot)
+			else:
+				slot.future = None
+				if slot.kind == 'port':
+					self.outstanding_port_scans -= 1
+				self.dispatch()
+			raise
+
+	def release(self, slot, completed=False):
+		if slot.pool is None:
+			return
+
+		# Shards only cover part of a scan, so their durations would skew the plugin's history.
+		if completed and self.history is not None and slot.plugin is not None and not slot.shard:
+			self.history.record(slot.plugin.slug, slot.service_name, time.time() - slot.start)
+
+		if slot.plugin is not None:
+			metrics.inc('autorecon_scans_total', kind=slot.kind, plugin=slot.plugin.slug, status='completed' if completed else 'failed')
+			metrics.observe('autorecon_scan_duration_seconds', time.time() - slot.start, kind=slot.kind, plugin=slot.plugin.slug)
+
+		self.in_use[slot.pool] -= slot.cost
+		slot.pool = None
+
+		self.running[slot.kind] -= 1
+		if slot.kind == 'port':
+			self.outstanding_port_scans -= 1
+
+		if slot.plugin is not None:
+			self.global_instances[slot.plugin.slug] -= 1
+			if slot.target is not None:
+				self.target_instances[(slot.target.address, slot.plugin.slug)] -= 1
+
+		self.dispatch()
+
+	def journal(self, event, slot):
+		if self.autorecon.journal is not None and slot.target is not None:
+			self.autorecon.journal.write(event, target=slot.target.address, kind=slot.kind, plugin=slot.plugin.slug, tag=slot.tag)
+
+	def pending_target_count(self):
+		return len(self.autorecon.pending_targets)
+
+	def free(self, pool):
+		return self.limits[pool] - self.in_use[pool]
+
+	# A slot fits if there's room for its cost. A plugin costing more than the whole pool can still run on its own.
+	def fits(self, pool, slot):
+		return self.free(pool) >= slot.cost or (self.in_use[pool] == 0 and self.limits[pool] > 0)
+
+	def max_slots(self):
+		return sum(self.base_limits.values())
+
+	# Scale every pool's limit (e.g. 0.5 for half the configured slots), keeping at least one slot in each pool.
+	def set_scale(self, scale):
+		for pool, limit in self.base_limits.items():
+			self.limits[pool] = max(1, round(limit * scale)) if limit > 0 else 0
+		self.dispatch()
+
+	# Decide which pool (if any) a slot can be started from right now.
+	def within_instance_limits(self, slot):
+		plugin = slot.plugin
+		if plugin is not None:
+			max_global_instances = getattr(plugin, 'max_global_instances', 0)
+			if max_global_instances and self.global_instances.get(plugin.slug, 0) >= max_global_instances:
+				return False
+
+			max_target_instances = getattr(plugin, 'max_target_instances', 0)
+			if slot.target is not None and max_target_instances and self.target_instances.get((slot.target.address, plugin.slug), 0) >= max_target_instances:
+				return False
+		return True
+
+	def select_pool(self, slot):
+		if not self.within_instance_limits(slot):
+			return None
+
+		if slot.kind == 'port':
+			return 'port' if self.fits('port', slot) else None
+
+		if self.shared:
+			return 'port' if self.fits('port', slot) else None
+
+		if self.fits('service', slot):
+			return 'service'
+
+		if self.force_services or not self.fits('port', slot):
+			return None
+
+		# Service scans may borrow a port scan slot if port scans for pending targets won't need it.
+		pending_targets = self.pending_target_count()
+		if not pending_targets:
+			if self.max_port_scans - self.running['port'] >= 1:
+				return 'port'
+		elif self.max_port_scans - (self.running['port'] + (pending_targets * config['port_scan_plugin_count'])) >= 1:
+			return 'port'
+
+		return None
+
+	def grant(self, slot, pool):
+		slot.pool = pool
+		self.in_use[pool] += slot.cost
+
+		self.running[slot.kind] += 1
+		slot.start = time.time()
+		metrics.observe('autorecon_slot_wait_seconds', slot.start - slot.queued, kind=slot.kind)
+		self.journal('running', slot)
+
+		if slot.plugin is not None:
+			self.global_instances[slot.plugin.slug] = self.global_instances.get(slot.plugin.slug, 0) + 1
+			if slot.target is not None:
+				key = (slot.target.address, slot.plugin.slug)
+				self.target_instances[key] = self.target_instances.get(key, 0) + 1
+
+		slot.future.set_result(pool)
+
+	# Start every waiting slot that fits, highest priority first. Slots blocked only by their own plugin
+	# limits are skipped so they don't hold up other work. A slot waiting for capacity (e.g. a costly plugin
+	# waiting for enough slots to free up) holds back lower priority slots of its kind, so it isn't starved.
+	def dispatch(self):
+		if self.waiters:
+			blocked = []
+			waiting_for_capacity = set()
+			while self.waiters:
+				entry = heapq.heappop(self.waiters)
+				slot = entry[2]
+				if slot.future is None or slot.future.done():
+					continue
+				if slot.kind in waiting_for_capacity or not self.within_instance_limits(slot):
+					blocked.append(entry)
+					continue
+				pool = self.select_pool(slot)
+				if pool is None:
+					blocked.append(entry)
+					waiting_for_capacity.add(slot.kind)
+				else:
+					self.grant(slot, pool)
+
+				if self.free('port') <= 0 and self.free('service') <= 0:
+					break
+
+			for entry in blocked:
+				heapq.heappush(self.waiters, entry)
+
+		self.update_metrics()
+		self.changed.set()
+
+	def update_metrics(self):
+		metrics.set('autorecon_queue_depth', self.waiting_count())
+		for kind, running in self.running.items():
+			metrics.set('autorecon_running_scans', running, kind=kind)
+		for pool, limit in self.limits.items():
+			metrics.set('autorecon_slot_limit', limit, pool=pool)
+			metrics.set('autorecon_slots_in_use', self.in_use[pool], pool=pool)
+
+	# Wake up any waiters that depend on state outside the scheduler (e.g. the number of pending targets).
+	def notify(self):
+		self.dispatch()
+
+	def waiting_count(self):
+		return sum(1 for entry in self.waiters if entry[2].future is not None and not entry[2].future.done())
+
+	# How many more targets can be started without queueing port scans behind each other.
+	def new_target_count(self, port_scan_plugin_count):
+		if self.force_services:
+			# If we're not scanning ports, count ServiceScans instead.
+			return math.ceil((self.max_port_scans - self.running['service']) / port_scan_plugin_count)
+		return math.ceil((self.max_port_scans - self.outstanding_port_scans) / port_scan_plugin_count)
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+
+# Replays the scan durations recorded in the history file to compare scheduling strategies offline.
+# Every recorded plugin/service pair becomes one task per simulated target, and the tasks are run through
+# a list scheduler with max_scans slots. Nothing is scanned and no network access is needed.
+#
+# With --cpus, the host is simulated too: scans share the CPUs (weighted by their cost) and slow down further
+# once the host is overloaded, and fixed limits are compared with adaptive concurrency.
+#
+# Usage: python3 -m autorecon.simulate [--history FILE] [--targets N] [--max-scans N] [--cpus N] [--cost SLUG=N ...]
+
+import argparse, heapq, os, sys
+from autorecon.config import config
+from autorecon.history import History
+from autorecon.load import LoadController
+
+# Order tasks the way the scheduler would. 'fifo' is the order they were found in, 'lpt' is longest first.
+strategies = {
+	'fifo': lambda task: (task['priority'], task['index']),
+	'lpt': lambda task: (task['priority'], -task['duration'], task['index'])
+}
+
+def build_tasks(history, targets, priorities=None, costs=None):
+	priorities = priorities or {}
+	costs = costs or {}
+	tasks = []
+
+	# Port scans only have a plugin level entry. Service scans have one per service name.
+	service_slugs = set(key.split(':', 1)[0] for key in history.durations if ':' in key)
+
+	for target in range(targets):
+		for key, entry in sorted(history.durations.items()):
+			if ':' in key:
+				slug = key.split(':', 1)[0]
+			elif key in service_slugs:
+				continue
+			else:
+				slug = key
+			tasks.append({'index': len(tasks), 'target': target, 'key': key, 'priority': priorities.get(slug, 1), 'cost': costs.get(slug, 1), 'duration': entry['average']})
+
+	return tasks
+
+# Run the tasks on max_scans slots in strategy order and return when the last one finishes.
+def simulate(tasks, max_scans, strategy):
+	slots = [0.0] * max_scans
+	heapq.heapify(slots)
+
+	makespan = 0.0
+	for task in sorted(tasks, key=strategies[strategy]):
+		start = heapq.heappop(slots)
+		finish = start + task['duration']
+		heapq.heappush(slots, finish)
+		makespan = max(makespan, finish)
+
+	return makespan
+
+# Step through time on a host with cpus CPUs. Running scans share the CPUs by cost, and every unit of load past
+# the number of CPUs costs another thrash of throughput (context switching, memory pressure). With adaptive set,
+# a LoadController adjusts the slots every interval seconds, as it would in a real run.
+def simulate_load(tasks, max_scans, strategy, cpus, adaptive=False, thrash=0.1, interval=5, step=0.5):
+	queue = sorted(tasks, key=strategies[strategy])
+	queue.reverse()
+	running = []
+	controller = LoadController(max_scans)
+	slots = max_scans
+
+	time = 0.0
+	next_update = interval
+	while queue or running:
+		used = sum(task['cost'] for task, _ in running)
+		while queue and (used + queue[-1]['cost'] <= slots or not running):
+			task = queue.pop()
+			running.append((task, [task['duration']]))
+			used += task['cost']
+
+		load = used / cpus
+		speed = 1.0 if load <= 1 else 1.0 / (load * (1 + thrash * (load - 1)))
+
+		for task, remaining in running:
+			remaining[0] -= step * speed
+		running = [(task, remaining) for task, remaining in running if remaining[0] > 0]
+		time += step
+
+		if adaptive and time >= next_update:
+			next_update += interval
+			slots = controller.update({'load': load, 'runnable': load, 'memory': 1.0, 'iowait': 0.0})
+
+	return time
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare AutoRecon scan ordering strategies using recorded scan durations.')
+	parser.add_argument('--history', action='store', default=os.path.join(config['data_dir'], 'history.json'), help='Location of the duration history file. Default: %(default)s')
+	parser.add_argument('--targets', action='store', type=int, default=1, help='Number of identical targets to simulate. Default: %(default)s')
+	parser.add_argument('-m', '--max-scans', action='store', type=int, default=config['max_scans'], help='The maximum number of concurrent scans. Default: %(default)s')
+	parser.add_argument('--cpus', action='store', type=int, help='Simulate the load on a host with this many CPUs, and compare fixed limits with adaptive concurrency. Default: %(default)s')
+	parser.add_argument('--thrash', action='store', type=float, default=0.1, help='With --cpus, how much throughput is lost per unit of load past the number of CPUs. Default: %(default)s')
+	parser.add_argument('--cost', action='store', nargs='+', default=[], metavar='SLUG=N', help='Cost weights for plugins, as declared by the plugins themselves. Default: 1')
+	args = parser.parse_args()
+
+	costs = {}
+	for cost in args.cost:
+		slug, _, value = cost.partition('=')
+		try:
+			costs[slug] = int(value)
+		except ValueError:
+			print('The cost "' + cost + '" should be in the form SLUG=N.')
+			sys.exit(1)
+
+	if not os.path.isfile(args.history):
+		print('The history file "' + args.history + '" was not found. Run AutoRecon at least once to record scan durations.')
+		sys.exit(1)
+
+	history = History(args.history)
+	tasks = build_tasks(history, args.targets, costs=costs)
+	if not tasks:
+		print('The history file "' + args.history + '" does not contain any scan durations.')
+		sys.exit(1)
+
+	print('Simulating ' + str(len(tasks)) + ' scans against ' + str(args.targets) + ' target(s) with ' + str(args.max_scans) + ' concurrent scans.')
+
+	if args.cpus:
+		print('Simulating a host with ' + str(args.cpus) + ' CPU(s).')
+		baseline = simulate_load(tasks, args.max_scans, 'fifo', args.cpus, thrash=args.thrash)
+		for strategy in strategies:
+			for adaptive in [False, True]:
+				makespan = simulate_load(tasks, args.max_scans, strategy, args.cpus, adaptive=adaptive, thrash=args.thrash)
+				print('{:<6} {:<9} {:>10.1f}s {:>+7.1f}%'.format(strategy, 'adaptive' if adaptive else 'fixed', makespan, ((makespan - baseline) / baseline * 100) if baseline else 0))
+		return
+
+	baseline = simulate(tasks, args.max_scans, 'fifo')
+	for strategy in strategies:
+		makespan = simulate(tasks, args.max_scans, strategy)
+		print('{:<6} {:>10.1f}s {:>+7.1f}%'.format(strategy, makespan, ((makespan - baseline) / baseline * 100) if baseline else 0))
+
+if __name__ == '__main__':
+	main()
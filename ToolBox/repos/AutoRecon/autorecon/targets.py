@@ -1,4 +1,4 @@
-import asyncio, inspect, os
+import asyncio, collections, inspect, itertools, os
 from typing import final
 from autorecon.config import config
 from autorecon.io import e, info, warn, error
@@ -20,10 +20,28 @@ class Target:
 		self.services = []
 		self.scans = {'ports':{}, 'services':{}}
 		self.running_tasks = {}
+		# Set when a service is added, so scan_target can pick it up without polling.
+		self.changed = asyncio.Event()
+		self.patterns_log = None
 
 	async def add_service(self, service):
 		async with self.lock:
 			self.pending_services.append(service)
+		if self.autorecon.journal is not None:
+			self.autorecon.journal.write_service(self.address, service)
+		self.changed.set()
+
+	# Append pattern matches to _patterns.log, keeping the file open between writes.
+	def write_patterns(self, lines):
+		if self.patterns_log is None:
+			self.patterns_log = open(os.path.join(self.scandir, '_patterns.log'), 'a')
+		self.patterns_log.writelines(lines)
+		self.patterns_log.flush()
+
+	def close_patterns_log(self):
+		if self.patterns_log is not None:
+			self.patterns_log.close()
+			self.patterns_log = None
 
 	def extract_service(self, line, regex=None):
 		return self.autorecon.extract_service(line, regex)
@@ -31,6 +49,16 @@ class Target:
 	async def extract_services(self, stream, regex=None):
 		return await self.autorecon.extract_services(stream, regex)
 
+	def extract_services_xml(self, path, process):
+		return self.autorecon.extract_services_xml(path, process)
+
+	# Use these instead of requests.get() / requests.post() in plugins, so the other scans keep running meanwhile.
+	async def http_get(self, url, **kwargs):
+		return await self.autorecon.http.get(url, **kwargs)
+
+	async def http_post(self, url, **kwargs):
+		return await self.autorecon.http.post(url, **kwargs)
+
 	@final
 	def info(self, msg, verbosity=0):
 		plugin = inspect.currentframe().f_back.f_locals['self']
@@ -74,7 +102,7 @@ class Target:
 		cmd = e(cmd)
 		tag = plugin.slug
 
-		info('Port scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} is running the following command against {byellow}' + address + '{rst}: ' + cmd, verbosity=2)
+		info('Port scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} is running the following command against {byellow}' + address + '{rst}: {cmd}', cmd=cmd, verbosity=2)
 
 		if outfile is not None:
 			outfile = os.path.join(target.scandir, e(outfile))
@@ -87,6 +115,9 @@ class Target:
 
 		target.scans['ports'][tag]['commands'].append([cmd, outfile if outfile is not None else future_outfile, errfile])
 
+		if target.autorecon.journal is not None:
+			target.autorecon.journal.write('command', target=address, kind='port', tag=tag, cmd=cmd, outfile=outfile if outfile is not None else future_outfile, errfile=errfile)
+
 		async with target.lock:
 			with open(os.path.join(target.scandir, '_commands.log'), 'a') as file:
 				file.writelines(cmd + '\n\n')
@@ -95,10 +126,10 @@ class Target:
 
 		target.running_tasks[tag]['processes'].append({'process': process, 'stderr': stderr, 'cmd': cmd})
 
-		# If process should block, sleep until stdout and stderr have finished.
+		# If process should block, wait until stdout and stderr have finished.
 		if blocking:
-			while (not (stdout.ended and stderr.ended)):
-				await asyncio.sleep(0.1)
+			await stdout.wait()
+			await stderr.wait()
 			await process.wait()
 
 		return process, stdout, stderr
@@ -112,6 +143,12 @@ class Service:
 		self.name = name
 		self.secure = secure
 		self.manual_commands = {}
+		# True if the service was found in a previous run and is being replayed by --resume.
+		self.resumed = False
+		# Extra details from nmap's XML output, if the service was found there.
+		self.product = None
+		self.version = None
+		self.extrainfo = None
 
 	@final
 	def tag(self):
@@ -195,7 +232,7 @@ class Service:
 		if plugin.run_once_boolean:
 			plugin_tag = plugin.slug
 
-		info('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} is running the following command against {byellow}' + address + '{rst}: ' + cmd, verbosity=2)
+		info('Service scan {bblue}' + plugin.name + ' {green}(' + tag + '){rst} is running the following command against {byellow}' + address + '{rst}: {cmd}', cmd=cmd, verbosity=2)
 
 		if outfile is not None:
 			outfile = os.path.join(scandir, e(outfile))
@@ -208,6 +245,9 @@ class Service:
 
 		target.scans['services'][self][plugin_tag]['commands'].append([cmd, outfile if outfile is not None else future_outfile, errfile])
 
+		if target.autorecon.journal is not None:
+			target.autorecon.journal.write('command', target=address, kind='service', tag=tag, cmd=cmd, outfile=outfile if outfile is not None else future_outfile, errfile=errfile)
+
 		async with target.lock:
 			with open(os.path.join(target.scandir, '_commands.log'), 'a') as file:
 				file.writelines(cmd + '\n\n')
@@ -216,10 +256,122 @@ class Service:
 
 		target.running_tasks[tag]['processes'].append({'process': process, 'stderr': stderr, 'cmd': cmd})
 
-		# If process should block, sleep until stdout and stderr have finished.
+		# If process should block, wait until stdout and stderr have finished.
 		if blocking:
-			while (not (stdout.ended and stderr.ended)):
-				await asyncio.sleep(0.1)
+			await stdout.wait()
+			await stderr.wait()
 			await process.wait()
 
 		return process, stdout, stderr
+
+# Whether ip would have been produced by network.hosts().
+def _in_hosts(ip, network):
+	if ip.version != network.version or ip not in network:
+		return False
+	if network.num_addresses <= 2:
+		return True
+	if ip == network.network_address:
+		return False
+	if ip.version == 4 and ip == network.broadcast_address:
+		return False
+	return True
+
+class TargetSource:
+
+	def __init__(self, autorecon, prefetch=64):
+		self.autorecon = autorecon
+		self.prefetch = prefetch
+		self.sources = []
+		self.queue = collections.deque()
+		self.addresses = None
+		self.total = 0
+		self.consumed = 0
+
+	def add_ip(self, ip):
+		self.sources.append(('ip', ip))
+		self.total += 1
+
+	def add_network(self, network):
+		self.sources.append(('network', network))
+		self.total += network.num_addresses
+
+	def add_hostname(self, hostname, ip, ipversion):
+		self.sources.append(('hostname', hostname, ip, ipversion))
+		self.total += 1
+
+	# Yield (address, ip, ipversion, type) for each unique target. Ranges are expanded lazily, and an address is
+	# checked against the ranges already expanded rather than remembered, so memory doesn't grow with range size.
+	def _expand(self):
+		seen = set()
+		networks = []
+		for source in self.sources:
+			if source[0] == 'hostname':
+				self.consumed += 1
+				if source[1] in seen:
+					continue
+				seen.add(source[1])
+				yield (source[1], source[2], source[3], 'hostname')
+				continue
+
+			if source[0] == 'ip':
+				ips = [source[1]]
+			else:
+				ips = source[1].hosts()
+
+			expanded = 0
+			for ip in ips:
+				self.consumed += 1
+				expanded += 1
+				if ip in seen or any(_in_hosts(ip, network) for network in networks):
+					continue
+				if source[0] == 'ip':
+					seen.add(ip)
+				ip_str = str(ip)
+				yield (ip_str, ip_str, 'IPv4' if ip.version == 4 else 'IPv6', 'ip')
+
+			if source[0] == 'network':
+				# hosts() skips the network and broadcast addresses, which were still counted in the total.
+				self.consumed += source[1].num_addresses - expanded
+				networks.append(source[1])
+
+	# Count unique targets, stopping once limit is reached.
+	def count(self, limit=None):
+		consumed = self.consumed
+		count = sum(1 for _ in itertools.islice(self._expand(), limit))
+		self.consumed = consumed
+		return count
+
+	def _fill(self):
+		if self.addresses is None:
+			self.addresses = self._expand()
+		for address in itertools.islice(self.addresses, self.prefetch - len(self.queue)):
+			self.queue.append(address)
+
+	# The next (address, ip, ipversion, type), without creating a Target (e.g. to hand it to a worker).
+	def pop_address(self):
+		if not self.queue:
+			self._fill()
+		return self.queue.popleft()
+
+	# Create the next Target. Targets (and their directories, in scan_target) only exist once they are dequeued.
+	def pop(self):
+		address, ip, ipversion, type = self.pop_address()
+		return Target(address, ip, ipversion, type, self.autorecon)
+
+	# Targets are all known up front, so there's nothing to fetch. See WorkerTargetSource in workers.py.
+	async def request(self, count):
+		pass
+
+	def completed(self, address):
+		pass
+
+	def __bool__(self):
+		if not self.queue:
+			self._fill()
+		return len(self.queue) > 0
+
+	# An upper bound on the number of targets still to be scanned.
+	def __len__(self):
+		if not self:
+			return 0
+		return len(self.queue) + max(0, self.total - self.consumed)
@@ -0,0 +1,73 @@
+import hashlib, os, tempfile
+
+# Write lines to path atomically, so other scans reading the cache never see a partial file.
+def write_lines(path, lines):
+	fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+	try:
+		with os.fdopen(fd, 'w') as file:
+			for line in lines:
+				file.write(line + '\n')
+		os.replace(tmp_path, path)
+	except BaseException:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+		raise
+
+# Merge wordlists into one list with duplicate (and empty) lines removed, keeping the order words first appear in.
+# The result is cached in cache_dir by a hash of the wordlists' contents, so it's only built once per set of wordlists.
+def merge_wordlists(paths, cache_dir):
+	digest = hashlib.sha256()
+	for path in paths:
+		with open(path, 'rb') as file:
+			while True:
+				chunk = file.read(1048576)
+				if not chunk:
+					break
+				digest.update(chunk)
+		digest.update(b'\0')
+
+	merged = os.path.join(cache_dir, 'merged-' + digest.hexdigest()[:32] + '.txt')
+	if os.path.isfile(merged):
+		return merged
+
+	os.makedirs(cache_dir, exist_ok=True)
+	seen = set()
+	lines = []
+	for path in paths:
+		with open(path, 'r', errors='replace') as file:
+			for line in file:
+				line = line.rstrip('\r\n')
+				if line.strip() and line not in seen:
+					seen.add(line)
+					lines.append(line)
+
+	write_lines(merged, lines)
+	return merged
+
+# Split a (merged) wordlist into parts, dealing the words out in turn so every part gets a share of the
+# most common words at the top of the list. Parts are cached next to the wordlist.
+def partition_wordlist(path, parts):
+	stem = os.path.splitext(path)[0]
+	filenames = [stem + '.part' + str(i + 1) + 'of' + str(parts) + '.txt' for i in range(parts)]
+	if all(os.path.isfile(filename) for filename in filenames):
+		return filenames
+
+	with open(path, 'r', errors='replace') as file:
+		lines = [line.rstrip('\r\n') for line in file]
+
+	for i, filename in enumerate(filenames):
+		write_lines(filename, lines[i::parts])
+	return filenames
+
+# Combine the output files of several runs into one, dropping duplicate lines. Missing files are skipped.
+def merge_results(paths, output):
+	seen = set()
+	with open(output, 'w') as merged:
+		for path in paths:
+			if not os.path.isfile(path):
+				continue
+			with open(path, 'r', errors='replace') as file:
+				for line in file:
+					if line not in seen:
+						seen.add(line)
+						merged.write(line if line.endswith('\n') else line + '\n')
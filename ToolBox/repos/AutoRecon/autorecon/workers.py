@@ -0,0 +1,209 @@
+import asyncio, collections, json, math, os, secrets, sys
+from autorecon.io import info, warn, error
+from autorecon.targets import Target
+
+# Coordinator/worker mode (--workers N). The coordinator owns the queue of targets and the record of which targets
+# have finished, and starts N worker processes. Each worker is a normal AutoRecon run (with its own event loop, so
+# output parsing and reporting are spread over several cores) that gets its targets from the coordinator instead of
+# the command line. Every worker writes to the same output directory, so results end up in the usual layout.
+#
+# Workers talk to the coordinator with JSON lines over TCP:
+#   worker: {"type": "hello", "token": "...", "worker": 1}
+#   worker: {"type": "request", "count": 2}
+#   coordinator: {"type": "targets", "targets": [[address, ip, ipversion, type], ...]} (an empty list means there are none left)
+#   worker: {"type": "completed", "address": "10.0.0.1"}
+# Targets a worker was given but didn't finish (e.g. because it crashed) are handed to another worker.
+
+token_variable = 'AUTORECON_WORKER_TOKEN'
+
+class Coordinator:
+
+	def __init__(self, source, journal, workers, argv, max_attempts=2):
+		self.source = source
+		self.journal = journal
+		self.workers = workers
+		self.argv = argv
+		self.max_attempts = max_attempts
+		# Workers must present this token, so other local users can't connect and take targets.
+		self.token = secrets.token_hex(16)
+		self.retry = collections.deque()
+		self.attempts = {}
+		self.assigned = {}
+		self.disconnected = {}
+		self.finished = 0
+		self.failed = []
+
+	def next_target(self):
+		if self.retry:
+			return self.retry.popleft()
+		while self.source:
+			target = self.source.pop_address()
+			if self.journal.is_finished(target[0]):
+				info('Target {byellow}' + target[0] + '{rst} was already scanned in a previous run. Skipping.', verbosity=1)
+				continue
+			return target
+		return None
+
+	# Hand a worker's unfinished targets to other workers, unless they've already been tried too many times.
+	def release(self, worker):
+		for address, target in self.assigned.pop(worker, {}).items():
+			if self.attempts.get(address, 0) < self.max_attempts:
+				warn('Worker ' + str(worker) + ' did not finish scanning {byellow}' + address + '{rst}. It will be scanned by another worker.')
+				self.retry.append(target)
+			else:
+				error('Worker ' + str(worker) + ' did not finish scanning {byellow}' + address + '{rst}, and it has already been tried ' + str(self.max_attempts) + ' times. Giving up on it.')
+				self.failed.append(address)
+
+	async def handle(self, reader, writer):
+		worker = None
+		try:
+			hello = json.loads(await reader.readline())
+			if hello.get('type') != 'hello' or hello.get('token') != self.token:
+				return
+			worker = hello['worker']
+			assigned = self.assigned.setdefault(worker, {})
+
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				message = json.loads(line)
+
+				if message['type'] == 'request':
+					# Don't let one worker take more than its share of the remaining targets, so the others aren't left idle.
+					share = math.ceil((len(self.source) + len(self.retry)) / self.workers)
+					targets = []
+					for i in range(min(message['count'], max(1, share))):
+						target = self.next_target()
+						if target is None:
+							break
+						self.attempts[target[0]] = self.attempts.get(target[0], 0) + 1
+						assigned[target[0]] = target
+						self.journal.write('assigned', target=target[0], worker=worker)
+						targets.append(list(target))
+					writer.write((json.dumps({'type': 'targets', 'targets': targets}) + '\n').encode('utf8'))
+					await writer.drain()
+
+				elif message['type'] == 'completed':
+					assigned.pop(message['address'], None)
+					self.finished += 1
+					self.journal.write('finished', sync=True, target=message['address'], worker=worker)
+		except (ValueError, KeyError, AttributeError, ConnectionError):
+			pass
+		finally:
+			writer.close()
+			if worker is not None:
+				self.release(worker)
+				if worker in self.disconnected:
+					self.disconnected[worker].set()
+
+	async def spawn(self, worker, address):
+		env = dict(os.environ)
+		env[token_variable] = self.token
+		# Make sure the worker imports this copy of AutoRecon, even when it isn't installed.
+		package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+		env['PYTHONPATH'] = package_dir + (os.pathsep + env['PYTHONPATH'] if env.get('PYTHONPATH') else '')
+
+		self.disconnected[worker] = asyncio.Event()
+		process = await asyncio.create_subprocess_exec(sys.executable, '-m', 'autorecon.main', *self.argv, '--worker', address, '--worker-id', str(worker), '--disable-keyboard-control', stdin=asyncio.subprocess.DEVNULL, env=env)
+		return asyncio.create_task(process.wait())
+
+	async def run(self):
+		server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+		address = '127.0.0.1:' + str(server.sockets[0].getsockname()[1])
+		info('Starting {byellow}' + str(self.workers) + '{rst} workers, coordinated on ' + address)
+
+		processes = {}
+		next_worker = 1
+		# Workers that crash are replaced (once each, at most) while there are targets they left unfinished.
+		restarts = self.workers
+		try:
+			for i in range(self.workers):
+				processes[await self.spawn(next_worker, address)] = next_worker
+				next_worker += 1
+
+			while processes:
+				done, _ = await asyncio.wait(processes.keys(), return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					worker = processes.pop(task)
+					returncode = task.result()
+
+					# The worker's connection may close just after the process exits.
+					try:
+						await asyncio.wait_for(self.disconnected[worker].wait(), timeout=5)
+					except asyncio.TimeoutError:
+						self.release(worker)
+
+					if returncode != 0:
+						warn('Worker ' + str(worker) + ' exited with code ' + str(returncode) + '.')
+						if self.retry and restarts > 0:
+							restarts -= 1
+							processes[await self.spawn(next_worker, address)] = next_worker
+							next_worker += 1
+		finally:
+			server.close()
+			for task, worker in processes.items():
+				task.cancel()
+
+		self.failed.extend(target[0] for target in self.retry)
+		return self.failed
+
+# Targets for a worker, fetched from the coordinator as the worker has room for them.
+class WorkerTargetSource:
+
+	def __init__(self, autorecon, address, worker):
+		self.autorecon = autorecon
+		self.address = address
+		self.worker = worker
+		self.queue = collections.deque()
+		self.exhausted = False
+		self.reader = None
+		self.writer = None
+
+	async def connect(self):
+		host, port = self.address.rsplit(':', 1)
+		self.reader, self.writer = await asyncio.open_connection(host, int(port))
+		self.send({'type': 'hello', 'token': os.environ.get(token_variable, ''), 'worker': self.worker})
+
+	def send(self, message):
+		self.writer.write((json.dumps(message) + '\n').encode('utf8'))
+
+	async def request(self, count):
+		if self.exhausted or count <= 0:
+			return
+		try:
+			self.send({'type': 'request', 'count': count})
+			response = json.loads(await self.reader.readline())
+		except (ValueError, ConnectionError):
+			error('Worker ' + str(self.worker) + ' lost its connection to the coordinator. No more targets will be scanned by it.')
+			self.exhausted = True
+			return
+
+		if not response['targets']:
+			self.exhausted = True
+		for target in response['targets']:
+			self.queue.append(tuple(target))
+
+	def pop(self):
+		address, ip, ipversion, type = self.queue.popleft()
+		return Target(address, ip, ipversion, type, self.autorecon)
+
+	def completed(self, address):
+		try:
+			self.send({'type': 'completed', 'address': address})
+		except ConnectionError:
+			pass
+
+	async def close(self):
+		if self.writer is not None:
+			self.writer.close()
+			try:
+				await self.writer.wait_closed()
+			except ConnectionError:
+				pass
+
+	def __bool__(self):
+		return len(self.queue) > 0
+
+	def __len__(self):
+		return len(self.queue)
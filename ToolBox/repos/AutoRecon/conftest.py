@@ -0,0 +1 @@
+# Puts the project root on sys.path, so the tests import autorecon from the source tree.
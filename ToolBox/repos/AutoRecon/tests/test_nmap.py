@@ -0,0 +1,67 @@
+import asyncio, os
+from autorecon.nmap import NmapXMLServiceExtractor
+from autorecon.plugins import AutoRecon
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nmap')
+
+# Stands in for the nmap process, which has already exited once the whole file is there.
+class FinishedProcess:
+
+	returncode = 0
+
+	async def wait(self):
+		return self.returncode
+
+def services_from_normal(autorecon, name):
+	with open(os.path.join(fixtures, name + '.nmap')) as file:
+		services = [autorecon.extract_service(line.rstrip('\n'), None) for line in file]
+	return [service for service in services if service]
+
+def services_from_xml(autorecon, name):
+	async def collect():
+		return [service async for service in autorecon.extract_services_xml(os.path.join(fixtures, name + '.xml'), FinishedProcess())]
+	return asyncio.run(collect())
+
+def test_xml_matches_normal_output():
+	autorecon = AutoRecon()
+	for name in ['tcp', 'udp']:
+		normal = [service.full_tag() for service in services_from_normal(autorecon, name)]
+		xml = [service.full_tag() for service in services_from_xml(autorecon, name)]
+		assert xml == normal
+
+def test_tcp_services():
+	services = services_from_xml(AutoRecon(), 'tcp')
+	assert [service.full_tag() for service in services] == [
+		'tcp/22/ssh/insecure',
+		'tcp/80/http/insecure',
+		'tcp/443/http/secure',
+		'tcp/445/microsoft-ds/insecure',
+		'tcp/993/imap/secure',
+		'tcp/5432/postgresql/insecure',
+		'tcp/8443/http/secure'
+	]
+	assert (services[0].product, services[0].version, services[0].extrainfo) == ('OpenSSH', '8.9p1 Ubuntu 3ubuntu0.6', 'Ubuntu Linux; protocol 2.0')
+	assert (services[3].product, services[3].version) == (None, None)
+
+def test_only_open_ports():
+	services = services_from_xml(AutoRecon(), 'udp')
+	# 68/udp is open|filtered.
+	assert [service.tag() for service in services] == ['udp/53/domain', 'udp/123/ntp', 'udp/161/snmp']
+
+def test_incremental():
+	with open(os.path.join(fixtures, 'tcp.xml'), 'rb') as file:
+		data = file.read()
+
+	# nmap writes each port as it is found, so the file is read in arbitrary pieces.
+	extractor = NmapXMLServiceExtractor()
+	services = []
+	for i in range(0, len(data), 100):
+		services += extractor.feed(data[i:i + 100])
+	services += extractor.close()
+	assert len(services) == 7
+
+	# A scan that was interrupted still gives the ports written so far.
+	extractor = NmapXMLServiceExtractor()
+	services = extractor.feed(data[:data.index(b'<port protocol="tcp" portid="445">')])
+	services += extractor.close()
+	assert [service.port for service in services] == [22, 80, 443]